@@ -0,0 +1,79 @@
+"""
+Fake Pushy push API for benchmarking notification dispatch offline.
+
+Run it with:
+    python backend/benchmarks/fake_pushy.py --port 8080 --delay 0.25
+then start the API with MUSICLOUD_PUSHY_URL=http://localhost:8080/push so
+notifications are sent here instead of to Pushy.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakePushyHandler(BaseHTTPRequestHandler):
+    """
+    Accepts any POST to /push after the server's delay, like Pushy would.
+    """
+    def do_POST(self):  # pylint: disable=C0103
+        """
+        Handle a push request.
+        """
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.delay)
+        if not self.path.startswith("/push"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        devices = len(json.loads(body or b"{}").get("to") or [])
+        with self.server.lock:
+            self.server.requests += 1
+        res = json.dumps({
+            "success": True,
+            "id": uuid.uuid4().hex,
+            "info": {"devices": devices}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(res)))
+        self.end_headers()
+        self.wfile.write(res)
+
+    def log_message(self, format, *args):  # pylint: disable=W0622
+        """
+        Don't log every request.
+        """
+
+
+def make_server(port=0, delay=0.25):
+    """
+    Create a fake Pushy server, port 0 picks a free port.
+    :return:
+    ThreadingHTTPServer - Call serve_forever() to start it, its requests
+    attribute counts the pushes received.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakePushyHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.requests = 0
+    server.lock = threading.Lock()
+    return server
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Run a fake Pushy API.")
+    PARSER.add_argument("--port", type=int, default=8080)
+    PARSER.add_argument(
+        "--delay", type=float, default=0.25,
+        help="Seconds to wait before answering each push."
+    )
+    ARGS = PARSER.parse_args()
+    SERVER = make_server(ARGS.port, ARGS.delay)
+    print("Fake Pushy listening on http://127.0.0.1:%s/push" % ARGS.port)
+    try:
+        SERVER.serve_forever()
+    except KeyboardInterrupt:
+        print(str(SERVER.requests) + " pushes received.")
@@ -0,0 +1,64 @@
+"""
+Benchmark sending emails with a new SMTP connection each vs through the mail
+queue, against a local SMTP sink.
+
+Run from the repository root, with the usual MUSICLOUD_* env vars set:
+    python -m backend.benchmarks.mail_dispatch --count 200
+"""
+import argparse
+import os
+import smtplib
+import threading
+import time
+
+from backend.benchmarks.smtp_sink import make_server
+
+
+def main():
+    """
+    Time both ways of sending & print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument(
+        "--connect-delay", type=float, default=0.1,
+        help="Seconds the sink takes to greet each new connection."
+    )
+    args = parser.parse_args()
+
+    server = make_server(connect_delay=args.connect_delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # The config is read on import, so point it at the sink first.
+    os.environ["MUSICLOUD_SMTP_SERVER"] = "127.0.0.1"
+    os.environ["MUSICLOUD_SMTP_PORT"] = str(server.server_address[1])
+    os.environ["MUSICLOUD_SMTP_STARTTLS"] = "0"
+    os.environ["MUSICLOUD_SMTP_USER"] = ""
+    # pylint: disable=C0415
+    from backend.src.utils.send_mail import send_mail, MAIL_QUEUE
+
+    inline_count = max(1, min(args.count, int(5 / max(args.connect_delay, 0.001))))
+    start = time.perf_counter()
+    for _ in range(inline_count):
+        smtp = smtplib.SMTP("127.0.0.1", server.server_address[1])
+        smtp.ehlo()
+        smtp.sendmail("bench@localhost", "to@localhost", "Subject: Benchmark\n\n")
+        smtp.quit()
+    inline = (time.perf_counter() - start) / inline_count
+    print("connection per email: %.2f ms per request" % (inline * 1000))
+
+    start = time.perf_counter()
+    for _ in range(args.count):
+        send_mail("to@localhost", "Benchmark", "Benchmark")
+    enqueue = (time.perf_counter() - start) / args.count
+    MAIL_QUEUE.join()
+    drained = time.perf_counter() - start
+    print("queued: %.3f ms per request" % (enqueue * 1000))
+    print(
+        "queued: %s sent in %.2fs, %.1f/sec"
+        % (args.count, drained, args.count / drained)
+    )
+    print(MAIL_QUEUE.metrics())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark sending push notifications inline vs through the notification
+outbox, against a local fake Pushy server. Needs a DB with the
+Notification_Outbox table, which should be empty before running this.
+
+Run from the repository root, with the usual MUSICLOUD_* env vars set:
+    python -m backend.benchmarks.notification_dispatch --count 200
+"""
+import argparse
+import os
+import threading
+import time
+
+from backend.benchmarks.fake_pushy import make_server
+
+
+def main():
+    """
+    Time both dispatch modes & print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument(
+        "--messages", type=int, default=10,
+        help="Number of distinct messages the notifications are spread over."
+    )
+    parser.add_argument(
+        "--delay", type=float, default=0.25,
+        help="Seconds the fake Pushy server takes to answer."
+    )
+    args = parser.parse_args()
+
+    server = make_server(delay=args.delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # The config is read on import, so point it at the fake server first.
+    os.environ["MUSICLOUD_PUSHY_URL"] = (
+        "http://127.0.0.1:%s/push" % server.server_address[1]
+    )
+    # pylint: disable=C0415
+    from backend.src.utils import transaction
+    from backend.src.utils.notification_sender import (
+        send_notification, notification_sender, NOTIFICATION_OUTBOX
+    )
+
+    inline_count = max(1, min(args.count, int(5 / max(args.delay, 0.001))))
+    start = time.perf_counter()
+    for _ in range(inline_count):
+        send_notification("Benchmark", ["did"], "Benchmark")
+    inline = (time.perf_counter() - start) / inline_count
+    print("inline: %.2f ms per request" % (inline * 1000))
+
+    requests_before = server.requests
+    start = time.perf_counter()
+    for i in range(args.count):
+        with transaction():
+            notification_sender(
+                "Benchmark " + str(i % args.messages), ["did" + str(i)],
+                "Benchmark"
+            )
+    enqueue = (time.perf_counter() - start) / args.count
+    while NOTIFICATION_OUTBOX.metrics()["sent"] < args.count:
+        time.sleep(0.01)
+    drained = time.perf_counter() - start
+    print("outbox: %.3f ms per request" % (enqueue * 1000))
+    print(
+        "outbox: %s sent in %.2fs with %s calls to Pushy, %.1f/sec"
+        % (
+            args.count, drained, server.requests - requests_before,
+            args.count / drained
+        )
+    )
+    print(NOTIFICATION_OUTBOX.metrics())
+
+
+if __name__ == "__main__":
+    main()
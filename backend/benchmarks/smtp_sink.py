@@ -0,0 +1,102 @@
+"""
+Local SMTP sink that accepts & discards every email, for testing & benchmarking
+the mail queue without a real mail server.
+
+Run it with:
+    python backend/benchmarks/smtp_sink.py --port 8025
+then start the API with MUSICLOUD_SMTP_SERVER=127.0.0.1,
+MUSICLOUD_SMTP_PORT=8025, MUSICLOUD_SMTP_STARTTLS=0 & a blank
+MUSICLOUD_SMTP_USER so emails are sent here instead.
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """
+    Speaks just enough SMTP for smtplib to send mail. No STARTTLS or AUTH is
+    offered. The server's connect_delay is spent before the greeting, to
+    stand in for a real server's TLS & login round trips.
+    """
+    def reply(self, line):
+        """
+        Send one reply line.
+        """
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        """
+        Handle one SMTP session.
+        """
+        with self.server.lock:
+            self.server.connections += 1
+        time.sleep(self.server.connect_delay)
+        self.reply("220 smtp-sink ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith("EHLO"):
+                self.reply("250-smtp-sink")
+                self.reply("250 8BITMIME")
+            elif command.startswith("DATA"):
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                time.sleep(self.server.message_delay)
+                with self.server.lock:
+                    self.server.messages += 1
+                self.reply("250 OK")
+            elif command.startswith("QUIT"):
+                self.reply("221 Bye")
+                return
+            elif command.split(" ")[0] in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Threaded SMTP sink, counts the connections & messages it receives.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(port=0, connect_delay=0.1, message_delay=0.0):
+    """
+    Create an SMTP sink, port 0 picks a free port.
+    :return:
+    SMTPSink - Call serve_forever() to start it, its connections & messages
+    attributes count what it received.
+    """
+    server = SMTPSink(("127.0.0.1", port), SMTPSinkHandler)
+    server.connect_delay = connect_delay
+    server.message_delay = message_delay
+    server.connections = 0
+    server.messages = 0
+    server.lock = threading.Lock()
+    return server
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Run a local SMTP sink.")
+    PARSER.add_argument("--port", type=int, default=8025)
+    PARSER.add_argument(
+        "--connect-delay", type=float, default=0.1,
+        help="Seconds to wait before greeting each new connection."
+    )
+    ARGS = PARSER.parse_args()
+    SERVER = make_server(ARGS.port, ARGS.connect_delay)
+    print("SMTP sink listening on 127.0.0.1:%s" % ARGS.port)
+    try:
+        SERVER.serve_forever()
+    except KeyboardInterrupt:
+        print(
+            "%s emails received over %s connections."
+            % (SERVER.messages, SERVER.connections)
+        )
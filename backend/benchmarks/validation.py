@@ -0,0 +1,78 @@
+"""
+Benchmark validating request bodies with jsonschema.validate(), which checks
+& compiles the schema every call, vs the precompiled validators in
+src.schemas.
+
+Run from the repository root, with the usual MUSICLOUD_* env vars set:
+    python -m backend.benchmarks.validation --count 2000
+"""
+import argparse
+import time
+
+from jsonschema import validate
+from jsonschema.exceptions import best_match
+
+from backend.src.schemas import (
+    VALIDATORS, AUDIO_SCHEMAS, AUTH_SCHEMAS, S3_SCHEMAS
+)
+
+BODIES = [
+    ("auth", "login", AUTH_SCHEMAS, {
+        "username": "bench", "password": "hunter22", "did": "device"
+    }),
+    ("audio", "save_song", AUDIO_SCHEMAS, {
+        "sid": 1,
+        "song_state": {
+            "tempo": 140,
+            "tracks": [
+                {"name": "track %s" % i, "sounds": [{"location": j}
+                                                     for j in range(16)]}
+                for i in range(8)
+            ]
+        }
+    }),
+    ("s3", "signed_form_posts", S3_SCHEMAS, {
+        "dir": "audio",
+        "files": [
+            {"fileName": "sample_%s.wav" % i, "fileType": "audio/wav"}
+            for i in range(50)
+        ]
+    }),
+]
+
+
+def time_per_call(func, count):
+    """
+    Get the mean time func takes over count calls.
+    :return:
+    Float - Microseconds per call.
+    """
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    """
+    Time both ways of validating each body & print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2000)
+    args = parser.parse_args()
+
+    for blueprint, name, schemas, body in BODIES:
+        schema = schemas[name]
+        validator = VALIDATORS[blueprint + "." + name]
+        before = time_per_call(lambda: validate(body, schema), args.count)
+        after = time_per_call(
+            lambda: best_match(validator.iter_errors(body)), args.count
+        )
+        print(
+            "%s.%s: validate() %.1f us, precompiled %.1f us, %.1fx faster"
+            % (blueprint, name, before, after, before / after)
+        )
+
+
+if __name__ == "__main__":
+    main()
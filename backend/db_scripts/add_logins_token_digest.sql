@@ -0,0 +1,23 @@
+ALTER TABLE `musicloud_db`.`Logins`
+    ADD COLUMN `token_digest` CHAR(64);
+
+UPDATE `musicloud_db`.`Logins` SET token_digest = SHA2(access_token, 256);
+
+-- Keep only the newest row for any token logged in more than once.
+DELETE Older FROM `musicloud_db`.`Logins` AS Older
+INNER JOIN `musicloud_db`.`Logins` AS Newer
+    ON Newer.token_digest = Older.token_digest
+    AND Newer.time_issued > Older.time_issued;
+
+-- Rows duplicated down to the second can't be told apart, so are removed &
+-- those sessions have to log in again.
+DELETE FROM `musicloud_db`.`Logins` WHERE token_digest IN (
+    SELECT token_digest FROM (
+        SELECT token_digest FROM `musicloud_db`.`Logins`
+        GROUP BY token_digest HAVING COUNT(*) > 1
+    ) AS Duplicates
+);
+
+ALTER TABLE `musicloud_db`.`Logins`
+    MODIFY COLUMN `token_digest` CHAR(64) NOT NULL,
+    ADD UNIQUE KEY `token_digest` (token_digest);
@@ -0,0 +1,5 @@
+ALTER TABLE `musicloud_db`.`Notification_Outbox`
+    ADD COLUMN `coalesce_key` VARCHAR(64),
+    ADD COLUMN `actor` VARCHAR(100),
+    ADD COLUMN `summary` TEXT,
+    ADD KEY `coalesce_key` (coalesce_key);
@@ -0,0 +1,5 @@
+ALTER TABLE `musicloud_db`.`Songs`
+    ADD FULLTEXT KEY `title_search` (title);
+
+ALTER TABLE `musicloud_db`.`Users`
+    ADD FULLTEXT KEY `username_search` (username);
@@ -0,0 +1,8 @@
+ALTER TABLE `musicloud_db`.`Songs`
+    ADD COLUMN `likes_count` INT NOT NULL DEFAULT 0;
+
+UPDATE `musicloud_db`.`Songs` LEFT JOIN (
+    SELECT sid, COUNT(*) AS likes FROM `musicloud_db`.`Song_Likes`
+    GROUP BY sid
+) AS Counts ON Counts.sid = Songs.sid
+SET Songs.likes_count = COALESCE(Counts.likes, 0);
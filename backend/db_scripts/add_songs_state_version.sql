@@ -0,0 +1,2 @@
+ALTER TABLE `musicloud_db`.`Songs`
+    ADD COLUMN `state_version` INT NOT NULL DEFAULT 0;
@@ -0,0 +1,13 @@
+INSERT IGNORE INTO `musicloud_db`.`Notification_Audience`
+    (uid, type, did, follower)
+SELECT Followers.following, 'post', did, Followers.follower
+FROM `musicloud_db`.`Followers`
+INNER JOIN `musicloud_db`.`Users` ON Users.uid = Followers.follower
+INNER JOIN `musicloud_db`.`Notifications` ON Notifications.uid = Followers.follower
+WHERE silence_post_notifcation = 0
+UNION ALL
+SELECT Followers.following, 'song', did, Followers.follower
+FROM `musicloud_db`.`Followers`
+INNER JOIN `musicloud_db`.`Users` ON Users.uid = Followers.follower
+INNER JOIN `musicloud_db`.`Notifications` ON Notifications.uid = Followers.follower
+WHERE silence_song_notifcation = 0;
@@ -0,0 +1,17 @@
+INSERT IGNORE INTO `musicloud_db`.`Timeline_Items`
+    (uid, type, item_id, author, time)
+SELECT uid, 'post', post_id, uid, time FROM `musicloud_db`.`Posts`
+UNION ALL
+SELECT follower, 'post', post_id, uid, time FROM `musicloud_db`.`Posts`
+INNER JOIN `musicloud_db`.`Followers` ON following = Posts.uid;
+
+INSERT IGNORE INTO `musicloud_db`.`Timeline_Items`
+    (uid, type, item_id, author, time)
+SELECT uid, 'song', sid, uid, COALESCE(published, created)
+FROM `musicloud_db`.`Songs`
+WHERE public = 1
+UNION ALL
+SELECT follower, 'song', sid, uid, COALESCE(published, created)
+FROM `musicloud_db`.`Songs`
+INNER JOIN `musicloud_db`.`Followers` ON following = Songs.uid
+WHERE public = 1;
@@ -0,0 +1,12 @@
+INSERT INTO `musicloud_db`.`User_Stats`
+    (uid, followers, following, songs, posts, likes)
+SELECT uid,
+    (SELECT COUNT(*) FROM `musicloud_db`.`Followers` WHERE following=Users.uid),
+    (SELECT COUNT(*) FROM `musicloud_db`.`Followers` WHERE follower=Users.uid),
+    (SELECT COUNT(*) FROM `musicloud_db`.`Songs` WHERE uid=Users.uid AND public=1),
+    (SELECT COUNT(*) FROM `musicloud_db`.`Posts` WHERE uid=Users.uid),
+    (SELECT COUNT(*) FROM `musicloud_db`.`Song_Likes` WHERE uid=Users.uid)
+FROM `musicloud_db`.`Users`
+ON DUPLICATE KEY UPDATE
+    followers=VALUES(followers), following=VALUES(following),
+    songs=VALUES(songs), posts=VALUES(posts), likes=VALUES(likes);
@@ -2,5 +2,7 @@ CREATE TABLE `musicloud_db`.`Logins` (
     `uid` INT NOT NULL,
     `access_token` TEXT NOT NULL,
     `time_issued` DATETIME NOT NULL,
+    `token_digest` CHAR(64) NOT NULL,
+    UNIQUE KEY `token_digest` (token_digest),
     FOREIGN KEY (uid) REFERENCES Users(uid)
 );
@@ -0,0 +1,10 @@
+CREATE TABLE `musicloud_db`.`Notification_Audience` (
+    `uid` INT NOT NULL,
+    `type` VARCHAR(4) NOT NULL,
+    `did` VARCHAR(255) NOT NULL,
+    `follower` INT NOT NULL,
+    PRIMARY KEY (uid, type, did),
+    KEY `follower` (follower, uid),
+    KEY `did` (did),
+    FOREIGN KEY (uid) REFERENCES Users(uid) ON DELETE CASCADE
+);
\ No newline at end of file
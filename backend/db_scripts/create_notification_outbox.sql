@@ -0,0 +1,16 @@
+CREATE TABLE `musicloud_db`.`Notification_Outbox` (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `title` VARCHAR(64) NOT NULL,
+    `message` TEXT NOT NULL,
+    `dids` MEDIUMTEXT NOT NULL,
+    `created` DATETIME NOT NULL,
+    `next_attempt` DATETIME NOT NULL,
+    `attempts` INT NOT NULL DEFAULT 0,
+    `claim` CHAR(32),
+    `coalesce_key` VARCHAR(64),
+    `actor` VARCHAR(100),
+    `summary` TEXT,
+    KEY `next_attempt` (next_attempt),
+    KEY `claim` (claim),
+    KEY `coalesce_key` (coalesce_key)
+);
\ No newline at end of file
@@ -1,4 +1,5 @@
 CREATE TABLE `musicloud_db`.`Posts` (
+    `post_id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
     `uid` INT NOT NULL,
     `message` VARCHAR(21844) NOT NULL,
     `time` DATETIME NOT NULL,
@@ -0,0 +1,7 @@
+CREATE TABLE `musicloud_db`.`Revoked_Tokens` (
+    `jti` CHAR(32) NOT NULL PRIMARY KEY,
+    `expires` DATETIME NOT NULL,
+    `revoked` DATETIME NOT NULL,
+    KEY `revoked` (revoked),
+    KEY `expires` (expires)
+);
\ No newline at end of file
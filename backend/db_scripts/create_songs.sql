@@ -10,5 +10,8 @@ CREATE TABLE `musicloud_db`.`Songs` (
     `cover` VARCHAR(255),
     `genre` VARCHAR(50),
     `description` VARCHAR(512),
+    `likes_count` INT NOT NULL DEFAULT 0,
+    `state_version` INT NOT NULL DEFAULT 0,
+    FULLTEXT KEY `title_search` (title),
     FOREIGN KEY (uid) REFERENCES Users(uid)
 );
\ No newline at end of file
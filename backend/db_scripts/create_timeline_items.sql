@@ -0,0 +1,13 @@
+CREATE TABLE `musicloud_db`.`Timeline_Items` (
+    `uid` INT NOT NULL,
+    `type` VARCHAR(4) NOT NULL,
+    `item_id` INT NOT NULL,
+    `author` INT NOT NULL,
+    `time` DATETIME NOT NULL,
+    PRIMARY KEY (uid, type, item_id),
+    KEY `timeline` (uid, time),
+    KEY `typed_timeline` (uid, type, time),
+    KEY `author` (author, uid),
+    KEY `item` (type, item_id),
+    FOREIGN KEY (uid) REFERENCES Users(uid) ON DELETE CASCADE
+);
\ No newline at end of file
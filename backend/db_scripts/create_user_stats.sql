@@ -0,0 +1,9 @@
+CREATE TABLE `musicloud_db`.`User_Stats` (
+    `uid` INT NOT NULL PRIMARY KEY,
+    `followers` INT NOT NULL DEFAULT 0,
+    `following` INT NOT NULL DEFAULT 0,
+    `songs` INT NOT NULL DEFAULT 0,
+    `posts` INT NOT NULL DEFAULT 0,
+    `likes` INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (uid) REFERENCES Users(uid) ON DELETE CASCADE
+);
\ No newline at end of file
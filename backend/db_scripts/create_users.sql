@@ -10,5 +10,6 @@ CREATE TABLE `musicloud_db`.`Users` (
     `silence_song_notifcation` TINYINT DEFAULT 0,
     `silence_like_notifcation` TINYINT DEFAULT 0,
     `root_folder` INT UNIQUE NOT NULL,
+    FULLTEXT KEY `username_search` (username),
     FOREIGN KEY (root_folder) REFERENCES Folder(folder_id) ON DELETE CASCADE
 );
@@ -1,3 +1,8 @@
+DROP TABLE `musicloud_db`.`Notification_Audience`;
+DROP TABLE `musicloud_db`.`Notification_Outbox`;
+DROP TABLE `musicloud_db`.`Revoked_Tokens`;
+DROP TABLE `musicloud_db`.`Timeline_Items`;
+DROP TABLE `musicloud_db`.`User_Stats`;
 DROP TABLE `musicloud_db`.`File`;
 DROP TABLE `musicloud_db`.`Folder`;
 DROP TABLE `musicloud_db`.`Verification`;
@@ -43,6 +48,7 @@ CREATE TABLE `musicloud_db`.`Users` (
     `silence_song_notifcation` TINYINT DEFAULT 0,
     `silence_like_notifcation` TINYINT DEFAULT 0,
     `root_folder` INT UNIQUE NOT NULL,
+    FULLTEXT KEY `username_search` (username),
     FOREIGN KEY (root_folder) REFERENCES Folder(folder_id) ON DELETE CASCADE
 );
 
@@ -58,6 +64,9 @@ CREATE TABLE `musicloud_db`.`Songs` (
     `cover` VARCHAR(255),
     `genre` VARCHAR(50),
     `description` VARCHAR(512),
+    `likes_count` INT NOT NULL DEFAULT 0,
+    `state_version` INT NOT NULL DEFAULT 0,
+    FULLTEXT KEY `title_search` (title),
     FOREIGN KEY (uid) REFERENCES Users(uid)
 );
 
@@ -89,6 +98,7 @@ CREATE TABLE `musicloud_db`.`Resets` (
 );
 
 CREATE TABLE `musicloud_db`.`Posts` (
+    `post_id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
     `uid` INT NOT NULL,
     `message` VARCHAR(21844) NOT NULL,
     `time` DATETIME NOT NULL,
@@ -99,6 +109,8 @@ CREATE TABLE `musicloud_db`.`Logins` (
     `uid` INT NOT NULL,
     `access_token` TEXT NOT NULL,
     `time_issued` DATETIME NOT NULL,
+    `token_digest` CHAR(64) NOT NULL,
+    UNIQUE KEY `token_digest` (token_digest),
     FOREIGN KEY (uid) REFERENCES Users(uid)
 );
 
@@ -145,3 +157,63 @@ CREATE TABLE `musicloud_db`.`Synth` (
     `patch` JSON NOT NULL,
     FOREIGN KEY (uid) REFERENCES Users(uid) ON DELETE CASCADE
 );
+
+CREATE TABLE `musicloud_db`.`User_Stats` (
+    `uid` INT NOT NULL PRIMARY KEY,
+    `followers` INT NOT NULL DEFAULT 0,
+    `following` INT NOT NULL DEFAULT 0,
+    `songs` INT NOT NULL DEFAULT 0,
+    `posts` INT NOT NULL DEFAULT 0,
+    `likes` INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (uid) REFERENCES Users(uid) ON DELETE CASCADE
+);
+
+CREATE TABLE `musicloud_db`.`Timeline_Items` (
+    `uid` INT NOT NULL,
+    `type` VARCHAR(4) NOT NULL,
+    `item_id` INT NOT NULL,
+    `author` INT NOT NULL,
+    `time` DATETIME NOT NULL,
+    PRIMARY KEY (uid, type, item_id),
+    KEY `timeline` (uid, time),
+    KEY `typed_timeline` (uid, type, time),
+    KEY `author` (author, uid),
+    KEY `item` (type, item_id),
+    FOREIGN KEY (uid) REFERENCES Users(uid) ON DELETE CASCADE
+);
+
+CREATE TABLE `musicloud_db`.`Revoked_Tokens` (
+    `jti` CHAR(32) NOT NULL PRIMARY KEY,
+    `expires` DATETIME NOT NULL,
+    `revoked` DATETIME NOT NULL,
+    KEY `revoked` (revoked),
+    KEY `expires` (expires)
+);
+
+CREATE TABLE `musicloud_db`.`Notification_Outbox` (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `title` VARCHAR(64) NOT NULL,
+    `message` TEXT NOT NULL,
+    `dids` MEDIUMTEXT NOT NULL,
+    `created` DATETIME NOT NULL,
+    `next_attempt` DATETIME NOT NULL,
+    `attempts` INT NOT NULL DEFAULT 0,
+    `claim` CHAR(32),
+    `coalesce_key` VARCHAR(64),
+    `actor` VARCHAR(100),
+    `summary` TEXT,
+    KEY `next_attempt` (next_attempt),
+    KEY `claim` (claim),
+    KEY `coalesce_key` (coalesce_key)
+);
+
+CREATE TABLE `musicloud_db`.`Notification_Audience` (
+    `uid` INT NOT NULL,
+    `type` VARCHAR(4) NOT NULL,
+    `did` VARCHAR(255) NOT NULL,
+    `follower` INT NOT NULL,
+    PRIMARY KEY (uid, type, did),
+    KEY `follower` (follower, uid),
+    KEY `did` (did),
+    FOREIGN KEY (uid) REFERENCES Users(uid) ON DELETE CASCADE
+);
\ No newline at end of file
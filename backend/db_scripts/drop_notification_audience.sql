@@ -0,0 +1 @@
+DROP TABLE `musicloud_db`.`Notification_Audience`;
\ No newline at end of file
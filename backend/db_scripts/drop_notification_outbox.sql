@@ -0,0 +1 @@
+DROP TABLE `musicloud_db`.`Notification_Outbox`;
\ No newline at end of file
@@ -0,0 +1 @@
+DROP TABLE `musicloud_db`.`Revoked_Tokens`;
\ No newline at end of file
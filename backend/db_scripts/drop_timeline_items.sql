@@ -0,0 +1 @@
+DROP TABLE `musicloud_db`.`Timeline_Items`;
\ No newline at end of file
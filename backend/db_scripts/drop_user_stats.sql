@@ -0,0 +1 @@
+DROP TABLE `musicloud_db`.`User_Stats`;
\ No newline at end of file
@@ -0,0 +1,41 @@
+"""
+gunicorn settings for serving the API in production, see run.py.
+
+Workers are forked up front & each serves requests from a pool of threads.
+Send the master a HUP signal to reload the code & config gracefully: new
+workers are started & the old ones finish their in flight requests first.
+"""
+import multiprocessing
+import os
+
+# Import src:APP from the backend directory wherever this was started from.
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = "0.0.0.0:%s" % os.environ.get("MUSICLOUD_PORT", 5000)
+
+# Pre-forked worker processes, each serving `threads` requests at once.
+workers = int(os.environ.get(
+    "MUSICLOUD_WORKERS", multiprocessing.cpu_count() * 2 + 1
+))
+worker_class = "gthread"
+threads = int(os.environ.get("MUSICLOUD_THREADS", 4))
+
+# A worker stuck on one request for longer than `timeout` seconds is killed
+# & replaced. On reload or shutdown, workers get `graceful_timeout` seconds
+# to finish what they're serving.
+timeout = int(os.environ.get("MUSICLOUD_REQUEST_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("MUSICLOUD_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("MUSICLOUD_KEEPALIVE", 5))
+
+# Restart each worker after about this many requests, so any slow leak
+# can't grow forever. The jitter stops them all restarting together.
+max_requests = int(os.environ.get("MUSICLOUD_MAX_REQUESTS", 10000))
+max_requests_jitter = max_requests // 10
+
+# The app is imported in each worker after it's forked, so DB connections,
+# caches & background threads are never shared between processes. Warm
+# them up as it's imported, before the worker accepts requests.
+preload_app = False
+raw_env = ["MUSICLOUD_WARMUP=1"]
+
+accesslog = "-"
+errorlog = "-"
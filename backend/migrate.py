@@ -48,6 +48,9 @@ class File(db.Model):
 
 class Users(db.Model):
     __tablename__ = 'Users'
+    __table_args__ = (
+        db.Index('username_search', 'username', mysql_prefix='FULLTEXT'),
+    )
 
     uid = db.Column(
         db.Integer, primary_key=True, nullable=False, unique=True,
@@ -84,6 +87,9 @@ class Synth(db.Model):
 
 class Songs(db.Model):
     __tablename__ = 'Songs'
+    __table_args__ = (
+        db.Index('title_search', 'title', mysql_prefix='FULLTEXT'),
+    )
 
     sid = db.Column(
         db.Integer, primary_key=True, nullable=False, unique=True,
@@ -99,6 +105,8 @@ class Songs(db.Model):
     cover = db.Column(db.VARCHAR(255))
     genre = db.Column(db.VARCHAR(255))
     description = db.Column(db.VARCHAR(512))
+    likes_count = db.Column(db.Integer, nullable=False, default=0)
+    state_version = db.Column(db.Integer, nullable=False, default=0)
 
 
 class Verification(db.Model):
@@ -166,6 +174,7 @@ class Logins(db.Model):
     uid = db.Column(db.Integer, db.ForeignKey(Users.uid), nullable=False)
     access_token = db.Column(db.TEXT, nullable=False)
     time_issued = db.Column(db.DATETIME, nullable=False)
+    token_digest = db.Column(db.CHAR(64), nullable=False, unique=True)
 
 
 class Followers(db.Model):
@@ -230,5 +239,92 @@ class Notifications(db.Model):
     uid = db.Column(db.Integer, db.ForeignKey(Users.uid), nullable=False)
 
 
+class User_Stats(db.Model):
+    __tablename__ = 'User_Stats'
+
+    uid = db.Column(
+        db.Integer, db.ForeignKey(Users.uid, ondelete='CASCADE'),
+        primary_key=True, nullable=False
+    )
+    followers = db.Column(db.Integer, nullable=False, default=0)
+    following = db.Column(db.Integer, nullable=False, default=0)
+    songs = db.Column(db.Integer, nullable=False, default=0)
+    posts = db.Column(db.Integer, nullable=False, default=0)
+    likes = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Timeline_Items(db.Model):
+    __tablename__ = 'Timeline_Items'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('uid', 'type', 'item_id'),
+        db.Index('timeline', 'uid', 'time'),
+        db.Index('typed_timeline', 'uid', 'type', 'time'),
+        db.Index('author', 'author', 'uid'),
+        db.Index('item', 'type', 'item_id'),
+    )
+
+    uid = db.Column(
+        db.Integer, db.ForeignKey(Users.uid, ondelete='CASCADE'),
+        nullable=False
+    )
+    type = db.Column(db.VARCHAR(4), nullable=False)
+    item_id = db.Column(db.Integer, nullable=False)
+    author = db.Column(db.Integer, nullable=False)
+    time = db.Column(db.DATETIME, nullable=False)
+
+
+
+class Revoked_Tokens(db.Model):
+    __tablename__ = 'Revoked_Tokens'
+    __table_args__ = (
+        db.Index('revoked', 'revoked'),
+        db.Index('expires', 'expires'),
+    )
+
+    jti = db.Column(db.CHAR(32), primary_key=True, nullable=False)
+    expires = db.Column(db.DATETIME, nullable=False)
+    revoked = db.Column(db.DATETIME, nullable=False)
+
+
+class Notification_Outbox(db.Model):
+    __tablename__ = 'Notification_Outbox'
+    __table_args__ = (
+        db.Index('next_attempt', 'next_attempt'),
+        db.Index('claim', 'claim'),
+        db.Index('coalesce_key', 'coalesce_key'),
+    )
+
+    id = db.Column(
+        db.Integer, primary_key=True, nullable=False, autoincrement=True
+    )
+    title = db.Column(db.VARCHAR(64), nullable=False)
+    message = db.Column(db.TEXT, nullable=False)
+    dids = db.Column(db.TEXT(16777215), nullable=False)
+    created = db.Column(db.DATETIME, nullable=False)
+    next_attempt = db.Column(db.DATETIME, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    claim = db.Column(db.CHAR(32))
+    coalesce_key = db.Column(db.VARCHAR(64))
+    actor = db.Column(db.VARCHAR(100))
+    summary = db.Column(db.TEXT)
+
+
+class Notification_Audience(db.Model):
+    __tablename__ = 'Notification_Audience'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('uid', 'type', 'did'),
+        db.Index('follower', 'follower', 'uid'),
+        db.Index('did', 'did'),
+    )
+
+    uid = db.Column(
+        db.Integer, db.ForeignKey(Users.uid, ondelete='CASCADE'),
+        nullable=False
+    )
+    type = db.Column(db.VARCHAR(4), nullable=False)
+    did = db.Column(db.VARCHAR(255), nullable=False)
+    follower = db.Column(db.Integer, nullable=False)
+
+
 if __name__ == '__main__':
     manager.run()
@@ -1,18 +1,54 @@
 """
 This is the kick-off function for the backend flask REST API server.
+
+By default the API is served by gunicorn, configured in gunicorn_conf.py.
+Pass --dev to use Flask's single process server instead.
 """
+import argparse
+import os
+import sys
 import traceback
-from wsgiref.simple_server import make_server
 
-from src import APP  # pylint:disable=E0401
-from src.utils import log  # pylint:disable=E0401
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "gunicorn_conf.py")
 
 
-if __name__ == "__main__":
+def run_dev_server(port):
+    """
+    Serve the API from this process, with a thread per request.
+    """
+    # pylint: disable=C0415
+    from src import APP  # pylint:disable=E0401
+    from src.utils import log  # pylint:disable=E0401
+
     try:
-        with make_server('', 5000, APP) as httpd:
-            log("info", "Server startup", "Starting the API server.")
-            httpd.serve_forever()
+        log("info", "Server startup", "Starting the development server.")
+        APP.run(host='', port=port, threaded=True)
     # pylint: disable=W0703
     except Exception:
         log("critical", "Server startup failed", traceback.format_exc())
+
+
+def run_gunicorn():
+    """
+    Serve the API from gunicorn worker processes. The app isn't imported
+    here, each worker imports it after it's forked.
+    """
+    from gunicorn.app.wsgiapp import run  # pylint: disable=C0415
+    sys.argv = [sys.argv[0], "-c", CONFIG_FILE, "src:APP"]
+    run()
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Run the API server.")
+    PARSER.add_argument(
+        "--dev", action="store_true",
+        help="Use Flask's development server instead of gunicorn."
+    )
+    PARSER.add_argument("--port", type=int, default=5000)
+    ARGS = PARSER.parse_args()
+    if ARGS.dev:
+        run_dev_server(ARGS.port)
+    else:
+        os.environ.setdefault("MUSICLOUD_PORT", str(ARGS.port))
+        run_gunicorn()
@@ -1,13 +1,26 @@
 """
 This is were all of the API controllers are connected to the Flask server.
 """
-from flask import Flask
+import time
+
+from flask import Flask, g, request
 from flask_cors import CORS
 
+from .config import AUTH_MODE, WARMUP_CONFIG
+from .utils.compression import compress_response
+from .utils.db_pool import POOL
+from .utils.logger import log
+from .utils.notification_sender import NOTIFICATION_OUTBOX
+from .utils.query_stats import reset_request_stats, get_request_stats
+from .utils.request_metrics import REQUEST_METRICS
+from .utils.revoked_tokens import REVOKED_TOKENS
+from .utils.s3_client import get_s3_client
+
 from .controllers.users.controllers import USERS
 from .controllers.auth.controllers import AUTH
 from .controllers.audio.controllers import AUDIO
 from .controllers.s3.controllers import S3
+from .controllers.metrics.controllers import METRICS
 
 APP = Flask(__name__)
 CORS(APP)
@@ -16,3 +29,91 @@ APP.register_blueprint(USERS, url_prefix='/api/v1/users')
 APP.register_blueprint(AUTH, url_prefix='/api/v1/auth')
 APP.register_blueprint(AUDIO, url_prefix='/api/v1/audio')
 APP.register_blueprint(S3, url_prefix='/api/v1/s3')
+APP.register_blueprint(METRICS, url_prefix='/metrics')
+
+
+def warm_up():
+    """
+    Open DB connections, load the revoked token set, create the S3 client &
+    start the background threads, so the first requests a worker serves
+    don't pay for them. A step that fails is skipped & retried on first use
+    as usual. If the DB can't be reached, the steps needing it are skipped
+    too & it's logged once.
+    :return:
+    Dict - Seconds each step took, None for steps that failed or were skipped.
+    """
+    # (name, step, needs the DB)
+    steps = [
+        ("db_pool", lambda: POOL.warm(WARMUP_CONFIG['warmup_connections']),
+         True),
+        ("s3_client", get_s3_client, False),
+        ("notification_outbox", NOTIFICATION_OUTBOX.start, True),
+    ]
+    if AUTH_MODE == "stateless":
+        steps.append(
+            ("revoked_tokens", lambda: REVOKED_TOKENS.sync(force=True), True)
+        )
+
+    timings = {}
+    failures = []
+    db_down = False
+    for name, step, needs_db in steps:
+        timings[name] = None
+        if needs_db and db_down:
+            continue
+        start = time.monotonic()
+        try:
+            step()
+            timings[name] = round(time.monotonic() - start, 3)
+        except Exception as exc:  # pylint:disable=W0703
+            db_down = db_down or name == "db_pool"
+            failures.append("%s (%s: %s)" % (name, type(exc).__name__, exc))
+    if failures:
+        log("warning", "Warmup failed", "Skipped " + ", ".join(failures))
+    log("info", "Warmup", timings)
+    return timings
+
+
+if WARMUP_CONFIG['enabled']:
+    warm_up()
+
+
+@APP.before_request
+def start_request_stats():
+    """
+    Reset the DB query aggregate & start the timer for the incoming request.
+    """
+    reset_request_stats()
+    g.request_start = time.perf_counter()
+
+
+@APP.after_request
+def add_server_timing(response):
+    """
+    Report the request's DB query count & time in a Server-Timing header,
+    & record its latency, DB time & status code for /metrics.
+    """
+    stats = get_request_stats()
+    start = g.get("request_start")
+    if start is not None:
+        REQUEST_METRICS.observe(
+            request.blueprint or "app",
+            request.url_rule.rule if request.url_rule else "unmatched",
+            request.method, response.status_code,
+            time.perf_counter() - start, stats["db_time_ms"] / 1000
+        )
+    response.headers.add(
+        "Server-Timing",
+        'db;dur=%s;desc="%s queries"' % (
+            stats["db_time_ms"], stats["queries"]
+        )
+    )
+    return response
+
+
+@APP.after_request
+def compress(response):
+    """
+    Compress large JSON & text responses for clients that accept it.
+    """
+    return compress_response(response)
@@ -13,12 +13,100 @@ MYSQL_CONFIG = {
     'raise_on_warnings': True
 }
 
-# SMTP setup for sending email.
+# MySQL connection pool settings. The size is the maximum number of open
+# connections per process, timeout is how many seconds a query waits for a
+# free connection, connections older than max_lifetime seconds are recycled
+# & connections idle for longer than ping_interval seconds are pinged first.
+MYSQL_POOL_CONFIG = {
+    'size': int(os.environ.get('MUSICLOUD_DB_POOL_SIZE', 10)),
+    'timeout': 10,
+    'max_lifetime': 1800,
+    'ping_interval': 30
+}
+
+# Set MUSICLOUD_WARMUP=1 to open warmup_connections DB connections & load the
+# in process caches when the app is created, before it takes any requests.
+# gunicorn_conf.py sets it for every worker.
+WARMUP_CONFIG = {
+    'enabled': os.environ.get('MUSICLOUD_WARMUP') == '1',
+    'warmup_connections': int(os.environ.get('MUSICLOUD_WARMUP_CONNECTIONS', 2))
+}
+
+# Search pages are counted with a COUNT(*) OVER() window function, which
+# needs MySQL 8.0+. Leave MUSICLOUD_DB_WINDOW_FUNCTIONS unset on older
+# servers to count results with a separate query instead.
+DB_WINDOW_FUNCTIONS = os.environ.get('MUSICLOUD_DB_WINDOW_FUNCTIONS') == '1'
+
+# Queries taking longer than this many milliseconds are written to the slow
+# query log. Set MUSICLOUD_SLOW_QUERY_EXPLAIN=1 to also log their EXPLAIN plan.
+SLOW_QUERY_MS = float(os.environ.get('MUSICLOUD_SLOW_QUERY_MS', 200))
+SLOW_QUERY_EXPLAIN = os.environ.get('MUSICLOUD_SLOW_QUERY_EXPLAIN') == '1'
+
+# JSON & text responses of at least min_size bytes are compressed for
+# clients that accept it, with brotli at brotli_quality if the brotli package
+# is installed, or else gzip at gzip_level. Bodies sent with Content-Encoding
+# gzip or br to the routes that accept them may be at most
+# max_compressed_size bytes as sent & max_body_size bytes once decompressed.
+COMPRESSION_CONFIG = {
+    'min_size': int(os.environ.get('MUSICLOUD_COMPRESSION_MIN_SIZE', 1024)),
+    'gzip_level': int(os.environ.get('MUSICLOUD_GZIP_LEVEL', 6)),
+    'brotli_quality': int(os.environ.get('MUSICLOUD_BROTLI_QUALITY', 4)),
+    'max_compressed_size': 8 * 1024 * 1024,
+    'max_body_size': 32 * 1024 * 1024
+}
+
+# /metrics serves request latency histograms & the in process gauges in the
+# Prometheus text format. Each gunicorn worker keeps its own, so a scrape
+# sees the worker that served it. Scrapes must send MUSICLOUD_METRICS_TOKEN
+# as 'Authorization: Bearer <token>', /metrics is disabled until it's set.
+METRICS_TOKEN = os.environ.get('MUSICLOUD_METRICS_TOKEN') or None
+
+# Validated access_tokens are cached per process for up to ttl seconds, so a
+# token revoked by another process is still accepted here for at most that
+# long. Size is the maximum number of tokens cached per process.
+TOKEN_CACHE_CONFIG = {
+    'size': int(os.environ.get('MUSICLOUD_TOKEN_CACHE_SIZE', 10000)),
+    'ttl': float(os.environ.get('MUSICLOUD_TOKEN_CACHE_TTL', 60))
+}
+
+# Auth mode for new logins. 'session' access_tokens are checked against the
+# Logins table. 'stateless' access_tokens are short lived JWTs carrying an
+# exp & jti, renewed with a refresh_token at /auth/refresh & revoked on logout
+# by adding their jti to the Revoked_Tokens table.
+AUTH_MODE = os.environ.get('MUSICLOUD_AUTH_MODE', 'session')
+
+# Lifetimes of stateless access & refresh tokens, in seconds.
+ACCESS_TOKEN_LIFETIME = int(
+    os.environ.get('MUSICLOUD_ACCESS_TOKEN_LIFETIME', 900)
+)
+REFRESH_TOKEN_LIFETIME = int(
+    os.environ.get('MUSICLOUD_REFRESH_TOKEN_LIFETIME', 7 * 24 * 3600)
+)
+
+# How often, in seconds, each process loads tokens revoked by the others.
+REVOCATION_SYNC_INTERVAL = 5
+
+# SMTP setup for sending email. Set MUSICLOUD_SMTP_STARTTLS=0 & leave the
+# user blank to send to a local sink, see benchmarks/smtp_sink.py.
 SMTP_CONFIG = {
     'user': os.environ['MUSICLOUD_SMTP_USER'],
     'password': os.environ['MUSICLOUD_SMTP_PASSWORD'],
     'server': os.environ['MUSICLOUD_SMTP_SERVER'],
-    'sender': os.environ['MUSICLOUD_SMTP_SENDER']
+    'sender': os.environ['MUSICLOUD_SMTP_SENDER'],
+    'port': int(os.environ.get('MUSICLOUD_SMTP_PORT', 587)),
+    'starttls': os.environ.get('MUSICLOUD_SMTP_STARTTLS', '1') == '1',
+    'timeout': 10
+}
+
+# Emails are sent by a pool of worker threads, each keeping one logged in
+# SMTP connection open until it has been idle for idle_timeout seconds. A
+# worker sends up to batch_size queued emails at a time. At most capacity
+# emails wait to be sent, more are dropped.
+MAIL_QUEUE_CONFIG = {
+    'workers': int(os.environ.get('MUSICLOUD_MAIL_WORKERS', 2)),
+    'capacity': int(os.environ.get('MUSICLOUD_MAIL_CAPACITY', 1000)),
+    'batch_size': 50,
+    'idle_timeout': 30
 }
 
 # Host domain for our service.
@@ -30,13 +118,18 @@ PROTOCOL = os.environ['MUSICLOUD_PROTOCOL']
 # JWT signing key.
 JWT_SECRET = os.environ['MUSICLOUD_JWT_SECRET']
 
-# AWS S3 bucket credentials.
+# AWS S3 bucket credentials. EndpointUrl points the S3 client at an S3
+# compatible stand-in, eg. a local moto server, instead of AWS.
 AWS_CREDS = {
     'AWSAccessKeyId': os.environ['MUSICLOUD_AWS_ACCESS_KEY_ID'],
     'AWSSecretAccessKey': os.environ['MUSICLOUD_AWS_ACCESS_KEY'],
     'Bucket': os.environ['MUSICLOUD_AWS_BUCKET'],
+    'EndpointUrl': os.environ.get('MUSICLOUD_AWS_ENDPOINT_URL') or None,
 }
 
+# Max number of files that can be signed by one /s3/signed-form-posts call.
+MAX_SIGNED_FORM_POSTS = 50
+
 # This option controls how long users have to enter a password reset code
 # before it is deemed expired. The unit of time is minutes.
 RESET_TIMEOUT = 30
@@ -47,5 +140,48 @@ BUCKET_URL = os.environ['MUSICLOUD_AWS_BUCKET_URL']
 # Toggle Logging
 LOGGING = True
 
+# Log events are written to api.log as JSON lines by a background thread.
+# At most capacity events wait to be written, more are dropped instead of
+# blocking requests. Each event_name can log burst events at once & rate
+# per second after that. Over the limit, only sample_rate of its events are
+# logged, each noting how many were suppressed since the last one.
+LOG_CONFIG = {
+    'capacity': 10000,
+    'rate': int(os.environ.get('MUSICLOUD_LOG_RATE', 10)),
+    'burst': int(os.environ.get('MUSICLOUD_LOG_BURST', 50)),
+    'sample_rate': 0.01
+}
+
 # Pushy API key
 PUSHY_KEY = os.environ['MUSICLOUD_PUSHY_KEY']
+
+# Pushy API endpoint, can be pointed at benchmarks/fake_pushy.py for testing.
+PUSHY_URL = os.environ.get('MUSICLOUD_PUSHY_URL', 'https://api.pushy.me/push')
+
+# Push notifications are written to the Notification_Outbox table & sent by
+# a background drainer in each process. Every poll_interval seconds, or
+# straight away when a notification is queued, it claims up to batch_size
+# due notifications for lease seconds & sends them to Pushy in calls of at
+# most chunk_size devices. Failed sends are retried after backoff * 2 **
+# attempts seconds, capped at max_backoff, & dropped after max_attempts.
+# Timeout is how many seconds the drainer waits for Pushy to respond. The
+# outbox depth reported by /metrics is counted at most every depth_interval
+# seconds.
+NOTIFICATION_OUTBOX_CONFIG = {
+    'batch_size': int(os.environ.get('MUSICLOUD_NOTIFICATION_BATCH_SIZE', 500)),
+    'chunk_size': int(os.environ.get('MUSICLOUD_NOTIFICATION_CHUNK_SIZE', 1000)),
+    'poll_interval': 5,
+    'lease': 60,
+    'backoff': 2,
+    'max_backoff': 3600,
+    'max_attempts': 10,
+    'timeout': 5,
+    'depth_interval': 30
+}
+
+# Seconds like & follow notifications are held in the outbox, so that any
+# more sent to the same recipient in that time go out as one notification,
+# eg. "X and 37 others liked your song". 0 sends every one straight away.
+NOTIFICATION_COALESCE_WINDOW = int(
+    os.environ.get('MUSICLOUD_NOTIFICATION_COALESCE_WINDOW', 60)
+)
@@ -9,19 +9,21 @@ from math import ceil
 import jwt
 from flask import Blueprint
 from flask import request
-from jsonschema import validate, ValidationError
 
-from ...config import JWT_SECRET
+from ...config import JWT_SECRET, NOTIFICATION_OUTBOX_CONFIG
 from ...middleware.auth_required import auth_required
+from ...middleware.decompress_body import decompress_body
 from ...middleware.sql_err_catcher import sql_err_catcher
-from ...utils.logger import log
+from ...middleware.validate_body import validate_body
 from ...utils import (
     permitted_to_edit, gen_scroll_tokens, gen_song_object, gen_playlist_object,
-    notification_sender, gen_folder_object, gen_file_object, gen_synth_object
+    notification_sender, gen_folder_object, gen_file_object, gen_synth_object,
+    get_keyset, keyset_page, make_etag, etag_headers, not_modified
 )
 from ...models.audio import (
-    insert_song, insert_song_state, get_song_state, get_all_compiled_songs,
-    get_all_compiled_songs_by_uid, get_all_editable_songs_by_uid,
+    insert_song, insert_song_state, get_song_state, get_song_state_version,
+    get_all_compiled_songs, get_all_compiled_songs_by_uid,
+    get_all_editable_songs_by_uid,
     get_number_of_compiled_songs, get_number_of_compiled_songs_by_uid,
     get_number_of_editable_songs_by_uid, get_song_data, post_like, post_unlike,
     get_number_of_liked_songs_by_uid, get_all_liked_songs_by_uid,
@@ -31,15 +33,17 @@ from ...models.audio import (
     get_number_of_songs_in_playlist, get_playlist_data, add_to_playlist,
     remove_from_playlist, get_from_playlist, update_playlist_timestamp,
     update_playlist_name, update_publised_timestamp, notify_like_dids,
-    notify_song_dids, update_song_name, update_description,
-    get_number_of_searchable_songs, get_all_search_results, delete_song_data,
+    update_song_name, update_description,
+    get_search_page, get_all_search_results, delete_song_data,
     create_folder_entry, add_sample, get_folder_entry, delete_folder_entry,
     get_root_folder_entry, delete_file_entry, move_folder_entry,
     move_file_entry, get_child_folders, get_child_files, add_synth, get_synth,
     update_synth, get_all_synths, delete_synth_entry, rename_file_entry,
     rename_folder_entry, update_synth_name
 )
-from ...models.users import get_user_via_username
+from ...models.users import (
+    get_user_via_username, stream_notification_audience
+)
 from ...models.errors import NoResults
 
 AUDIO = Blueprint('audio', __name__)
@@ -48,26 +52,11 @@ AUDIO = Blueprint('audio', __name__)
 @AUDIO.route("", methods=["POST"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.create_song")
 def create_song(user_data):
     """
     Endpoint for creating a new song.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "title": {
-                "type": "string",
-                "minLength": 1
-            }
-        },
-        "required": ["title"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     row_id = insert_song(
         user_data.get("uid"),
         request.json.get("title"),
@@ -90,30 +79,11 @@ def create_song(user_data):
 @AUDIO.route("/rename", methods=["PATCH"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.rename_song")
 def rename_song(user_data):
     """
     Endpoint for renaming new song.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "sid": {
-                "type": "integer",
-                "minimum": 1
-            },
-            "title": {
-                "type": "string",
-                "minLength": 1
-            }
-        },
-        "required": ["sid", "title"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     if not permitted_to_edit(request.json.get("sid"), user_data.get("uid")):
         return {"message": "You can't rename that song!"}, 401
 
@@ -125,29 +95,13 @@ def rename_song(user_data):
 @AUDIO.route("/state", methods=["POST"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@decompress_body()
+@validate_body("audio.save_song")
 def save_song(user_data):
     """
-    Endpoint for saving song state.
-    """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "sid": {
-                "type": "integer",
-                "minimum": 1
-            },
-            "song_state": {
-                "type": "object"
-            }
-        },
-        "required": ["sid", "song_state"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
+    Endpoint for saving song state. The body may be sent gzip or brotli
+    compressed, with the matching Content-Encoding.
+    """
     if permitted_to_edit(request.json.get("sid"), user_data.get("uid")):
         insert_song_state(
             request.json.get("sid"),
@@ -173,20 +127,65 @@ def load_song(user_data):
     if not sid:
         return {"message": "sid param can't be empty!"}, 422
     if permitted_to_edit(sid, user_data.get("uid")):
-        return {"song_state": json.loads(get_song_state(sid))}, 200
+        etag = make_etag("state", sid, get_song_state_version(sid))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        return (
+            {"song_state": json.loads(get_song_state(sid))}, 200,
+            etag_headers(etag)
+        )
     return {"message": "You are not permitted to edit song: " + sid}, 403
 
 
 @AUDIO.route("/compiled_songs", methods=["GET"])
 @sql_err_catcher()
 @auth_required(return_user=True)
-def get_compiled_songs(user_data):  # pylint: disable=R0912,R0915
+def get_compiled_songs(user_data):  # pylint: disable=R0911,R0912,R0915
     """
     Endpoint for getting all publicly available songs.
     """
     next_page = request.args.get('next_page')
     back_page = request.args.get('back_page')
     uid = None
+    keyset = get_keyset(request.args)
+    if keyset is not None:
+        username = keyset.get("username", request.args.get('username'))
+        songs_per_page = int(
+            keyset.get("songs_per_page")
+            or request.args.get('songs_per_page') or 50
+        )
+
+        if username:
+            uid = get_user_via_username(username)[0][0]
+            compiled_songs = get_all_compiled_songs_by_uid(
+                uid, None, songs_per_page, user_data.get("uid"),
+                keyset=keyset
+            )
+        else:
+            compiled_songs = get_all_compiled_songs(
+                None, songs_per_page, user_data.get("uid"), keyset=keyset
+            )
+        etag = make_etag(
+            request.full_path, user_data.get("uid"), compiled_songs
+        )
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        compiled_songs, back_page, next_page = keyset_page(
+            compiled_songs, songs_per_page, keyset,
+            {"username": username, "songs_per_page": songs_per_page}
+        )
+        return {
+            "current_page": keyset.get("current_page"),
+            "total_pages": None,
+            "songs_per_page": songs_per_page,
+            "next_page": next_page,
+            "back_page": back_page,
+            "songs": [gen_song_object(song) for song in compiled_songs],
+        }, 200, etag_headers(etag)
+
     if not next_page and not back_page:
         username = request.args.get('username')
         if username:
@@ -226,6 +225,13 @@ def get_compiled_songs(user_data):  # pylint: disable=R0912,R0915
             compiled_songs = get_all_compiled_songs(
                 start_index, songs_per_page, user_data.get("uid")
             )
+        etag = make_etag(
+            request.full_path, user_data.get("uid"), total_pages,
+            compiled_songs
+        )
+        cached = not_modified(etag)
+        if cached:
+            return cached
 
         res = []
         for song in compiled_songs:
@@ -248,7 +254,7 @@ def get_compiled_songs(user_data):  # pylint: disable=R0912,R0915
             "next_page": next_page,
             "back_page": back_page,
             "songs": res,
-        }, 200
+        }, 200, etag_headers(etag)
     if next_page and back_page:
         return {
             "message": (
@@ -276,6 +282,10 @@ def get_compiled_songs(user_data):  # pylint: disable=R0912,R0915
         compiled_songs = get_all_compiled_songs(
             start_index, songs_per_page, user_data.get("uid")
         )
+    etag = make_etag(request.full_path, user_data.get("uid"), compiled_songs)
+    cached = not_modified(etag)
+    if cached:
+        return cached
 
     res = []
     for song in compiled_songs:
@@ -298,7 +308,7 @@ def get_compiled_songs(user_data):  # pylint: disable=R0912,R0915
         "next_page": next_page,
         "back_page": back_page,
         "songs": res
-    }, 200
+    }, 200, etag_headers(etag)
 
 
 @AUDIO.route("/song", methods=["GET"])
@@ -320,26 +330,11 @@ def get_song(user_data):
 @AUDIO.route("/like", methods=["POST"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.like_song")
 def like_song(user_data):
     """
     Endpoint for liking a song.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "sid": {
-                "type": "integer",
-                "minimum": 1
-            }
-        },
-        "required": ["sid"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     try:
         song = get_song_data(
             request.json.get("sid"), user_data.get("uid")
@@ -363,7 +358,10 @@ def like_song(user_data):
             user_data.get("username") + " just liked your song: \""
             + song[0][2] + "\""
         )
-        notification_sender(message, dids, "New Like")
+        notification_sender(message, dids, "New Like", (
+            "like:" + str(request.json.get("sid")), user_data.get("username"),
+            " liked your song: \"" + song[0][2] + "\""
+        ))
     except NoResults:
         pass
 
@@ -373,26 +371,11 @@ def like_song(user_data):
 @AUDIO.route("/unlike", methods=["POST"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.unlike_song")
 def unlike_song(user_data):
     """
     Endpoint for unliking a song.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "sid": {
-                "type": "integer",
-                "minimum": 1
-            }
-        },
-        "required": ["sid"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     try:
         song = get_song_data(
             request.json.get("sid"), user_data.get("uid")
@@ -518,6 +501,35 @@ def get_liked_songs(user_data):
     """
     next_page = request.args.get('next_page')
     back_page = request.args.get('back_page')
+    keyset = get_keyset(request.args)
+    if keyset is not None:
+        uid = keyset.get("uid")
+        if uid is None:
+            username = request.args.get('username')
+            if not username:
+                return {"message": "username param can't be empty!"}, 422
+            uid = get_user_via_username(username)[0][0]
+        songs_per_page = int(
+            keyset.get("songs_per_page")
+            or request.args.get('songs_per_page') or 50
+        )
+
+        liked_songs, back_page, next_page = keyset_page(
+            get_all_liked_songs_by_uid(
+                uid, None, songs_per_page, user_data.get("uid"), keyset
+            ),
+            songs_per_page, keyset,
+            {"uid": uid, "songs_per_page": songs_per_page}
+        )
+        return {
+            "current_page": keyset.get("current_page"),
+            "total_pages": None,
+            "songs_per_page": songs_per_page,
+            "next_page": next_page,
+            "back_page": back_page,
+            "songs": [gen_song_object(song) for song in liked_songs],
+        }, 200
+
     if not next_page and not back_page:
         username = request.args.get('username')
         if not username:
@@ -625,26 +637,11 @@ def get_liked_songs(user_data):
 @AUDIO.route("/publish", methods=["POST"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.publish_song")
 def publish_song(user_data):
     """
     Endpoint for updating a songs public state to public.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "sid": {
-                "type": "integer",
-                "minimum": 1
-            }
-        },
-        "required": ["sid"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     if not permitted_to_edit(request.json.get("sid"), user_data.get("uid")):
         return {"message": "You can't publish that song!"}, 401
 
@@ -661,17 +658,15 @@ def publish_song(user_data):
     except NoResults:
         return {"message": "Song does not exist!"}, 400
 
-    try:
-        dids = []
-        for did in notify_song_dids(user_data.get("uid")):
-            dids += did
-        message = (
-            user_data.get("username") + " just dropped a new song: \""
-            + title + "\""
-        )
+    message = (
+        user_data.get("username") + " just dropped a new song: \""
+        + title + "\""
+    )
+    for dids in stream_notification_audience(
+            user_data.get("uid"), "song",
+            NOTIFICATION_OUTBOX_CONFIG['chunk_size']
+    ):
         notification_sender(message, dids, "New Song")
-    except NoResults:
-        pass
 
     return {"message": "Song published."}, 200
 
@@ -679,26 +674,11 @@ def publish_song(user_data):
 @AUDIO.route("/unpublish", methods=["POST"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.unpublish_song")
 def unpublish_song(user_data):
     """
     Endpoint for updating a songs public state to private.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "sid": {
-                "type": "integer",
-                "minimum": 1
-            }
-        },
-        "required": ["sid"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     if not permitted_to_edit(request.json.get("sid"), user_data.get("uid")):
         return {"message": "You can't publish that song!"}, 401
 
@@ -711,39 +691,11 @@ def unpublish_song(user_data):
 @AUDIO.route("/compiled_url", methods=["PATCH"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.compiled_url")
 def compiled_url(user_data):
     """
     Endpoint for updating a songs compiled version URl.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "sid": {
-                "type": "integer",
-                "minimum": 1
-            },
-            "url": {
-                "type": "string",
-                "pattern": (
-                    r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|"
-                    r"(?:%[0-9a-fA-F][0-9a-fA-F]))+"
-                ),
-                "minLength": 1
-            },
-            "duration": {
-                "type": "integer",
-                "minimum": 0
-            }
-        },
-        "required": ["sid", "url", "duration"],
-        "minProperties": 3
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     if not permitted_to_edit(request.json.get("sid"), user_data.get("uid")):
         return {"message": "You can't update that song!"}, 401
 
@@ -758,35 +710,11 @@ def compiled_url(user_data):
 @AUDIO.route("/cover_art", methods=["PATCH"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.cover_url")
 def cover_url(user_data):
     """
     Endpoint for updating a songs cover art URl.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "sid": {
-                "type": "integer",
-                "minimum": 1
-            },
-            "url": {
-                "type": "string",
-                "pattern": (
-                    r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|"
-                    r"[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+"
-                ),
-                "minLength": 1
-            }
-        },
-        "required": ["sid", "url"],
-        "minProperties": 2
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     if not permitted_to_edit(request.json.get("sid"), user_data.get("uid")):
         return {"message": "You can't update that song!"}, 401
 
@@ -797,26 +725,11 @@ def cover_url(user_data):
 @AUDIO.route("/playlist", methods=["POST"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.create_a_playlist")
 def create_a_playlist(user_data):
     """
     Endpoint for creating a playlist.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "title": {
-                "type": "string",
-                "minLength": 1
-            }
-        },
-        "required": ["title"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     pid = create_playlist(user_data.get("uid"), request.json.get("title"))
 
     return {"message": "Playlist created", "pid": pid}, 200
@@ -825,26 +738,11 @@ def create_a_playlist(user_data):
 @AUDIO.route("/playlist", methods=["DELETE"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.delete_my_playlist")
 def delete_my_playlist(user_data):
     """
     Endpoint for deleting a playlist.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "pid": {
-                "type": "integer",
-                "minimum": 1
-            }
-        },
-        "required": ["pid"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     pid = request.json.get("pid")
 
     try:
@@ -897,6 +795,10 @@ def get_my_playlists(user_data):
         start_index = (current_page * playlists_per_page) - playlists_per_page
 
         playlists = get_playlists(uid, start_index, playlists_per_page)
+        etag = make_etag(request.full_path, uid, total_pages, playlists)
+        cached = not_modified(etag)
+        if cached:
+            return cached
 
         res = []
         for playlist in playlists:
@@ -918,7 +820,7 @@ def get_my_playlists(user_data):
             "next_page": next_page,
             "back_page": back_page,
             "playlists": res,
-        }, 200
+        }, 200, etag_headers(etag)
     if next_page and back_page:
         return {
             "message": (
@@ -937,6 +839,10 @@ def get_my_playlists(user_data):
     start_index = (current_page * playlists_per_page) - playlists_per_page
 
     playlists = get_playlists(uid, start_index, playlists_per_page)
+    etag = make_etag(request.full_path, uid, playlists)
+    cached = not_modified(etag)
+    if cached:
+        return cached
 
     res = []
     for playlist in playlists:
@@ -958,36 +864,17 @@ def get_my_playlists(user_data):
         "next_page": next_page,
         "back_page": back_page,
         "playlists": res
-    }, 200
+    }, 200, etag_headers(etag)
 
 
 @AUDIO.route("/playlist", methods=["PATCH"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.rename_playlist")
 def rename_playlist(user_data):
     """
     Endpoint for renaming a playlist.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "pid": {
-                "type": "integer",
-                "minimum": 1
-            },
-            "title": {
-                "type": "string",
-                "minLength": 1
-            }
-        },
-        "required": ["pid", "title"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     pid = request.json.get("pid")
 
     try:
@@ -1011,6 +898,41 @@ def get_my_playlist_songs(user_data):  # pylint: disable=R0911
     """
     next_page = request.args.get('next_page')
     back_page = request.args.get('back_page')
+    keyset = get_keyset(request.args)
+    if keyset is not None:
+        pid = keyset.get("pid")
+        if pid is None:
+            pid = request.args.get('pid')
+            if not pid:
+                return {"message": "No PID sent"}, 422
+            pid = int(pid)
+            try:
+                ownder_uid = get_playlist(pid)[0][1]
+            except IndexError:
+                return {"message": "Invalid pid"}, 422
+            if ownder_uid != user_data.get("uid"):
+                return {"message": "Not permitted see that playlist"}, 401
+        songs_per_page = int(
+            keyset.get("songs_per_page")
+            or request.args.get('songs_per_page') or 50
+        )
+
+        songs, back_page, next_page = keyset_page(
+            get_playlist_data(
+                pid, None, songs_per_page, user_data.get("uid"), keyset
+            ),
+            songs_per_page, keyset,
+            {"pid": pid, "songs_per_page": songs_per_page}
+        )
+        return {
+            "current_page": keyset.get("current_page"),
+            "total_pages": None,
+            "songs_per_page": songs_per_page,
+            "next_page": next_page,
+            "back_page": back_page,
+            "songs": [gen_song_object(song) for song in songs],
+        }, 200
+
     if not next_page and not back_page:
         pid = request.args.get('pid')
         if not pid:
@@ -1124,30 +1046,11 @@ def get_my_playlist_songs(user_data):  # pylint: disable=R0911
 @AUDIO.route("/playlist_songs", methods=["POST"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.add_song_to_playlist")
 def add_song_to_playlist(user_data):  # pylint: disable=R0911
     """
     Endpoint for adding a sing to a playlist.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "pid": {
-                "type": "integer",
-                "minimum": 1
-            },
-            "sid": {
-                "type": "integer",
-                "minimum": 1
-            }
-        },
-        "required": ["pid", "sid"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     try:
         ownder_uid = get_playlist(request.json.get('pid'))[0][1]
     except IndexError:
@@ -1176,30 +1079,11 @@ def add_song_to_playlist(user_data):  # pylint: disable=R0911
 @AUDIO.route("/playlist_songs", methods=["DELETE"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.remove_song_from_playlist")
 def remove_song_from_playlist(user_data):
     """
     Endpoint for adding a sing to a playlist.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "pid": {
-                "type": "integer",
-                "minimum": 1
-            },
-            "sid": {
-                "type": "integer",
-                "minimum": 1
-            }
-        },
-        "required": ["pid", "sid"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     try:
         ownder_uid = get_playlist(request.json.get('pid'))[0][1]
     except IndexError:
@@ -1215,31 +1099,11 @@ def remove_song_from_playlist(user_data):
 @AUDIO.route("/description", methods=["PATCH"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.description")
 def description(user_data):
     """
     Endpoint for updating a songs description.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "sid": {
-                "type": "integer",
-                "minimum": 1
-            },
-            "description": {
-                "type": "string",
-                "minLength": 1
-            }
-        },
-        "required": ["sid", "description"],
-        "minProperties": 2
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     if not permitted_to_edit(request.json.get("sid"), user_data.get("uid")):
         return {"message": "You can't update that song!"}, 401
 
@@ -1249,6 +1113,56 @@ def description(user_data):
     return {"message": "Description updated."}, 200
 
 
+def search_keyset_page(
+        uid, keyset, search_term, profile_search, songs_per_page
+):
+    """
+    Get a keyset paginated page of search results, see utils.keyset.
+    :param uid:
+    Int - Your user ID.
+    :param keyset:
+    Dict - Keyset pagination state, with the name of the search's sort.
+    :param search_term:
+    Str|None - Title or username to search for.
+    :param profile_search:
+    Bool - True if searching your own profile.
+    :param songs_per_page:
+    Int - Number of songs on a page.
+    :return:
+    Tuple - The /search response body & status code.
+    """
+    if search_term:
+        search_results = get_all_search_results(
+            None, songs_per_page, uid, search_term, None, profile_search,
+            keyset
+        )
+    elif profile_search:
+        search_results = get_all_compiled_songs_by_uid(
+            uid, None, songs_per_page, uid, keyset=keyset
+        )
+    else:
+        search_results = get_all_compiled_songs(
+            None, songs_per_page, uid, keyset=keyset
+        )
+
+    search_results, back_page, next_page = keyset_page(
+        search_results, songs_per_page, keyset, {
+            "search_term": search_term,
+            "sort": keyset.get("sort"),
+            "songs_per_page": songs_per_page,
+            "profile_search": profile_search,
+        }
+    )
+    return {
+        "current_page": keyset.get("current_page"),
+        "total_pages": None,
+        "songs_per_page": songs_per_page,
+        "next_page": next_page,
+        "back_page": back_page,
+        "songs": [gen_song_object(song) for song in search_results],
+    }, 200
+
+
 @AUDIO.route("/search", methods=["GET"])
 @sql_err_catcher()
 @auth_required(return_user=True)
@@ -1259,6 +1173,7 @@ def search_songs(user_data):  # pylint: disable=R0911,R0912,R0914,R0915
 
     next_page = request.args.get('next_page')
     back_page = request.args.get('back_page')
+    keyset = get_keyset(request.args)
     if not next_page and not back_page:
         profile_search = False
         search_my_profile = request.args.get('profile_search')
@@ -1266,15 +1181,6 @@ def search_songs(user_data):  # pylint: disable=R0911,R0912,R0914,R0915
             profile_search = True
 
         search_term = request.args.get('search_term')
-        if search_term:
-            total_songs = get_number_of_searchable_songs(search_term)
-        else:
-            if profile_search:
-                total_songs = get_number_of_compiled_songs_by_uid(
-                    user_data.get("uid")
-                )
-            else:
-                total_songs = get_number_of_compiled_songs()
 
         publish_sort = request.args.get('publish_sort')
         title_sort = request.args.get('title_sort')
@@ -1288,6 +1194,7 @@ def search_songs(user_data):  # pylint: disable=R0911,R0912,R0914,R0915
         ]
 
         sort_sql = None
+        sort = None
         if sorts:
             if len(sorts) > 1:
                 return {
@@ -1309,24 +1216,28 @@ def search_songs(user_data):  # pylint: disable=R0911,R0912,R0914,R0915
                 }, 400
 
             if publish_sort:
+                sort = "publish_" + sorts[0]
                 if sorts[0] == "up":
                     sort_sql = " ORDER BY published ASC "
                 else:
                     sort_sql = " ORDER BY published DESC "
 
             if title_sort:
+                sort = "title_" + sorts[0]
                 if sorts[0] == "up":
                     sort_sql = " ORDER BY title DESC "
                 else:
                     sort_sql = " ORDER BY title ASC "
 
             if artist_sort:
+                sort = "artist_" + sorts[0]
                 if sorts[0] == "up":
                     sort_sql = " ORDER BY username DESC, sid ASC "
                 else:
                     sort_sql = " ORDER BY username ASC, sid ASC "
 
             if duration_sort:
+                sort = "duration_" + sorts[0]
                 if sorts[0] == "up":
                     sort_sql = " ORDER BY duration ASC "
                 else:
@@ -1337,11 +1248,34 @@ def search_songs(user_data):  # pylint: disable=R0911,R0912,R0914,R0915
             songs_per_page = 50
         songs_per_page = int(songs_per_page)
 
+        if keyset is not None:
+            keyset["sort"] = sort
+            return search_keyset_page(
+                user_data.get("uid"), keyset, search_term, profile_search,
+                songs_per_page
+            )
+
         current_page = request.args.get('current_page')
         if not current_page:
             current_page = 1
         current_page = int(current_page)
 
+        start_index = (current_page * songs_per_page) - songs_per_page
+
+        if search_term:
+            # The search index returns the page & the total together.
+            total_songs, search_results = get_search_page(
+                start_index, songs_per_page, user_data.get("uid"), search_term,
+                sort_sql, profile_search
+            )
+        else:
+            if profile_search:
+                total_songs = get_number_of_compiled_songs_by_uid(
+                    user_data.get("uid")
+                )
+            else:
+                total_songs = get_number_of_compiled_songs()
+
         total_pages = ceil(total_songs / songs_per_page)
         if total_pages == 0:
             total_pages = 1
@@ -1353,14 +1287,7 @@ def search_songs(user_data):  # pylint: disable=R0911,R0912,R0914,R0915
                 )
             }, 422
 
-        start_index = (current_page * songs_per_page) - songs_per_page
-
-        if search_term:
-            search_results = get_all_search_results(
-                start_index, songs_per_page, user_data.get("uid"), search_term,
-                sort_sql, profile_search
-            )
-        else:
+        if not search_term:
             if profile_search:
                 search_results = get_all_compiled_songs_by_uid(
                     user_data.get("uid"), start_index, songs_per_page,
@@ -1406,6 +1333,11 @@ def search_songs(user_data):  # pylint: disable=R0911,R0912,R0914,R0915
     if not token:
         token = back_page
     token = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+    if keyset is not None:
+        return search_keyset_page(
+            user_data.get("uid"), keyset, token.get("search_term"),
+            token.get("profile_search"), token.get("songs_per_page")
+        )
 
     search_term = token.get("search_term")
     sort_sql = token.get("sort_sql")
@@ -1461,26 +1393,11 @@ def search_songs(user_data):  # pylint: disable=R0911,R0912,R0914,R0915
 @AUDIO.route("", methods=["DELETE"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.delete_song")
 def delete_song(user_data):
     """
     Endpoint for deleting a song.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "sid": {
-                "type": "integer",
-                "minimum": 1
-            }
-        },
-        "required": ["sid"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     try:
         get_song_data(request.json.get("sid"), user_data.get("uid"))
     except NoResults:
@@ -1497,30 +1414,11 @@ def delete_song(user_data):
 @AUDIO.route("/folders", methods=["POST"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.create_folder")
 def create_folder(user_data):  # pylint: disable=R0911
     """
     Endpoint for creating a folder in the DB.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "folder_name": {
-                "type": "string",
-                "minLength": 1
-            },
-            "parent_folder_id": {
-                "type": "integer",
-                "minimum": 1
-            }
-        },
-        "required": ["folder_name"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     if request.json.get("parent_folder_id"):
         try:
             get_folder_entry(request.json.get("parent_folder_id"))
@@ -1545,34 +1443,11 @@ def create_folder(user_data):  # pylint: disable=R0911
 @AUDIO.route("/files", methods=["POST"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.create_file")
 def create_file(user_data):  # pylint: disable=R0911
     """
     Endpoint for creating a File in the DB.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "file_name": {
-                "type": "string",
-                "minLength": 1
-            },
-            "file_url": {
-                "type": "string",
-                "minLength": 1
-            },
-            "folder_id": {
-                "type": "integer",
-                "minimum": 1
-            }
-        },
-        "required": ["file_name", "file_url"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     if request.json.get("folder_id"):
         try:
             get_folder_entry(request.json.get("folder_id"))
@@ -1697,53 +1572,40 @@ def read_folder(user_data):  # pylint: disable=R0911
         folder_id = get_user_via_username(user_data.get("username"))[0][-1]
 
     try:
-        row = get_folder_entry(folder_id)
-        res["folder_id"] = row[0][0]
-        res["folder_name"] = row[0][2]
-        row = get_child_folders(folder_id)
-        folders = []
-        for folder in row:
-            folders.append(gen_folder_object(folder))
-        res["child_folders"] = folders
-        row = get_child_files(folder_id)
-        files = []
-        for file in row:
-            files.append(gen_file_object(file))
-        res["child_files"] = files
+        entry = get_folder_entry(folder_id)
     except NoResults:
         return {
             "message": ("Invalid folder ID. Folder does not exist!")
         }, 400
-
-    return {"folder": res}, 200
+    child_folders = get_child_folders(folder_id)
+    child_files = get_child_files(folder_id)
+    etag = make_etag(folder_id, entry, child_folders, child_files)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    res["folder_id"] = entry[0][0]
+    res["folder_name"] = entry[0][2]
+    folders = []
+    for folder in child_folders:
+        folders.append(gen_folder_object(folder))
+    res["child_folders"] = folders
+    files = []
+    for file in child_files:
+        files.append(gen_file_object(file))
+    res["child_files"] = files
+
+    return {"folder": res}, 200, etag_headers(etag)
 
 
 @AUDIO.route("/synth", methods=["POST"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.create_synth")
 def create_synth(user_data):  # pylint: disable=R0911
     """
     Endpoint for creating a Synth in the DB.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "name": {
-                "type": "string",
-                "minLength": 1
-            },
-            "patch": {
-                "type": "object"
-            }
-        },
-        "required": ["name"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     patch = json.dumps({})
     if request.json.get("patch"):
         patch = json.dumps(request.json.get("patch"))
@@ -1759,28 +1621,11 @@ def create_synth(user_data):  # pylint: disable=R0911
 @AUDIO.route("/synth", methods=["PATCH"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("audio.edit_synth")
 def edit_synth(user_data):  # pylint: disable=R0911
     """
     Endpoint for updating a synth in the DB.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "patch": {
-                "type": "object"
-            },
-            "name": {
-                "type": "string",
-                "minLength": 1
-            }
-        }
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     synth_id = request.args.get('id')
     if not synth_id:
         return {"message": "No id sent"}, 422
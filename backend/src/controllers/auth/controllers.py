@@ -10,21 +10,22 @@ from flask import request
 from flask import send_file
 from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
-from jsonschema import validate, ValidationError
 from mysql.connector.errors import IntegrityError
 
-from ...config import JWT_SECRET
-from ...utils.logger import log
+from ...config import JWT_SECRET, AUTH_MODE
+from ...utils import gen_session_tokens
+from ...utils.revoked_tokens import REVOKED_TOKENS
 from ...models.verification import (
     get_verification_by_code, delete_verification
 )
 from ...models.users import (
-    verify_user, get_user_via_username, register_device_for_notifications,
-    unregister_device_for_notifications
+    verify_user, get_user_via_username, get_user_via_uid,
+    register_device_for_notifications, unregister_device_for_notifications
 )
 from ...models.auth import insert_login, delete_login
 from ...middleware.auth_required import auth_required
 from ...middleware.sql_err_catcher import sql_err_catcher
+from ...middleware.validate_body import validate_body
 
 AUTH = Blueprint('auth', __name__)
 HASHER = PasswordHasher()
@@ -49,34 +50,11 @@ def verify():
 
 @AUTH.route('/login', methods=["POST"])
 @sql_err_catcher()
+@validate_body("auth.login")
 def login():
     """
     Endpoint for logging in.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "username": {
-                "type": "string",
-                "minLength": 1
-            },
-            "password": {
-                "type": "string",
-                "minLength": 1
-            },
-            "did": {
-                "type": "string",
-                "minLength": 1
-            }
-        },
-        "required": ["username", "password"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     user = get_user_via_username(request.json.get("username"))
 
     # Check the user's password against the provided one
@@ -89,6 +67,17 @@ def login():
     if user[0][4] == 0:
         return {"message": "Account not verified."}, 403
 
+    try:
+        if request.json.get("did"):
+            register_device_for_notifications(
+                request.json.get("did"), user[0][0]
+            )
+    except IntegrityError:
+        pass
+
+    if AUTH_MODE == "stateless":
+        return gen_session_tokens(user[0][0], user[0][2]), 200
+
     time_issued = datetime.datetime.utcnow()
 
     jwt_payload = {
@@ -101,14 +90,6 @@ def login():
 
     insert_login(user[0][0], access_token.decode('utf-8'), time_issued)
 
-    try:
-        if request.json.get("did"):
-            register_device_for_notifications(
-                request.json.get("did"), user[0][0]
-            )
-    except IntegrityError:
-        pass
-
     return {"access_token": access_token.decode('utf-8')}, 200
 
 
@@ -119,7 +100,22 @@ def logout(user_data, access_token):
     """
     Endpoint for logging out.
     """
-    delete_login(access_token)
+    if user_data.get("jti"):
+        REVOKED_TOKENS.revoke(user_data.get("jti"), user_data.get("exp"))
+        refresh_token = request.json and request.json.get("refresh_token")
+        try:
+            refresh_token = refresh_token and jwt.decode(
+                refresh_token, JWT_SECRET, algorithms=['HS256']
+            )
+        except jwt.exceptions.InvalidTokenError:
+            # Expired or invalid refresh_tokens can't be used anyway.
+            refresh_token = None
+        if refresh_token and refresh_token.get("uid") == user_data.get("uid"):
+            REVOKED_TOKENS.revoke(
+                refresh_token.get("jti"), refresh_token.get("exp")
+            )
+    else:
+        delete_login(access_token)
 
     if request.json and request.json.get("did"):
         unregister_device_for_notifications(
@@ -127,3 +123,37 @@ def logout(user_data, access_token):
         )
 
     return {"message": "User has been successfully logged out!"}, 200
+
+
+@AUTH.route('/refresh', methods=["POST"])
+@sql_err_catcher()
+@validate_body("auth.refresh")
+def refresh():
+    """
+    Endpoint for swapping a stateless refresh_token for new tokens.
+    """
+    try:
+        refresh_token = jwt.decode(
+            request.json.get("refresh_token"), JWT_SECRET,
+            algorithms=['HS256']
+        )
+    except jwt.exceptions.ExpiredSignatureError:
+        return {"message": "Token expired."}, 401
+    except jwt.exceptions.InvalidTokenError:
+        return {"message": "Bad refresh_token."}, 401
+
+    if refresh_token.get("type") != "refresh" or not all(
+            claim in refresh_token for claim in ("uid", "jti", "exp")
+    ):
+        return {"message": "Bad refresh_token."}, 401
+
+    # Refresh tokens are single use. Claim it before issuing new tokens, so
+    # two requests with the same token can't both succeed.
+    if not REVOKED_TOKENS.claim(
+            refresh_token.get("jti"), refresh_token.get("exp")
+    ):
+        return {"message": "Token expired."}, 401
+
+    # Raises NoResults if the user has since been deleted.
+    user = get_user_via_uid(refresh_token.get("uid"))
+    return gen_session_tokens(user[0][0], user[0][2]), 200
@@ -0,0 +1,214 @@
+"""
+/metrics API controller code.
+"""
+import hmac
+
+from flask import Blueprint, request
+
+from ...config import METRICS_TOKEN
+from ...utils.db_pool import POOL
+from ...utils.logger import log_metrics
+from ...utils.notification_sender import NOTIFICATION_OUTBOX
+from ...utils.request_metrics import REQUEST_METRICS
+from ...utils.send_mail import MAIL_QUEUE
+from ...utils.token_cache import TOKEN_CACHE
+
+METRICS = Blueprint('metrics', __name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (metric name, source key, type, help) for each in process snapshot.
+POOL_METRICS = [
+    ("musicloud_db_pool_size", "size", "gauge",
+     "Max DB connections in the pool."),
+    ("musicloud_db_pool_open", "open", "gauge", "Open DB connections."),
+    ("musicloud_db_pool_idle", "idle", "gauge", "Idle DB connections."),
+    ("musicloud_db_pool_in_use", "in_use", "gauge",
+     "DB connections borrowed by requests."),
+    ("musicloud_db_pool_acquired_total", "acquired", "counter",
+     "DB connections handed out."),
+    ("musicloud_db_pool_created_total", "created", "counter",
+     "DB connections opened."),
+    ("musicloud_db_pool_recycled_total", "recycled", "counter",
+     "DB connections closed for being too old."),
+    ("musicloud_db_pool_health_check_failures_total",
+     "health_check_failures", "counter",
+     "Idle DB connections that failed a ping."),
+    ("musicloud_db_pool_discarded_total", "discarded", "counter",
+     "DB connections discarded after an error."),
+    ("musicloud_db_pool_waits_total", "waits", "counter",
+     "Acquires that waited for a connection."),
+    ("musicloud_db_pool_exhausted_total", "exhausted", "counter",
+     "Acquires that timed out waiting for a connection."),
+]
+TOKEN_CACHE_METRICS = [
+    ("musicloud_token_cache_size", "size", "gauge",
+     "Max access_tokens cached."),
+    ("musicloud_token_cache_entries", "entries", "gauge",
+     "Access_tokens cached."),
+    ("musicloud_token_cache_hits_total", "hits", "counter",
+     "Access_token lookups served from the cache."),
+    ("musicloud_token_cache_misses_total", "misses", "counter",
+     "Access_token lookups read from the DB."),
+    ("musicloud_token_cache_evictions_total", "evictions", "counter",
+     "Access_tokens evicted to make room."),
+    ("musicloud_token_cache_hit_ratio", "hit_ratio", "gauge",
+     "Share of access_token lookups served from the cache."),
+]
+OUTBOX_METRICS = [
+    ("musicloud_notification_outbox_depth", "depth", "gauge",
+     "Notifications waiting in the outbox."),
+    ("musicloud_notification_outbox_claimed_total", "claimed", "counter",
+     "Notifications claimed for sending."),
+    ("musicloud_notification_outbox_sent_total", "sent", "counter",
+     "Notifications sent."),
+    ("musicloud_notification_outbox_requests_total", "requests", "counter",
+     "Calls made to Pushy."),
+    ("musicloud_notification_outbox_failed_requests_total",
+     "failed_requests", "counter", "Calls to Pushy that failed."),
+    ("musicloud_notification_outbox_retried_total", "retried", "counter",
+     "Notifications released to be retried."),
+    ("musicloud_notification_outbox_dropped_total", "dropped", "counter",
+     "Notifications dropped after max_attempts."),
+    ("musicloud_notification_outbox_last_lag_seconds", "last_lag", "gauge",
+     "Longest wait before sending in the last drain."),
+    ("musicloud_notification_outbox_mean_lag_seconds", "mean_lag", "gauge",
+     "Mean wait before sending."),
+]
+MAIL_QUEUE_METRICS = [
+    ("musicloud_mail_queue_depth", "depth", "gauge", "Emails waiting."),
+    ("musicloud_mail_queue_capacity", "capacity", "gauge",
+     "Max emails waiting."),
+    ("musicloud_mail_queue_busy_workers", "busy_workers", "gauge",
+     "Workers sending emails."),
+    ("musicloud_mail_queue_submitted_total", "submitted", "counter",
+     "Emails queued."),
+    ("musicloud_mail_queue_completed_total", "completed", "counter",
+     "Emails sent."),
+    ("musicloud_mail_queue_failed_total", "failed", "counter",
+     "Emails that failed to send."),
+    ("musicloud_mail_queue_rejected_total", "rejected", "counter",
+     "Emails rejected because the queue was full."),
+]
+LOG_METRICS = [
+    ("musicloud_log_depth", "depth", "gauge", "Log events waiting."),
+    ("musicloud_log_logged_total", "logged", "counter", "Log events written."),
+    ("musicloud_log_suppressed_total", "suppressed", "counter",
+     "Log events suppressed by rate limiting."),
+    ("musicloud_log_dropped_total", "dropped", "counter",
+     "Log events dropped because the queue was full."),
+]
+
+
+def format_labels(names, values):
+    """
+    Format a metric's labels.
+    :param names:
+    Tuple - Label names.
+    :param values:
+    Tuple - Label values, in the same order.
+    :return:
+    Str - Eg. {route="/api/v1/audio/state",method="GET"}.
+    """
+    return "{" + ",".join(
+        '%s="%s"' % (name, str(value).replace("\\", "\\\\")
+                     .replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    ) + "}"
+
+
+def format_histograms(lines, name, description, snapshots):
+    """
+    Add a histogram, with one series per label set, to the exposition.
+    :param lines:
+    List - Lines of the exposition.
+    :param name:
+    Str - Metric name.
+    :param description:
+    Str - Metric help text.
+    :param snapshots:
+    Dict - Histogram snapshots keyed by (blueprint, route, method).
+    """
+    lines.append("# HELP %s %s" % (name, description))
+    lines.append("# TYPE %s histogram" % name)
+    names = ("blueprint", "route", "method")
+    for key, snapshot in sorted(snapshots.items()):
+        for bound, count in snapshot["buckets"]:
+            lines.append("%s_bucket%s %s" % (
+                name, format_labels(names + ("le",), key + (bound,)), count
+            ))
+        labels = format_labels(names, key)
+        lines.append("%s_sum%s %s" % (name, labels, snapshot["sum"]))
+        lines.append("%s_count%s %s" % (name, labels, snapshot["count"]))
+
+
+def format_snapshot(lines, spec, values):
+    """
+    Add one unlabelled series per metric in spec to the exposition.
+    :param lines:
+    List - Lines of the exposition.
+    :param spec:
+    List - (metric name, source key, type, help) tuples.
+    :param values:
+    Dict - Snapshot from a metrics() method.
+    """
+    for name, key, kind, description in spec:
+        if values.get(key) is None:
+            continue
+        lines.append("# HELP %s %s" % (name, description))
+        lines.append("# TYPE %s %s" % (name, kind))
+        lines.append("%s %s" % (name, values[key]))
+
+
+def render_metrics():
+    """
+    Get every metric in the Prometheus text exposition format.
+    :return:
+    Str - The exposition.
+    """
+    lines = []
+    requests = REQUEST_METRICS.metrics()
+    format_histograms(
+        lines, "musicloud_http_request_duration_seconds",
+        "Time taken to handle requests.", requests["latency"]
+    )
+    format_histograms(
+        lines, "musicloud_http_request_db_seconds",
+        "Time spent in DB queries per request.", requests["db_time"]
+    )
+    lines.append(
+        "# HELP musicloud_http_requests_total Requests by status code."
+    )
+    lines.append("# TYPE musicloud_http_requests_total counter")
+    for key, count in sorted(requests["statuses"].items()):
+        lines.append("musicloud_http_requests_total%s %s" % (format_labels(
+            ("blueprint", "route", "method", "status"), key
+        ), count))
+
+    format_snapshot(lines, POOL_METRICS, POOL.metrics())
+
+    cache = TOKEN_CACHE.metrics()
+    lookups = cache["hits"] + cache["misses"]
+    cache["hit_ratio"] = cache["hits"] / lookups if lookups else 0.0
+    format_snapshot(lines, TOKEN_CACHE_METRICS, cache)
+
+    format_snapshot(lines, OUTBOX_METRICS, NOTIFICATION_OUTBOX.metrics())
+
+    format_snapshot(lines, MAIL_QUEUE_METRICS, MAIL_QUEUE.metrics())
+    format_snapshot(lines, LOG_METRICS, log_metrics())
+    return "\n".join(lines) + "\n"
+
+
+@METRICS.route("", methods=["GET"])
+def metrics():
+    """
+    Endpoint for Prometheus to scrape.
+    """
+    if METRICS_TOKEN is None:
+        return {"message": "Metrics are disabled."}, 403
+    auth = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(
+            auth.encode(), ("Bearer " + METRICS_TOKEN).encode()
+    ):
+        return {"message": "Bad metrics token."}, 401
+    return render_metrics(), 200, {"Content-Type": CONTENT_TYPE}
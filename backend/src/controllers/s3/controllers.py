@@ -1,60 +1,31 @@
 """
 /s3 API controller code.
 """
-import boto3
 from flask import Blueprint, request
-from jsonschema import validate, ValidationError
 from ...config import AWS_CREDS
 from ...middleware.auth_required import auth_required
 from ...middleware.sql_err_catcher import sql_err_catcher
-from ...utils.logger import log
+from ...middleware.validate_body import validate_body
+from ...utils import get_s3_client
 
 S3 = Blueprint('s3', __name__)
 
 
-@S3.route("/signed-form-post", methods=["POST"])
-@sql_err_catcher()
-@auth_required(return_user=True)
-def signed_form_post(user_data):
+def sign_upload(user_data, directory, file_name, file_type):
     """
-    Endpoint to access the S3 bucket.
+    Get a presigned post for uploading one file to the user's directory.
+    :param user_data:
+    Dict - The authenticated user's token.
+    :param directory:
+    Str - Top level directory in the bucket.
+    :param file_name:
+    Str - Name of the file being uploaded.
+    :param file_type:
+    Str - Content-Type of the file.
+    :return:
+    Dict - The 'url' & form 'fields' to POST the file with.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "dir": {
-                "type": "string",
-                "pattern": "^(audio|profiler|compiled_audio|cover)$",
-                "minLength": 1,
-            },
-            "fileName": {
-                "type": "string",
-                "minLength": 1
-            },
-            "fileType": {
-                "type": "string",
-                "minLength": 1,
-            }
-        },
-        "required": ["dir", "fileName", "fileType"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
-    directory = request.json.get('dir')
-    file_name = request.json.get('fileName')
-    file_type = request.json.get('fileType')
-
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=AWS_CREDS['AWSAccessKeyId'],
-        aws_secret_access_key=AWS_CREDS['AWSSecretAccessKey']
-    )
-
-    url = s3_client.generate_presigned_post(
+    return get_s3_client().generate_presigned_post(
         Bucket=AWS_CREDS['Bucket'],
         Key=directory + "/" + str(user_data.get('username')) + "/" + file_name,
         Fields={
@@ -63,7 +34,44 @@ def signed_form_post(user_data):
         ExpiresIn=120
     )
 
+
+@S3.route("/signed-form-post", methods=["POST"])
+@sql_err_catcher()
+@auth_required(return_user=True)
+@validate_body("s3.signed_form_post")
+def signed_form_post(user_data):
+    """
+    Endpoint to access the S3 bucket.
+    """
+    url = sign_upload(
+        user_data, request.json.get('dir'), request.json.get('fileName'),
+        request.json.get('fileType')
+    )
+
     return {
         "message": "Signed url for file uploading has been provided",
         "signed_url": url
     }, 200
+
+
+@S3.route("/signed-form-posts", methods=["POST"])
+@sql_err_catcher()
+@auth_required(return_user=True)
+@validate_body("s3.signed_form_posts")
+def signed_form_posts(user_data):
+    """
+    Endpoint to get presigned posts for uploading many files to the S3
+    bucket at once.
+    """
+    urls = [
+        sign_upload(
+            user_data, request.json.get('dir'), file.get('fileName'),
+            file.get('fileType')
+        )
+        for file in request.json.get('files')
+    ]
+
+    return {
+        "message": "Signed urls for file uploading have been provided",
+        "signed_urls": urls
+    }, 200
@@ -14,20 +14,21 @@ from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
 from flask import Blueprint
 from flask import request
-from jsonschema import validate, ValidationError
 
-from ...config import HOST, RESET_TIMEOUT, JWT_SECRET, PROTOCOL
+from ...config import (
+    HOST, RESET_TIMEOUT, JWT_SECRET, PROTOCOL, NOTIFICATION_OUTBOX_CONFIG
+)
 from ...models.errors import NoResults
 from ...utils.logger import log
 from ...utils import (
     random_string, send_mail, gen_scroll_tokens, gen_timeline_post_object,
-    gen_timeline_song_object, notification_sender
+    gen_timeline_song_object, notification_sender, get_keyset, keyset_page
 )
 from ...models.users import (
     insert_user, get_user_via_username, get_user_via_email, make_post,
     create_reset, get_reset_request, delete_reset, post_follow, post_unfollow,
     reset_password, update_reset, get_number_of_posts, get_posts,
-    get_follower_count, get_song_count, get_number_of_likes,
+    get_follower_count, get_user_profile,
     get_following_count, get_following_pair, reset_user_verification,
     reset_email, update_profiler_url, get_following_names, get_follower_names,
     get_timeline, get_timeline_length, get_timeline_posts_only,
@@ -35,11 +36,13 @@ from ...models.users import (
     get_timeline_song_only_length, update_silence_all_notificaitons,
     get_dids_for_a_user, update_silence_follow_notificaitons,
     update_silence_post_notificaitons, update_silence_song_notificaitons,
-    update_silence_like_notificaitons, notify_post_dids, delete_user_data
+    update_silence_like_notificaitons, stream_notification_audience,
+    delete_user_data
 )
 from ...models.verification import insert_verification, get_verification
 from ...middleware.auth_required import auth_required
 from ...middleware.sql_err_catcher import sql_err_catcher
+from ...middleware.validate_body import validate_body
 
 USERS = Blueprint("users", __name__)
 HASHER = PasswordHasher()
@@ -48,26 +51,11 @@ HASHER = PasswordHasher()
 @USERS.route("/follow", methods=["POST"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("users.follow")
 def follow(user_data):
     """
     Endpoint to follow a user.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "username": {
-                "type": "string",
-                "minLength": 1
-            }
-        },
-        "required": ["username"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     other_user = get_user_via_username(request.json.get("username"))[0]
 
     if other_user[0] == user_data.get("uid"):
@@ -88,7 +76,10 @@ def follow(user_data):
             for did in get_dids_for_a_user(other_user[0]):
                 dids += did
             message = user_data.get("username") + " has started following you."
-            notification_sender(message, dids, "New Follower")
+            notification_sender(message, dids, "New Follower", (
+                "follow:" + str(other_user[0]), user_data.get("username"),
+                " started following you."
+            ))
         except NoResults:
             pass
 
@@ -100,26 +91,11 @@ def follow(user_data):
 @USERS.route("/unfollow", methods=["POST"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("users.unfollow")
 def unfollow(user_data):
     """
     Endpoint to unfollow a user.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "username": {
-                "type": "string",
-                "minLength": 1
-            }
-        },
-        "required": ["username"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     other_user = get_user_via_username(request.json.get("username"))[0]
 
     if other_user[0] == user_data.get("uid"):
@@ -136,35 +112,11 @@ def unfollow(user_data):
 
 @USERS.route("", methods=["POST"])
 @sql_err_catcher()
+@validate_body("users.register")
 def register():
     """
     Endpoint to create a new user.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "username": {
-                "type": "string",
-                "minLength": 1
-            },
-            "email": {
-                "type": "string",
-                "pattern": r"[^@]+@[^@]+\.[^@]+",
-                "minLength": 1
-            },
-            "password": {
-                "type": "string",
-                "minLength": 1
-            }
-        },
-        "required": ["username", "email", "password"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     try:
         password_hash = HASHER.hash(request.json.get("password"))
     except Exception:  # pylint:disable=W0703
@@ -201,27 +153,11 @@ def register():
 
 @USERS.route("/reverify", methods=["POST"])
 @sql_err_catcher()
+@validate_body("users.reverify")
 def reverify():
     """
     Endpoint to resend the verification email.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "email": {
-                "type": "string",
-                "pattern": r"[^@]+@[^@]+\.[^@]+",
-                "minLength": 1
-            }
-        },
-        "required": ["email"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     user_data = get_user_via_email(request.json.get("email"))
     if user_data[0][4] == 1:
         return {"message": "Already verified."}, 403
@@ -263,31 +199,24 @@ def user(user_data):
     if not username:
         return {"message": "Username param can't be empty!"}, 422
 
-    user_info = get_user_via_username(username)
-    follower_data = get_follower_count(user_info[0][0])
-    following_data = get_following_count(user_info[0][0])
-    songs = get_song_count(user_info[0][0])
-    user_posts = get_number_of_posts(user_info[0][0])
-    likes = get_number_of_likes(user_info[0][0])
+    profile = get_user_profile(username, user_data.get("uid"))[0]
     if user_data.get("username").lower() == username.lower():
         follow_status = None
     else:
-        follow_status = len(
-            get_following_pair(user_data.get("uid"), user_info[0][0])
-        )
+        follow_status = profile[12]
     return {
-        "profile_pic_url": user_info[0][5],
-        "username": user_info[0][2],
-        "followers": follower_data,
-        "following": following_data,
-        "songs": songs,
-        "posts": user_posts,
-        "likes": likes,
+        "profile_pic_url": profile[2],
+        "username": profile[1],
+        "followers": profile[7],
+        "following": profile[8],
+        "songs": profile[9],
+        "posts": profile[10],
+        "likes": profile[11],
         "follow_status": follow_status,
-        "follow_notification_status": user_info[0][6],
-        "post_notification_status": user_info[0][7],
-        "song_notification_status": user_info[0][8],
-        "like_notification_status": user_info[0][9]
+        "follow_notification_status": profile[3],
+        "post_notification_status": profile[4],
+        "song_notification_status": profile[5],
+        "like_notification_status": profile[6]
     }, 200
 
 
@@ -336,36 +265,11 @@ def get_reset():
 
 @USERS.route("/reset", methods=["POST"])
 @sql_err_catcher()
+@validate_body("users.reset")
 def reset():
     """
     Endpoint to reset a user's password.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "email": {
-                "type": "string",
-                "pattern": r"[^@]+@[^@]+\.[^@]+",
-                "minLength": 1
-            },
-            "code": {
-                "type": "integer",
-                "minimum": 10000000,
-                "maximum": 99999999
-            },
-            "password": {
-                "type": "string",
-                "minLength": 1
-            }
-        },
-        "required": ["email", "code", "password"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     email = request.json.get("email")
     code = request.json.get("code")
 
@@ -395,40 +299,23 @@ def reset():
 @USERS.route("/post", methods=["POST"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("users.post")
 def post(user_data):
     """
     Endpoint to create a post.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "message": {
-                "type": "string",
-                "minLength": 1
-            }
-        },
-        "required": ["message"]
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     time_issued = datetime.datetime.utcnow()
     make_post(user_data.get("uid"), request.json.get("message"), time_issued)
 
-    try:
-        dids = []
-        for did in notify_post_dids(user_data.get("uid")):
-            dids += did
-        message = (
-            user_data.get("username") + " just posted: \""
-            + request.json.get("message") + "\""
-        )
+    message = (
+        user_data.get("username") + " just posted: \""
+        + request.json.get("message") + "\""
+    )
+    for dids in stream_notification_audience(
+            user_data.get("uid"), "post",
+            NOTIFICATION_OUTBOX_CONFIG['chunk_size']
+    ):
         notification_sender(message, dids, "New Post")
-    except NoResults:
-        pass
 
     return {"message": "Message posted."}, 200
 
@@ -535,36 +422,11 @@ def posts():
 @USERS.route("", methods=["PATCH"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("users.patch_user")
 def patch_user(user_data):
     """
     Endpoint to change a user's email and/or password.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "password": {
-                "type": "string",
-                "minLength": 1
-            },
-            "email": {
-                "type": "string",
-                "pattern": r"[^@]+@[^@]+\.[^@]+",
-                "minLength": 1
-            },
-            "current_password": {
-                "type": "string",
-                "minLength": 1
-            }
-        },
-        "required": ["current_password"],
-        "minProperties": 2
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     # Check the user's password against the provided one
     user_password = get_user_via_username(user_data.get("username"))[0][3]
     try:
@@ -616,31 +478,11 @@ def patch_user(user_data):
 @USERS.route("/profiler", methods=["PATCH"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("users.profiler")
 def profiler(user_data):
     """
     Endpoint to change a user's profile picture.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "url": {
-                "type": "string",
-                "pattern": (
-                    r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|"
-                    r"[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+"
-                ),
-                "minLength": 1
-            },
-        },
-        "required": ["url"],
-        "minProperties": 1
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     update_profiler_url(user_data.get("uid"), request.json.get("url"))
     return {"message": "Profile picture URL updated."}, 200
 
@@ -654,6 +496,39 @@ def followers():
     """
     next_page = request.args.get('next_page')
     back_page = request.args.get('back_page')
+    keyset = get_keyset(request.args)
+    if keyset is not None:
+        uid = keyset.get("uid")
+        if uid is None:
+            username = request.args.get('username')
+            if not username:
+                return {"message": "Username param can't be empty!"}, 422
+            uid = get_user_via_username(username)[0][0]
+        users_per_page = int(
+            keyset.get("users_per_page")
+            or request.args.get('users_per_page') or 50
+        )
+
+        accounts, back_page, next_page = keyset_page(
+            get_follower_names(uid, None, users_per_page, keyset),
+            users_per_page, keyset,
+            {"uid": uid, "users_per_page": users_per_page}
+        )
+        return {
+            "current_page": keyset.get("current_page"),
+            "total_pages": None,
+            "users_per_page": users_per_page,
+            "next_page": next_page,
+            "back_page": back_page,
+            "followers": [
+                {
+                    "username": account[0],
+                    "profiler": account[1],
+                    "follow_back": account[2]
+                } for account in accounts
+            ]
+        }, 200
+
     if not next_page and not back_page:
         username = request.args.get('username')
         if not username:
@@ -771,6 +646,39 @@ def following():
     """
     next_page = request.args.get('next_page')
     back_page = request.args.get('back_page')
+    keyset = get_keyset(request.args)
+    if keyset is not None:
+        uid = keyset.get("uid")
+        if uid is None:
+            username = request.args.get('username')
+            if not username:
+                return {"message": "Username param can't be empty!"}, 422
+            uid = get_user_via_username(username)[0][0]
+        users_per_page = int(
+            keyset.get("users_per_page")
+            or request.args.get('users_per_page') or 50
+        )
+
+        accounts, back_page, next_page = keyset_page(
+            get_following_names(uid, None, users_per_page, keyset),
+            users_per_page, keyset,
+            {"uid": uid, "users_per_page": users_per_page}
+        )
+        return {
+            "current_page": keyset.get("current_page"),
+            "total_pages": None,
+            "users_per_page": users_per_page,
+            "next_page": next_page,
+            "back_page": back_page,
+            "following": [
+                {
+                    "username": account[0],
+                    "profiler": account[1],
+                    "follow_back": account[2]
+                } for account in accounts
+            ]
+        }, 200
+
     if not next_page and not back_page:
         username = request.args.get('username')
         if not username:
@@ -888,6 +796,51 @@ def timeline(user_data):  # pylint:disable=R0912, R0914, R0915
     next_page = request.args.get('next_page')
     back_page = request.args.get('back_page')
     uid = user_data.get("uid")
+    keyset = get_keyset(request.args)
+    if keyset is not None:
+        songs_only = keyset.get("songs_only", request.args.get('songs_only'))
+        posts_only = keyset.get("posts_only", request.args.get('posts_only'))
+        items_per_page = int(
+            keyset.get("items_per_page")
+            or request.args.get('items_per_page') or 50
+        )
+
+        if songs_only and posts_only:
+            timeline_items = []
+        elif songs_only:
+            timeline_items = get_timeline_song_only(
+                uid, None, items_per_page, keyset
+            )
+        elif posts_only:
+            timeline_items = get_timeline_posts_only(
+                uid, None, items_per_page, keyset
+            )
+        else:
+            timeline_items = get_timeline(uid, None, items_per_page, keyset)
+
+        timeline_items, back_page, next_page = keyset_page(
+            timeline_items, items_per_page, keyset, {
+                "songs_only": songs_only,
+                "posts_only": posts_only,
+                "items_per_page": items_per_page,
+            }
+        )
+        res = []
+        for item in timeline_items:
+            if item[-1] == "song":
+                res.append(gen_timeline_song_object(item))
+            else:
+                res.append(gen_timeline_post_object(item))
+
+        return {
+            "current_page": keyset.get("current_page"),
+            "total_pages": None,
+            "items_per_page": items_per_page,
+            "next_page": next_page,
+            "back_page": back_page,
+            "timeline": res
+        }, 200
+
     if not next_page and not back_page:
         songs_only = request.args.get('songs_only')
         posts_only = request.args.get('posts_only')
@@ -1030,28 +983,11 @@ def timeline(user_data):  # pylint:disable=R0912, R0914, R0915
 @USERS.route("/notifications", methods=["PATCH"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("users.patch_notification_status")
 def patch_notification_status(user_data):
     """
     Endpoint to change a user's global notification preferences.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "status": {
-                "type": "integer",
-                "minimum": 0,
-                "maximum": 1
-            }
-        },
-        "required": ["status"],
-        "minProperties": 1
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     update_silence_all_notificaitons(
         user_data.get("uid"), request.json.get("status")
     )
@@ -1064,28 +1000,11 @@ def patch_notification_status(user_data):
 @USERS.route("/notifications/follows", methods=["PATCH"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("users.patch_follow_notification_status")
 def patch_follow_notification_status(user_data):
     """
     Endpoint to change a user's follow notification preferences.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "status": {
-                "type": "integer",
-                "minimum": 0,
-                "maximum": 1
-            }
-        },
-        "required": ["status"],
-        "minProperties": 1
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     update_silence_follow_notificaitons(
         user_data.get("uid"), request.json.get("status")
     )
@@ -1098,28 +1017,11 @@ def patch_follow_notification_status(user_data):
 @USERS.route("/notifications/posts", methods=["PATCH"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("users.patch_post_notification_status")
 def patch_post_notification_status(user_data):
     """
     Endpoint to change a user's post notification preferences.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "status": {
-                "type": "integer",
-                "minimum": 0,
-                "maximum": 1
-            }
-        },
-        "required": ["status"],
-        "minProperties": 1
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     update_silence_post_notificaitons(
         user_data.get("uid"), request.json.get("status")
     )
@@ -1132,28 +1034,11 @@ def patch_post_notification_status(user_data):
 @USERS.route("/notifications/songs", methods=["PATCH"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("users.patch_song_notification_status")
 def patch_song_notification_status(user_data):
     """
     Endpoint to change a user's song notification preferences.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "status": {
-                "type": "integer",
-                "minimum": 0,
-                "maximum": 1
-            }
-        },
-        "required": ["status"],
-        "minProperties": 1
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     update_silence_song_notificaitons(
         user_data.get("uid"), request.json.get("status")
     )
@@ -1166,28 +1051,11 @@ def patch_song_notification_status(user_data):
 @USERS.route("/notifications/likes", methods=["PATCH"])
 @sql_err_catcher()
 @auth_required(return_user=True)
+@validate_body("users.patch_like_notification_status")
 def patch_like_notification_status(user_data):
     """
     Endpoint to change a user's like notification preferences.
     """
-    expected_body = {
-        "type": "object",
-        "properties": {
-            "status": {
-                "type": "integer",
-                "minimum": 0,
-                "maximum": 1
-            }
-        },
-        "required": ["status"],
-        "minProperties": 1
-    }
-    try:
-        validate(request.json, schema=expected_body)
-    except ValidationError as exc:
-        log("warning", "Request validation failed.", str(exc))
-        return {"message": str(exc)}, 422
-
     update_silence_like_notificaitons(
         user_data.get("uid"), request.json.get("status")
     )
@@ -0,0 +1,64 @@
+"""
+Middleware for accepting gzip or brotli compressed request bodies.
+"""
+import io
+import traceback
+from functools import wraps
+
+from flask import request
+from werkzeug.wsgi import get_content_length, get_input_stream
+
+from ..config import COMPRESSION_CONFIG
+from ..utils import log
+from ..utils.compression import ENCODINGS, BodyTooLarge, decompress
+
+
+def decompress_body():
+    """
+    Function wrapper for decompressing a body sent with Content-Encoding gzip
+    or br before the handler reads it, so it sees the plain body as usual.
+    Must wrap the handler before anything reads request.json, & go below
+    auth_required so only authenticated requests are decompressed.
+    :return:
+    Tuple - 415 if the encoding isn't supported, 413 if the body is too
+    large as sent or once decompressed, 400 if it's malformed, else the
+    handler's response.
+    """
+    def _decompress_body(func):
+        @wraps(func)
+        def __decompress_body(*args, **kwargs):
+            encoding = request.headers.get(
+                "Content-Encoding", "identity"
+            ).strip().lower()
+            if encoding == "identity":
+                return func(*args, **kwargs)
+            if encoding not in ENCODINGS:
+                return {
+                    "message": "Unsupported Content-Encoding: " + encoding
+                }, 415
+
+            # Compressed bodies over the cap are rejected unread.
+            cap = COMPRESSION_CONFIG['max_compressed_size']
+            environ = request.environ
+            if (get_content_length(environ) or 0) > cap:
+                return {"message": "Request body too large."}, 413
+            data = get_input_stream(environ).read(cap + 1)
+            if len(data) > cap:
+                return {"message": "Request body too large."}, 413
+            try:
+                data = decompress(data, encoding)
+            except BodyTooLarge:
+                return {"message": "Request body too large."}, 413
+            except ValueError:
+                log(
+                    "warning", "Request decompression failed.",
+                    traceback.format_exc()
+                )
+                return {"message": "Malformed compressed request body."}, 400
+            # Hand the handler the decompressed body in place of the original.
+            environ["wsgi.input"] = io.BytesIO(data)
+            environ["CONTENT_LENGTH"] = str(len(data))
+            del environ["HTTP_CONTENT_ENCODING"]
+            return func(*args, **kwargs)
+        return __decompress_body
+    return _decompress_body
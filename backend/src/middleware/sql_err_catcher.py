@@ -6,13 +6,16 @@ from functools import wraps
 
 import mysql.connector
 
-from ..utils import log
+from ..utils import log, transaction
 from ..models.users import NoResults
 
 
 def sql_err_catcher():
     """
     Function wrapper for catching SQL errors.
+    Every query made while handling the request runs on one DB connection, in
+    one transaction, which is committed once the handler returns & rolled back
+    if it raises.
     :return:
     None - If all goes well...
     """
@@ -20,7 +23,8 @@ def sql_err_catcher():
         @wraps(func)
         def __sql_err_catcher(*args, **kwargs):
             try:
-                res = func(*args, *kwargs)
+                with transaction():
+                    res = func(*args, *kwargs)
                 return res
             except mysql.connector.errors.IntegrityError:
                 log(
@@ -0,0 +1,34 @@
+"""
+Middleware for validating request bodies against a precompiled schema.
+"""
+from functools import wraps
+
+from flask import request
+from jsonschema.exceptions import best_match
+
+from ..schemas import VALIDATORS
+from ..utils import log
+
+
+def validate_body(name):
+    """
+    Function wrapper for validating the request's JSON body against one of
+    the schemas in the registry before the handler runs.
+    :param name:
+    Str - Name of the schema in src.schemas.VALIDATORS, eg. 'audio.save_song'.
+    :return:
+    Tuple - 422 & the most relevant validation error if the body is invalid,
+    else the handler's response.
+    """
+    validator = VALIDATORS[name]
+
+    def _validate_body(func):
+        @wraps(func)
+        def __validate_body(*args, **kwargs):
+            error = best_match(validator.iter_errors(request.json))
+            if error is not None:
+                log("warning", "Request validation failed.", str(error))
+                return {"message": str(error)}, 422
+            return func(*args, **kwargs)
+        return __validate_body
+    return _validate_body
@@ -2,8 +2,81 @@
 """
 Query models for interfacing with the DB for audio related transactions.
 """
-from ..utils import query
+import re
+from collections import Counter
+
+from ..config import DB_WINDOW_FUNCTIONS
+from ..utils import (
+    query, query_many, transaction, keyset_clauses
+)
 from .errors import NoResults
+from .users import (
+    update_user_stats, fan_out_song, remove_song_from_timelines
+)
+
+# Sort orders for keyset paginated song listings, keyed by the search sort
+# (eg. title_up), or None for the default newest first order.
+# Seek predicates can't compare NULLs, so songs without a published
+# timestamp sort by a sentinel older than any real one, which is where
+# MySQL sorts the NULLs themselves. Both are compared as strings.
+USERNAME_SQL = "(SELECT username FROM Users WHERE Songs.uid=Users.uid)"
+PUBLISHED_SQL = "COALESCE(published, '1000-01-01 00:00:00')"
+SONG_KEYSET_ORDERS = {
+    None: [("Songs.sid", "DESC")],
+    "publish_up": [(PUBLISHED_SQL, "ASC"), ("Songs.sid", "ASC")],
+    "publish_down": [(PUBLISHED_SQL, "DESC"), ("Songs.sid", "DESC")],
+    "title_up": [("title", "DESC"), ("Songs.sid", "DESC")],
+    "title_down": [("title", "ASC"), ("Songs.sid", "ASC")],
+    "artist_up": [(USERNAME_SQL, "DESC"), ("Songs.sid", "ASC")],
+    "artist_down": [(USERNAME_SQL, "ASC"), ("Songs.sid", "ASC")],
+    "duration_up": [("duration", "ASC"), ("Songs.sid", "ASC")],
+    "duration_down": [("duration", "DESC"), ("Songs.sid", "DESC")],
+}
+
+# Shortest word indexed by the FULLTEXT indexes (innodb_ft_min_token_size),
+# searches for shorter words fall back to a LIKE scan.
+FULLTEXT_MIN_WORD_LENGTH = 3
+
+# InnoDB's default FULLTEXT stopwords, which are never indexed, so a
+# boolean mode query requiring one matches nothing. They're left out of the
+# query, & searches made up only of stopwords fall back to a LIKE scan.
+FULLTEXT_STOPWORDS = frozenset((
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en",
+    "for", "from", "how", "i", "in", "is", "it", "la", "of", "on", "or",
+    "that", "the", "this", "to", "was", "what", "when", "where", "who",
+    "will", "with", "und", "www"
+))
+
+SEARCH_COLUMNS = (
+    "SELECT Songs.sid,"
+    "(SELECT username FROM Users WHERE Songs.uid=Users.uid) as username,"
+    "title, duration, created, public, url, cover, "
+    "Songs.likes_count as likes, (SELECT COUNT(*) FROM Song_Likes WHERE "
+    "Song_Likes.sid=Songs.sid "
+    "AND Song_Likes.uid=%s), description,"
+    "(SELECT profiler FROM Users WHERE Songs.uid=Users.uid) as profiler"
+)
+
+# Songs whose title or artist matches a boolean mode query, each found with
+# its own FULLTEXT index & ranked by their combined relevance.
+FULLTEXT_SEARCH_SOURCE = (
+    " FROM Songs INNER JOIN ("
+    "SELECT match_sid, SUM(relevance) AS relevance FROM ("
+    "SELECT sid AS match_sid, "
+    "MATCH(title) AGAINST (%s IN BOOLEAN MODE) AS relevance "
+    "FROM Songs WHERE MATCH(title) AGAINST (%s IN BOOLEAN MODE) "
+    "UNION ALL "
+    "SELECT Songs.sid, MATCH(username) AGAINST (%s IN BOOLEAN MODE) "
+    "FROM Users INNER JOIN Songs ON Songs.uid = Users.uid "
+    "WHERE MATCH(username) AGAINST (%s IN BOOLEAN MODE)"
+    ") AS Hits GROUP BY match_sid"
+    ") AS Matches ON Matches.match_sid = Songs.sid WHERE public=1 "
+)
+
+LIKE_SEARCH_SOURCE = (
+    " FROM Songs WHERE public=1 AND (title LIKE %s OR "
+    "(SELECT username FROM Users WHERE Songs.uid=Users.uid) LIKE %s) "
+)
 
 
 def insert_song(uid, title, duration, created, public):
@@ -42,7 +115,7 @@ def insert_song(uid, title, duration, created, public):
 
 def insert_song_state(sid, state, time_updated):
     """
-    Save a new song state for a given song.
+    Save a new song state for a given song & bump its state_version.
     :param sid:
     Int - ID of the song who's state we are saving.
     :param state:
@@ -50,7 +123,7 @@ def insert_song_state(sid, state, time_updated):
     :param time_updated:
     Str - Datetime string of when we inserted this new song_state.
     :return:
-    None - Executes the query & returns None.
+    None - Executes the queries & returns None.
     """
     sql = (
         "INSERT INTO Song_State "
@@ -63,6 +136,34 @@ def insert_song_state(sid, state, time_updated):
         time_updated,
     )
     query(sql, args)
+    sql = "UPDATE Songs SET state_version = state_version + 1 WHERE sid = %s"
+    query(sql, (sid,))
+
+
+def insert_song_states(states):
+    """
+    Insert many song states with a single multi-row INSERT & bump the
+    state_version of every song they belong to.
+    :param states:
+    [(Int, Str, Str),...] - (sid, state, time_updated) for each state.
+    :return:
+    Int - Number of states inserted.
+    """
+    sql = (
+        "INSERT INTO Song_State "
+        "(sid, state, time_updated) "
+        "VALUES (%s, %s, %s)"
+    )
+    inserted = query_many(sql, states)
+    sids = [state[0] for state in states]
+    if not sids:
+        return inserted
+    sql = (
+        "UPDATE Songs SET state_version = state_version + 1 WHERE sid IN ("
+        + ", ".join(["%s"] * len(sids)) + ")"
+    )
+    query(sql, tuple(sids))
+    return inserted
 
 
 def get_song_data(sid, uid):
@@ -76,15 +177,13 @@ def get_song_data(sid, uid):
     sql = (
         "SELECT Songs.sid,"
         "(SELECT username FROM Users WHERE Songs.uid=Users.uid) as username,"
-        "title, duration, created, public, url, cover, ("
-        "SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid=%s"
-        ") as likes, ("
+        "title, duration, created, public, url, cover, "
+        "likes_count as likes, ("
         "SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid=%s AND "
         "Song_Likes.uid=%s) as like_status, description FROM Songs "
         "WHERE sid=%s"
     )
     args = (
-        sid,
         sid,
         uid,
         sid,
@@ -148,6 +247,25 @@ def is_editor(sid, uid):
     return count
 
 
+def get_song_state_version(sid):
+    """
+    Get the version of a song's current song_state, which goes up every time
+    a new state is saved.
+    :param sid:
+    Int - ID of the song.
+    :return:
+    Int - The state_version, 0 if the song doesn't exist.
+    """
+    sql = "SELECT state_version FROM Songs WHERE sid = %s"
+    args = (
+        sid,
+    )
+    res = query(sql, args, True)
+    if not res:
+        return 0
+    return res[0][0]
+
+
 def get_song_state(sid):
     """
     Get the current song_state.
@@ -160,6 +278,7 @@ def get_song_state(sid):
         "SELECT state FROM Song_State "
         "WHERE sid = %s "
         "ORDER BY time_updated DESC "
+        "LIMIT 1"
     )
     args = (
         sid,
@@ -170,7 +289,9 @@ def get_song_state(sid):
     return state[0][0]
 
 
-def get_all_compiled_songs(start_index, songs_per_page, uid, sort_sql=None):
+def get_all_compiled_songs(
+        start_index, songs_per_page, uid, sort_sql=None, keyset=None
+):
     """
     Get any publicly available song.
     :param start_index:
@@ -179,20 +300,32 @@ def get_all_compiled_songs(start_index, songs_per_page, uid, sort_sql=None):
     Int - Represents the number of items on the new page.
     :param uid:
     Int - Your user ID.
+    :param keyset:
+    Dict|None - Keyset pagination state, used instead of start_index &
+    sort_sql if not None, see utils.keyset.
     :return:
     List - Containing lists of song data.
     """
     sql = (
         "SELECT Songs.sid,"
         "(SELECT username FROM Users WHERE Songs.uid=Users.uid) as username,"
-        "title, duration, created, public, url, cover, ("
-        "SELECT COUNT(*) FROM Song_Likes WHERE Songs.sid = Song_Likes.sid"
-        ") as likes, (SELECT COUNT(*) FROM Song_Likes WHERE "
+        "title, duration, created, public, url, cover, "
+        "Songs.likes_count as likes, (SELECT COUNT(*) FROM Song_Likes WHERE "
         "Song_Likes.sid=Songs.sid "
         "AND Song_Likes.uid=%s), description,"
         "(SELECT profiler FROM Users WHERE Songs.uid=Users.uid) as profiler"
-        " FROM Songs WHERE public=1 "
     )
+    if keyset is not None:
+        page = keyset_clauses(
+            SONG_KEYSET_ORDERS[keyset.get("sort")], keyset, songs_per_page
+        )
+        sql += (
+            page["column"] + "FROM Songs WHERE public=1 " + page["where"]
+            + page["order"]
+        )
+        return query(sql, (uid, *page["args"]), True)
+
+    sql += " FROM Songs WHERE public=1 "
     if sort_sql:
         sql += sort_sql + "LIMIT %s, %s;"
     else:
@@ -205,11 +338,40 @@ def get_all_compiled_songs(start_index, songs_per_page, uid, sort_sql=None):
     return query(sql, args, True)
 
 
-def get_all_search_results(
+def get_search_source(search_term):
+    """
+    Get the SQL selecting the public songs matching a search. Every word must
+    match the start of a word in the title or artist's username, using the
+    FULLTEXT indexes, unless a word is too short to be indexed. Stopwords
+    aren't indexed, so they're skipped.
+    :param search_term:
+    Str - The artist username or song title we are searching for.
+    :return:
+    Tuple - The FROM & WHERE SQL, the args for its %s tokens & the SQL to
+    order results by relevance, or None if it isn't available.
+    """
+    words = [
+        word for word in re.findall(r"\w+", search_term)
+        if word.lower() not in FULLTEXT_STOPWORDS
+    ]
+    if not words or min(len(word) for word in words) < FULLTEXT_MIN_WORD_LENGTH:
+        search_term = "%" + search_term + "%"
+        return LIKE_SEARCH_SOURCE, (search_term, search_term), None
+
+    boolean_query = " ".join("+" + word + "*" for word in words)
+    return (
+        FULLTEXT_SEARCH_SOURCE,
+        (boolean_query,) * 4,
+        " ORDER BY Matches.relevance DESC, Songs.sid DESC "
+    )
+
+
+def get_search_page(
         start_index, songs_per_page, uid, search_term, sort_sql, profile_search
 ):   # pylint: disable=R0913
     """
-    Get all search results.
+    Get a page of search results & the total number of results, in one query
+    if the server supports window functions, see DB_WINDOW_FUNCTIONS.
     :param start_index:
     Int - Represents the start index of a new page.
     :param songs_per_page:
@@ -219,66 +381,93 @@ def get_all_search_results(
     :param search_term:
     Str - The artist username or song title we are searching for.
     :param sort_sql:
-    Str|None - If not none, is an ORDER statement to be added to the SQL.
+    Str|None - If not none, is an ORDER statement to be added to the SQL,
+    otherwise results are ordered by relevance.
     :param profile_search:
     Bool - True if searching your own profile.
     :return:
-    List - Containing all song results from your search.
-    """
-    search_term = "%" + search_term + "%"
+    Tuple - Int total number of results & a List containing the page's song
+    results.
+    """
+    if not DB_WINDOW_FUNCTIONS:
+        return get_number_of_searchable_songs(
+            search_term, uid if profile_search else None
+        ), get_all_search_results(
+            start_index, songs_per_page, uid, search_term, sort_sql,
+            profile_search
+        )
 
-    sql = (
-        "SELECT Songs.sid,"
-        "(SELECT username FROM Users WHERE Songs.uid=Users.uid) as username,"
-        "title, duration, created, public, url, cover, ("
-        "SELECT COUNT(*) FROM Song_Likes WHERE Songs.sid = Song_Likes.sid"
-        ") as likes, (SELECT COUNT(*) FROM Song_Likes WHERE "
-        "Song_Likes.sid=Songs.sid "
-        "AND Song_Likes.uid=%s), description,"
-        "(SELECT profiler FROM Users WHERE Songs.uid=Users.uid) as profiler"
-        " FROM Songs WHERE public=1 AND (title LIKE %s OR "
-        "(SELECT username FROM Users WHERE Songs.uid=Users.uid) LIKE %s) "
-    )
+    source, search_args, relevance_sql = get_search_source(search_term)
+    sql = SEARCH_COLUMNS + ", COUNT(*) OVER() AS total" + source
+    args = [uid, *search_args]
+    if profile_search:
+        sql += "AND uid=%s "
+        args.append(uid)
+    sql += (sort_sql or relevance_sql or "") + "LIMIT %s, %s;"
 
-    profile_args = (
-        uid,
-        search_term,
-        search_term,
-        uid,
-        start_index,
-        songs_per_page
-    )
+    res = query(sql, (*args, start_index, songs_per_page), True)
+    if not res:
+        # The total is only selected alongside a row.
+        if start_index:
+            return get_number_of_searchable_songs(
+                search_term, uid if profile_search else None
+            ), []
+        return 0, []
+    return res[0][-1], [row[:-1] for row in res]
 
-    discover_args = (
-        uid,
-        search_term,
-        search_term,
-        start_index,
-        songs_per_page
-    )
 
-    if sort_sql:
-        if profile_search:
-            sql += "AND uid=%s " + sort_sql + "LIMIT %s, %s;"
+def get_all_search_results(
+        start_index, songs_per_page, uid, search_term, sort_sql, profile_search,
+        keyset=None
+):   # pylint: disable=R0913
+    """
+    Get all search results.
+    :param start_index:
+    Int - Represents the start index of a new page.
+    :param songs_per_page:
+    Int - Represents the number of items on the new page.
+    :param uid:
+    Int - Your user ID.
+    :param search_term:
+    Str - The artist username or song title we are searching for.
+    :param sort_sql:
+    Str|None - If not none, is an ORDER statement to be added to the SQL,
+    otherwise results are ordered by relevance.
+    :param profile_search:
+    Bool - True if searching your own profile.
+    :param keyset:
+    Dict|None - Keyset pagination state, used instead of start_index &
+    sort_sql if not None, see utils.keyset.
+    :return:
+    List - Containing all song results from your search.
+    """
+    source, search_args, relevance_sql = get_search_source(search_term)
+    sql = SEARCH_COLUMNS
+    args = [uid, *search_args]
 
-            res = query(sql, profile_args, True)
-        else:
-            sql += sort_sql + "LIMIT %s, %s;"
-            res = query(sql, discover_args, True)
-    else:
+    if keyset is not None:
+        page = keyset_clauses(
+            SONG_KEYSET_ORDERS[keyset.get("sort")], keyset, songs_per_page
+        )
+        sql += page["column"] + source
         if profile_search:
-            sql += "AND uid=%s " + "LIMIT %s, %s;"
-            res = query(sql, profile_args, True)
-        else:
-            sql += "LIMIT %s, %s;"
-            res = query(sql, discover_args, True)
+            sql += "AND uid=%s "
+            args.append(uid)
+        sql += page["where"] + page["order"]
+        return query(sql, (*args, *page["args"]), True)
 
-    return res
+    sql += source
+    if profile_search:
+        sql += "AND uid=%s "
+        args.append(uid)
+    sql += (sort_sql or relevance_sql or "") + "LIMIT %s, %s;"
+
+    return query(sql, (*args, start_index, songs_per_page), True)
 
 
 def get_all_compiled_songs_by_uid(
-        uid, start_index, songs_per_page, my_uid, sort_sql=None
-):
+        uid, start_index, songs_per_page, my_uid, sort_sql=None, keyset=None
+):  # pylint: disable=R0913
     """
     Get any publicly available song for a specific user.
     :param uid:
@@ -289,21 +478,32 @@ def get_all_compiled_songs_by_uid(
     Int - Represents the number of items on the new page.
     :param my_uid:
     Int - Your user ID.
+    :param keyset:
+    Dict|None - Keyset pagination state, used instead of start_index &
+    sort_sql if not None, see utils.keyset.
     :return:
     List - Containing lists of song data.
     """
     sql = (
         "SELECT Songs.sid,"
         "(SELECT username FROM Users WHERE Songs.uid=Users.uid) as username,"
-        "title, duration, created, public, url, cover, ("
-        "SELECT COUNT(*) FROM Song_Likes WHERE Songs.sid = Song_Likes.sid"
-        ") as likes, (SELECT COUNT(*) FROM Song_Likes WHERE "
+        "title, duration, created, public, url, cover, "
+        "Songs.likes_count as likes, (SELECT COUNT(*) FROM Song_Likes WHERE "
         "Song_Likes.sid=Songs.sid "
         "AND Song_Likes.uid=%s), description,"
         "(SELECT profiler FROM Users WHERE Songs.uid=Users.uid) as profiler"
-        " FROM Songs WHERE public=1 AND "
-        "uid=%s "
     )
+    if keyset is not None:
+        page = keyset_clauses(
+            SONG_KEYSET_ORDERS[keyset.get("sort")], keyset, songs_per_page
+        )
+        sql += (
+            page["column"] + "FROM Songs WHERE public=1 AND uid=%s "
+            + page["where"] + page["order"]
+        )
+        return query(sql, (my_uid, uid, *page["args"]), True)
+
+    sql += " FROM Songs WHERE public=1 AND uid=%s "
 
     if sort_sql:
         sql += sort_sql + "LIMIT %s, %s;"
@@ -336,8 +536,7 @@ def get_all_editable_songs_by_uid(uid, start_index, songs_per_page):
         "SELECT Songs.sid, "
         "(SELECT username FROM Users WHERE Songs.uid=Users.uid) as username,"
         "title, duration, created, public, url, cover,"
-        "(SELECT COUNT(*) FROM Song_Likes WHERE "
-        "Songs.sid = Song_Likes.sid ) as likes, "
+        "Songs.likes_count as likes, "
         "(SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid=Songs.sid "
         "AND Song_Likes.uid=%s) AS like_status, description, "
         "(SELECT time_updated FROM Song_State WHERE sid=Songs.sid ORDER BY "
@@ -347,8 +546,7 @@ def get_all_editable_songs_by_uid(uid, start_index, songs_per_page):
         "Songs.sid, (SELECT username FROM Users "
         "WHERE Songs.uid=Users.uid) as username,"
         "title, duration, created, public, url, cover,"
-        "(SELECT COUNT(*) FROM Song_Likes WHERE "
-        "Songs.sid = Song_Likes.sid) as likes, "
+        "Songs.likes_count as likes, "
         "(SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid=Songs.sid "
         "AND Song_Likes.uid=%s) AS like_status, description, "
         "(SELECT time_updated FROM Song_State WHERE sid=Songs.sid ORDER BY "
@@ -381,23 +579,21 @@ def get_number_of_compiled_songs():
     return query(sql, (), True)[0][0]
 
 
-def get_number_of_searchable_songs(search_term):
+def get_number_of_searchable_songs(search_term, uid=None):
     """
     Return the number of all searchable songs within the search constraints.
+    :param search_term:
+    Str - The artist username or song title we are searching for.
+    :param uid:
+    Int|None - If not None, only count this user's songs.
     :return:
     Int - Number of searchable songs in DB within the search constraints.
     """
-    search_term = "%" + search_term + "%"
-
-    sql = (
-        "SELECT COUNT(*) FROM Songs "
-        "WHERE public = 1 AND (title LIKE %s OR "
-        "(SELECT username FROM Users WHERE Songs.uid=Users.uid) LIKE %s);"
-    )
-    args = (
-        search_term,
-        search_term
-    )
+    source, args, _ = get_search_source(search_term)
+    sql = "SELECT COUNT(*)" + source
+    if uid is not None:
+        sql += "AND uid=%s"
+        args += (uid,)
 
     return query(sql, args, True)[0][0]
 
@@ -502,15 +698,40 @@ def insert_full_song(
         cover,
         genre,
     )
-    row_id = query(sql, args, get_insert_row_id=True)
-    if not row_id:
-        raise NoResults
+    with transaction():
+        row_id = query(sql, args, get_insert_row_id=True)
+        if not row_id:
+            raise NoResults
+        if public:
+            update_user_stats("songs", [(uid, 1)])
     return row_id
 
 
+def insert_full_songs(songs):
+    """
+    Used for testing to insert many full rows into the Songs table in the DB.
+    :param songs:
+    [Tuple,...] - (sid, uid, title, duration, created, public, url, cover,
+    genre) for each song, see insert_full_song().
+    :return:
+    Int - Number of songs inserted.
+    """
+    sql = (
+        "INSERT INTO Songs "
+        "(sid, uid, title, duration, created, public, url, cover, genre) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"
+    )
+    with transaction():
+        res = query_many(sql, songs)
+        update_user_stats(
+            "songs", Counter(song[1] for song in songs if song[5]).items()
+        )
+    return res
+
+
 def post_like(uid, sid):
     """
-    Add a like entry to the DB.
+    Add a like entry to the DB & bump the song's likes_count.
     :param uid:
     Int - ID of the user creating the like.
     :param sid:
@@ -527,12 +748,45 @@ def post_like(uid, sid):
         uid,
         sid,
     )
-    query(sql, args)
+    with transaction():
+        query(sql, args)
+        sql = (
+            "UPDATE Songs SET likes_count = likes_count + 1 "
+            "WHERE sid=%s"
+        )
+        query(sql, (sid,))
+        update_user_stats("likes", [(uid, 1)])
+
+
+def post_likes(pairs):
+    """
+    Add many like entries to the DB with a single multi-row INSERT & bump
+    the liked songs' likes_count.
+    :param pairs:
+    [(Int, Int),...] - (uid, sid) for each like.
+    :return:
+    Int - Number of likes inserted.
+    """
+    sql = (
+        "INSERT INTO Song_Likes "
+        "(uid, sid) "
+        "VALUES (%s, %s)"
+    )
+    likes = Counter(sid for _, sid in pairs)
+    with transaction():
+        res = query_many(sql, pairs)
+        sql = (
+            "UPDATE Songs SET likes_count = likes_count + %s "
+            "WHERE sid=%s"
+        )
+        query_many(sql, [(count, sid) for sid, count in likes.items()])
+        update_user_stats("likes", Counter(uid for uid, _ in pairs).items())
+    return res
 
 
 def post_unlike(uid, sid):
     """
-    Delete a like entry from the DB.
+    Delete a like entry from the DB & drop the song's likes_count.
     :param uid:
     Int - ID of the user deleting the like.
     :param sid:
@@ -548,7 +802,15 @@ def post_unlike(uid, sid):
         uid,
         sid,
     )
-    query(sql, args)
+    with transaction():
+        removed = query(sql, args, get_row_count=True)
+        if removed:
+            sql = (
+                "UPDATE Songs SET likes_count = likes_count - %s "
+                "WHERE sid=%s"
+            )
+            query(sql, (removed, sid))
+            update_user_stats("likes", [(uid, -removed)])
 
 
 def insert_editor(sid, uid):
@@ -573,6 +835,22 @@ def insert_editor(sid, uid):
     query(sql, args)
 
 
+def insert_editors(pairs):
+    """
+    Add many song editors with a single multi-row INSERT.
+    :param pairs:
+    [(Int, Int),...] - (sid, uid) for each editor.
+    :return:
+    Int - Number of editors added.
+    """
+    sql = (
+        "INSERT INTO Song_Editors "
+        "(sid, uid) "
+        "VALUES (%s, %s)"
+    )
+    return query_many(sql, pairs)
+
+
 def get_number_of_liked_songs_by_uid(uid):
     """
     Return the number of all liked songs for a specific user.
@@ -590,7 +868,9 @@ def get_number_of_liked_songs_by_uid(uid):
     return query(sql, args, True)[0][0]
 
 
-def get_all_liked_songs_by_uid(uid, start_index, songs_per_page, my_uid):
+def get_all_liked_songs_by_uid(
+        uid, start_index, songs_per_page, my_uid, keyset=None
+):
     """
     Get all the songs a specific user liked.
     :param uid:
@@ -599,6 +879,9 @@ def get_all_liked_songs_by_uid(uid, start_index, songs_per_page, my_uid):
     Int - Represents the start index of a new page.
     :param songs_per_page:
     Int - Represents the number of items on the new page.
+    :param keyset:
+    Dict|None - Keyset pagination state, used instead of start_index if not
+    None, see utils.keyset.
     :return:
     List - Containing lists of song data.
     """
@@ -606,13 +889,22 @@ def get_all_liked_songs_by_uid(uid, start_index, songs_per_page, my_uid):
         "SELECT Songs.sid, "
         "(SELECT username FROM Users WHERE Songs.uid=Users.uid) as username,"
         "title, duration, created, public, url, cover, "
-        "(SELECT COUNT(*) FROM Song_Likes WHERE "
-        "Songs.sid = Song_Likes.sid) as likes, "
+        "Songs.likes_count as likes, "
         "(SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid=Songs.sid "
-        "AND Song_Likes.uid=%s) as like_status, description FROM Songs "
-        "INNER JOIN Song_Likes ON "
-        "Song_Likes.sid = Songs.sid WHERE Song_Likes.uid = %s LIMIT %s, %s;"
+        "AND Song_Likes.uid=%s) as like_status, description "
+    )
+    source = (
+        "FROM Songs INNER JOIN Song_Likes ON "
+        "Song_Likes.sid = Songs.sid WHERE Song_Likes.uid = %s "
     )
+    if keyset is not None:
+        page = keyset_clauses(
+            SONG_KEYSET_ORDERS[None], keyset, songs_per_page
+        )
+        sql += page["column"] + source + page["where"] + page["order"]
+        return query(sql, (my_uid, uid, *page["args"]), True)
+
+    sql += source + "LIMIT %s, %s;"
     args = (
         my_uid,
         uid,
@@ -663,7 +955,19 @@ def update_published_status(public, sid):
         public,
         sid,
     )
-    query(sql, args)
+    with transaction():
+        query(sql, args)
+        # Recount rather than adjust, as republishing is a no-op.
+        sql = (
+            "INSERT INTO User_Stats (uid, songs) "
+            "SELECT uid, (SELECT COUNT(*) FROM Songs AS Owned "
+            "WHERE Owned.uid = Songs.uid AND Owned.public = 1) "
+            "FROM Songs WHERE sid=%s "
+            "ON DUPLICATE KEY UPDATE songs = VALUES(songs)"
+        )
+        query(sql, (sid,))
+        if not public:
+            remove_song_from_timelines(sid)
 
 
 def update_compiled_url(sid, url, duration):
@@ -817,7 +1121,7 @@ def get_playlists(uid, start_index, playlists_per_page):
     return query(sql, args, True)
 
 
-def get_playlist_data(pid, start_index, songs_per_page, uid):
+def get_playlist_data(pid, start_index, songs_per_page, uid, keyset=None):
     """
     Return all of the songs in a playlist using pagination.
     :param pid:
@@ -826,6 +1130,9 @@ def get_playlist_data(pid, start_index, songs_per_page, uid):
     Int - Represents the start index of a new page.
     :param songs_per_page:
     Int - Represents the number of items on the new page.
+    :param keyset:
+    Dict|None - Keyset pagination state, used instead of start_index if not
+    None, see utils.keyset.
     :return:
     List - Contains dicts of song data.
     """
@@ -833,14 +1140,23 @@ def get_playlist_data(pid, start_index, songs_per_page, uid):
         "SELECT Songs.sid, "
         "(SELECT username FROM Users WHERE Songs.uid=Users.uid) as username,"
         "title, duration, created, public, url, cover, "
+        "Songs.likes_count as likes, "
         "(SELECT COUNT(*) FROM Song_Likes WHERE "
-        "Songs.sid = Song_Likes.sid) as likes, "
-        "(SELECT COUNT(*) FROM Song_Likes WHERE "
-        "Song_Likes.sid=Songs.sid AND Song_Likes.uid=%s) , description FROM "
-        "Songs INNER JOIN Playlist_State ON "
+        "Song_Likes.sid=Songs.sid AND Song_Likes.uid=%s) , description "
+    )
+    source = (
+        "FROM Songs INNER JOIN Playlist_State ON "
         "Playlist_State.sid = Songs.sid WHERE Playlist_State.pid = %s "
-        "AND Songs.public = 1 LIMIT %s, %s;"
+        "AND Songs.public = 1 "
     )
+    if keyset is not None:
+        page = keyset_clauses(
+            SONG_KEYSET_ORDERS[None], keyset, songs_per_page
+        )
+        sql += page["column"] + source + page["where"] + page["order"]
+        return query(sql, (uid, pid, *page["args"]), True)
+
+    sql += source + "LIMIT %s, %s;"
     args = (
         uid,
         pid,
@@ -991,9 +1307,13 @@ def update_playlist_name(pid, title):
 
 def update_publised_timestamp(sid, timestamp):
     """
-    Change the published timestamp for a particular song.
+    Change the published timestamp for a particular song. As this is the
+    song's position in timelines, the song is fanned out to timelines when
+    it gets a timestamp & removed from them when it's cleared.
     :param sid:
     Int - ID of the song who's timestamp we are updating.
+    :param timestamp:
+    Str - Datetime string of when the song was published, or None.
     :return:
     None - Updates the timestamp and returns None.
     """
@@ -1006,7 +1326,12 @@ def update_publised_timestamp(sid, timestamp):
         timestamp,
         sid,
     )
-    query(sql, args)
+    with transaction():
+        query(sql, args)
+        if timestamp:
+            fan_out_song(sid)
+        else:
+            remove_song_from_timelines(sid)
 
 
 def notify_like_dids(sid):
@@ -1040,9 +1365,8 @@ def notify_song_dids(uid):
     List - A list of dids.
     """
     sql = (
-        "SELECT did FROM Notifications WHERE uid IN (SELECT uid FROM Users "
-        "WHERE uid IN (SELECT follower FROM Followers WHERE following=%s) "
-        "AND silence_song_notifcation=0);"
+        "SELECT did FROM Notification_Audience "
+        "WHERE uid=%s AND type='song'"
     )
     args = (
         uid,
@@ -1114,25 +1438,40 @@ def delete_song_data(sid):
         "WHERE sid=%s"
     )
     sql3 = (
+        "UPDATE User_Stats INNER JOIN ("
+        "SELECT uid, COUNT(*) AS likes FROM Song_Likes WHERE sid=%s "
+        "GROUP BY uid) AS Counts ON Counts.uid = User_Stats.uid "
+        "SET User_Stats.likes = User_Stats.likes - Counts.likes"
+    )
+    sql4 = (
         "DELETE FROM Song_Likes "
         "WHERE sid=%s"
     )
-    sql4 = (
+    sql5 = (
         "DELETE FROM Song_Editors "
         "WHERE sid=%s"
     )
-    sql5 = (
+    sql6 = (
+        "UPDATE User_Stats INNER JOIN Songs ON Songs.uid = User_Stats.uid "
+        "SET User_Stats.songs = User_Stats.songs - 1 "
+        "WHERE Songs.sid=%s AND Songs.public=1"
+    )
+    sql7 = (
         "DELETE FROM Songs "
         "WHERE sid=%s"
     )
     args = (
         sid,
     )
-    query(sql1, args)
-    query(sql2, args)
-    query(sql3, args)
-    query(sql4, args)
-    query(sql5, args)
+    with transaction():
+        query(sql1, args)
+        query(sql2, args)
+        query(sql3, args)
+        query(sql4, args)
+        query(sql5, args)
+        query(sql6, args)
+        query(sql7, args)
+        remove_song_from_timelines(sid)
 
 
 def create_folder_entry(folder_name, parent_folder_id):
@@ -1150,6 +1489,18 @@ def create_folder_entry(folder_name, parent_folder_id):
     query(sql, args)
 
 
+def insert_full_folders(folders):
+    """
+    Used in dummy DB population to insert many folders with known IDs.
+    :param folders:
+    [(Int, Int, Str),...] - (folder_id, parent_id, name) for each folder.
+    :return:
+    Int - Number of folders inserted.
+    """
+    sql = "INSERT INTO Folder (folder_id, parent_id, name) VALUES (%s, %s, %s)"
+    return query_many(sql, folders)
+
+
 def add_sample(sample_name, sample_url, folder_id):
     """
     Adds a sample to a folder.
@@ -1444,3 +1795,19 @@ def delete_synth_entry(synth_id):
     sql = "DELETE FROM Synth WHERE id=%s"
     args = (synth_id,)
     query(sql, args)
+
+
+def reconcile_like_counts():
+    """
+    Repair any drift between Songs.likes_count and the Song_Likes table.
+    :return:
+    Int - Number of songs who's likes_count was corrected.
+    """
+    sql = (
+        "UPDATE Songs SET likes_count = ("
+        "SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid = Songs.sid"
+        ") WHERE likes_count <> ("
+        "SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid = Songs.sid"
+        ")"
+    )
+    return query(sql, (), get_row_count=True)
@@ -1,10 +1,25 @@
 """
 Query models for interfacing with the DB for auth related transactions.
 """
-from ..utils import query
+import hashlib
+from functools import partial
+
+from ..utils import query, after_commit
+from ..utils.token_cache import TOKEN_CACHE
 from .errors import NoResults
 
 
+def token_digest(access_token):
+    """
+    Get the fixed width digest Logins are indexed by.
+    :param access_token:
+    Str - Raw JWT string.
+    :return:
+    Str - Hex SHA-256 digest of the access_token.
+    """
+    return hashlib.sha256(access_token.encode()).hexdigest()
+
+
 def insert_login(uid, access_token, time_issued):
     """
     Create a login entry.
@@ -20,13 +35,15 @@ def insert_login(uid, access_token, time_issued):
     try:
         sql = (
             "INSERT INTO Logins "
-            "(uid, access_token, time_issued) "
-            "VALUES (%s, %s, %s)"
+            "(uid, access_token, time_issued, token_digest) "
+            "VALUES (%s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE time_issued = VALUES(time_issued)"
         )
         args = (
             uid,
             access_token,
             time_issued,
+            token_digest(access_token),
         )
         query(sql, args)
     except Exception as exc:
@@ -45,12 +62,12 @@ def get_login(uid, access_token):
     """
     try:
         sql = (
-            "SELECT * FROM Logins "
-            "WHERE uid = %s AND access_token = %s"
+            "SELECT uid, access_token, time_issued FROM Logins "
+            "WHERE token_digest = %s AND uid = %s"
         )
         args = (
+            token_digest(access_token),
             uid,
-            access_token,
         )
         login = query(sql, args, True)
         if not login:
@@ -60,6 +77,25 @@ def get_login(uid, access_token):
         raise exc
 
 
+def get_login_time(uid, access_token):
+    """
+    Get the time a login entry was issued or last refreshed, from the token
+    cache if the access_token was validated recently.
+    :param uid:
+    Int - ID of the user who's login entries we are searching.
+    :param access_token:
+    Str - Specific JWT string we are looking for.
+    :return:
+    Datetime - The login entry's time_issued.
+    """
+    login = TOKEN_CACHE.get(access_token)
+    if login is not None and login[0] == uid:
+        return login[1]
+    time_issued = get_login(uid, access_token)[0][2]
+    TOKEN_CACHE.put(access_token, uid, time_issued)
+    return time_issued
+
+
 def refresh_login(new_issue_time, uid, access_token):
     """
     Update the time_issued stored for a specific access_token.
@@ -76,14 +112,18 @@ def refresh_login(new_issue_time, uid, access_token):
         sql = (
             "UPDATE Logins "
             "SET time_issued = %s "
-            "WHERE uid = %s AND access_token = %s"
+            "WHERE token_digest = %s AND uid = %s"
         )
         args = (
             new_issue_time,
+            token_digest(access_token),
             uid,
-            access_token,
         )
         query(sql, args)
+        # Other requests mustn't see the new time until it's in the DB.
+        after_commit(
+            partial(TOKEN_CACHE.put, access_token, uid, new_issue_time)
+        )
     except Exception as exc:
         raise exc
 
@@ -99,11 +139,75 @@ def delete_login(access_token):
     try:
         sql = (
             "DELETE FROM Logins "
-            "WHERE access_token = %s"
+            "WHERE token_digest = %s"
         )
         args = (
-            access_token,
+            token_digest(access_token),
         )
         query(sql, args)
+        TOKEN_CACHE.discard(access_token)
     except Exception as exc:
         raise exc
+
+
+def revoke_token(jti, expires):
+    """
+    Revoke a stateless token until it expires.
+    :param jti:
+    Str - Unique ID of the token.
+    :param expires:
+    Datetime - When the token expires, after which it can be forgotten.
+    :return:
+    None - Adds the token to the Revoked_Tokens table and returns None.
+    """
+    sql = (
+        "INSERT IGNORE INTO Revoked_Tokens (jti, expires, revoked) "
+        "VALUES (%s, %s, UTC_TIMESTAMP())"
+    )
+    args = (
+        jti,
+        expires,
+    )
+    query(sql, args)
+
+
+def claim_token(jti, expires):
+    """
+    Revoke a single use token as it's used. Unlike revoke_token(), this
+    fails if the token has already been revoked, so only one request can
+    claim it, even across processes.
+    :param jti:
+    Str - Unique ID of the token.
+    :param expires:
+    Datetime - When the token expires, after which it can be forgotten.
+    :return:
+    None - Adds the token to the Revoked_Tokens table and returns None.
+    Raises IntegrityError if it's already there.
+    """
+    sql = (
+        "INSERT INTO Revoked_Tokens (jti, expires, revoked) "
+        "VALUES (%s, %s, UTC_TIMESTAMP())"
+    )
+    args = (
+        jti,
+        expires,
+    )
+    query(sql, args)
+
+
+def get_revoked_tokens(since):
+    """
+    Get the unexpired stateless tokens revoked since a given time.
+    :param since:
+    Datetime - Only tokens revoked at or after this UTC time are returned.
+    :return:
+    List - Containing lists of jti, expires & revoked times.
+    """
+    sql = (
+        "SELECT jti, expires, revoked FROM Revoked_Tokens "
+        "WHERE revoked >= %s AND expires > UTC_TIMESTAMP()"
+    )
+    args = (
+        since,
+    )
+    return query(sql, args, True)
@@ -0,0 +1,144 @@
+"""
+Query models for interfacing with the DB for notification related transactions.
+"""
+import json
+
+from ..utils import query
+
+
+def insert_outbox_notification(message, dids, title, coalesce=None):
+    """
+    Queue a push notification in the outbox, so it is only sent if the
+    surrounding transaction commits.
+    :param message:
+    Str - Body of the notification.
+    :param dids:
+    List - Device IDs the notification is sent to.
+    :param title:
+    Str - Title of the notification.
+    :param coalesce:
+    Dict|None - 'key' shared by notifications that can be merged, the 'actor'
+    who caused it, the 'summary' that follows the list of actors in a merged
+    notification & the 'window' in seconds to hold the notification for.
+    :return:
+    None - Adds the notification to the Notification_Outbox table and returns
+    None.
+    """
+    coalesce = coalesce or {}
+    sql = (
+        "INSERT INTO Notification_Outbox "
+        "(title, message, dids, created, next_attempt, coalesce_key, actor, "
+        "summary) VALUES (%s, %s, %s, UTC_TIMESTAMP(), "
+        "UTC_TIMESTAMP() + INTERVAL %s SECOND, %s, %s, %s)"
+    )
+    args = (
+        title,
+        message,
+        json.dumps(dids),
+        coalesce.get("window", 0),
+        coalesce.get("key"),
+        coalesce.get("actor"),
+        coalesce.get("summary"),
+    )
+    query(sql, args)
+
+
+def claim_outbox_notifications(claim, batch_size, lease):
+    """
+    Claim the oldest notifications that are due to be sent, along with any
+    not yet due that can be merged with them. Claimed rows aren't due again
+    until the lease runs out, so another drainer only picks them up if this
+    one dies before sending them.
+    :param claim:
+    Str - 32 char ID unique to this claim.
+    :param batch_size:
+    Int - Max number of due notifications to claim.
+    :param lease:
+    Int - Seconds the notifications are held for.
+    :return:
+    List - Containing lists of id, title, message, dids, created, attempts,
+    coalesce_key, actor & summary for each claimed notification.
+    """
+    sql = (
+        "UPDATE Notification_Outbox "
+        "SET claim = %s, next_attempt = UTC_TIMESTAMP() + INTERVAL %s SECOND "
+        "WHERE next_attempt <= UTC_TIMESTAMP() "
+        "ORDER BY next_attempt LIMIT %s"
+    )
+    args = (
+        claim,
+        lease,
+        batch_size,
+    )
+    query(sql, args)
+
+    sql = (
+        "SELECT DISTINCT coalesce_key FROM Notification_Outbox "
+        "WHERE claim = %s AND coalesce_key IS NOT NULL"
+    )
+    args = (
+        claim,
+    )
+    keys = [row[0] for row in query(sql, args, True) or []]
+    if keys:
+        # Rows held by another drainer's unexpired lease are left alone.
+        sql = (
+            "UPDATE Notification_Outbox "
+            "SET claim = %s, next_attempt = UTC_TIMESTAMP() + INTERVAL %s SECOND "
+            "WHERE coalesce_key IN (" + ", ".join(["%s"] * len(keys)) + ") "
+            "AND (claim IS NULL OR next_attempt <= UTC_TIMESTAMP())"
+        )
+        query(sql, (claim, lease) + tuple(keys))
+
+    sql = (
+        "SELECT id, title, message, dids, created, attempts, coalesce_key, "
+        "actor, summary FROM Notification_Outbox WHERE claim = %s ORDER BY id"
+    )
+    args = (
+        claim,
+    )
+    return query(sql, args, True)
+
+
+def delete_outbox_notifications(ids):
+    """
+    Remove sent or abandoned notifications from the outbox.
+    :param ids:
+    List - IDs of the notifications.
+    :return:
+    None - Deletes the notifications and returns None.
+    """
+    sql = (
+        "DELETE FROM Notification_Outbox WHERE id IN ("
+        + ", ".join(["%s"] * len(ids)) + ")"
+    )
+    query(sql, tuple(ids))
+
+
+def retry_outbox_notifications(ids, delay):
+    """
+    Release notifications that failed to send, to be tried again later.
+    :param ids:
+    List - IDs of the notifications.
+    :param delay:
+    Int - Seconds until they are due again.
+    :return:
+    None - Updates the notifications and returns None.
+    """
+    sql = (
+        "UPDATE Notification_Outbox SET attempts = attempts + 1, "
+        "claim = NULL, next_attempt = UTC_TIMESTAMP() + INTERVAL %s SECOND "
+        "WHERE id IN (" + ", ".join(["%s"] * len(ids)) + ")"
+    )
+    query(sql, (delay,) + tuple(ids))
+
+
+def count_outbox_notifications():
+    """
+    Count the notifications waiting in the outbox, sent or being retried.
+    :return:
+    Int|None - Number of notifications, or None if the DB couldn't be read.
+    """
+    sql = "SELECT COUNT(*) FROM Notification_Outbox"
+    res = query(sql, (), True)
+    return res[0][0] if res else None
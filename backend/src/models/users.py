@@ -2,7 +2,12 @@
 """
 Query models for interfacing with the DB for user related transactions.
 """
-from ..utils import query
+from collections import Counter
+
+from ..utils import (
+    query, query_many, transaction, keyset_clauses
+)
+from ..utils.token_cache import TOKEN_CACHE
 from .errors import NoResults
 
 
@@ -22,20 +27,21 @@ def insert_user(email, username, password):
     args = (
         username,
     )
-    root_folder_id = query(sql, args, get_insert_row_id=True)
-    sql = (
-        "INSERT INTO Users "
-        "(email, username, password, verified, root_folder) "
-        "VALUES (%s, %s, %s, %s, %s)"
-    )
-    args = (
-        email,
-        username,
-        password,
-        0,
-        root_folder_id,
-    )
-    query(sql, args)
+    with transaction():
+        root_folder_id = query(sql, args, get_insert_row_id=True)
+        sql = (
+            "INSERT INTO Users "
+            "(email, username, password, verified, root_folder) "
+            "VALUES (%s, %s, %s, %s, %s)"
+        )
+        args = (
+            email,
+            username,
+            password,
+            0,
+            root_folder_id,
+        )
+        query(sql, args)
 
 
 def get_user_via_username(username):
@@ -186,7 +192,32 @@ def make_post(uid, message, time_of_post):
         message,
         time_of_post,
     )
-    query(sql, args)
+    with transaction():
+        post_id = query(sql, args, get_insert_row_id=True)
+        update_user_stats("posts", [(uid, 1)])
+        fan_out_post(post_id, uid, time_of_post)
+
+
+def make_posts(posts):
+    """
+    Create many post entries in the DB with a single multi-row INSERT.
+    Timelines aren't updated, call rebuild_timelines() once done.
+    :param posts:
+    [(Int, Str, Str),...] - (uid, message, time_of_post) for each post.
+    :return:
+    Int - Number of posts created.
+    """
+    sql = (
+        "INSERT INTO Posts "
+        "(uid, message, time) "
+        "VALUES (%s, %s, %s)"
+    )
+    with transaction():
+        res = query_many(sql, posts)
+        update_user_stats(
+            "posts", Counter(post[0] for post in posts).items()
+        )
+    return res
 
 
 def get_follower_count(uid):
@@ -439,7 +470,40 @@ def post_follow(follower_uid, following_uid):
         follower_uid,
         following_uid,
     )
-    query(sql, args)
+    with transaction():
+        query(sql, args)
+        update_user_stats("following", [(follower_uid, 1)])
+        update_user_stats("followers", [(following_uid, 1)])
+        backfill_timeline(follower_uid, following_uid)
+        add_to_audience(
+            "Followers.follower = %s AND Followers.following = %s", args
+        )
+
+
+def post_follows(pairs):
+    """
+    Create many follow relationships in the DB with a single multi-row INSERT.
+    Timelines & notification audiences aren't updated, call
+    rebuild_timelines() & rebuild_notification_audience() once done.
+    :param pairs:
+    [(Int, Int),...] - (follower_uid, following_uid) for each relationship.
+    :return:
+    Int - Number of follow relations created.
+    """
+    sql = (
+        "INSERT INTO Followers "
+        "(follower, following) "
+        "VALUES (%s, %s)"
+    )
+    with transaction():
+        res = query_many(sql, pairs)
+        update_user_stats(
+            "following", Counter(pair[0] for pair in pairs).items()
+        )
+        update_user_stats(
+            "followers", Counter(pair[1] for pair in pairs).items()
+        )
+    return res
 
 
 def post_unfollow(follower_uid, following_uid):
@@ -460,7 +524,17 @@ def post_unfollow(follower_uid, following_uid):
         follower_uid,
         following_uid,
     )
-    query(sql, args)
+    with transaction():
+        removed = query(sql, args, get_row_count=True)
+        if removed:
+            update_user_stats("following", [(follower_uid, -removed)])
+            update_user_stats("followers", [(following_uid, -removed)])
+            prune_timeline(follower_uid, following_uid)
+            sql = (
+                "DELETE FROM Notification_Audience "
+                "WHERE follower=%s AND uid=%s"
+            )
+            query(sql, args)
 
 
 def delete_reset(uid):
@@ -560,7 +634,29 @@ def insert_full_user_data(uid, email, username, password, verified, profiler):
     query(sql, args)
 
 
-def get_following_names(fid, start_index, users_per_page):
+def insert_full_users(users):
+    """
+    Used in dummy DB population to insert many full user rows in the DB. The
+    root folders referenced must already exist, see insert_full_folders().
+    :param users:
+    [Tuple,...] - (uid, email, username, password, verified, profiler,
+    root_folder) for each user.
+    :return:
+    Int - Number of users inserted.
+    """
+    sql = (
+        "INSERT INTO Users "
+        "(uid, email, username, password, verified, profiler, root_folder) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+    )
+    return query_many(sql, users)
+
+
+# Follower & following lists are keyset paginated in uid order.
+USER_KEYSET_ORDER = [("Users.uid", "ASC")]
+
+
+def get_following_names(fid, start_index, users_per_page, keyset=None):
     """
     Get the info for all the user's a specific user follows.
     :param fid:
@@ -569,17 +665,28 @@ def get_following_names(fid, start_index, users_per_page):
     Int - Start index for the page.
     :param users_per_page:
     Int - Number of users that will be returned.
+    :param keyset:
+    Dict|None - Keyset pagination state, used instead of start_index if not
+    None, see utils.keyset.
     :return:
     List - Contains lists of user data & reverse follow relation info.
     """
     sql = (
         "SELECT username, profiler, ("
         "SELECT COUNT(*) FROM Followers WHERE follower=uid AND following=%s"
-        ") as follow_back FROM Users "
+        ") as follow_back"
+    )
+    source = (
+        " FROM Users "
         "INNER JOIN Followers ON uid=following "
         "WHERE follower=%s "
-        "LIMIT %s, %s;"
     )
+    if keyset is not None:
+        page = keyset_clauses(USER_KEYSET_ORDER, keyset, users_per_page)
+        sql += page["column"] + source + page["where"] + page["order"]
+        return query(sql, (fid, fid, *page["args"]), True)
+
+    sql += source + "LIMIT %s, %s;"
     args = (
         fid,
         fid,
@@ -589,7 +696,7 @@ def get_following_names(fid, start_index, users_per_page):
     return query(sql, args, True)
 
 
-def get_follower_names(fid, start_index, users_per_page):
+def get_follower_names(fid, start_index, users_per_page, keyset=None):
     """
     Get the info for all the followers for a specific user.
     :param fid:
@@ -598,17 +705,28 @@ def get_follower_names(fid, start_index, users_per_page):
     Int - Start index for the page.
     :param users_per_page:
     Int - Number of users that will be returned.
+    :param keyset:
+    Dict|None - Keyset pagination state, used instead of start_index if not
+    None, see utils.keyset.
     :return:
     List - Contains lists of user data & reverse follow relation info.
     """
     sql = (
         "SELECT username, profiler, ("
         "SELECT COUNT(*) FROM Followers WHERE following=uid AND follower=%s"
-        ") as follow_back FROM Users "
+        ") as follow_back"
+    )
+    source = (
+        " FROM Users "
         "INNER JOIN Followers ON uid=follower "
         "WHERE following=%s "
-        "LIMIT %s, %s;"
     )
+    if keyset is not None:
+        page = keyset_clauses(USER_KEYSET_ORDER, keyset, users_per_page)
+        sql += page["column"] + source + page["where"] + page["order"]
+        return query(sql, (fid, fid, *page["args"]), True)
+
+    sql += source + "LIMIT %s, %s;"
     args = (
         fid,
         fid,
@@ -618,47 +736,64 @@ def get_follower_names(fid, start_index, users_per_page):
     return query(sql, args, True)
 
 
-def get_timeline(uid, start_index, items_per_page):
-    """
-    Creates a timeline list from the user's following data.
+# Columns selected for every timeline item, songs & posts share one row
+# format with NULLs for the fields that don't apply to the item's type.
+TIMELINE_COLUMNS = (
+    "SELECT Songs.sid, Users.username, Songs.title, Songs.duration, "
+    "Songs.created, Songs.public, Timeline_Items.time, Songs.url, "
+    "Songs.cover, Posts.message, Songs.likes_count AS likes, "
+    "Users.profiler, IF(Timeline_Items.type = 'song', (SELECT COUNT(*) "
+    "FROM Song_Likes WHERE Song_Likes.sid=Timeline_Items.item_id "
+    "AND Song_Likes.uid=%s), NULL) AS like_status, Songs.description, "
+    "Timeline_Items.type "
+)
+TIMELINE_SOURCE = (
+    "FROM Timeline_Items "
+    "INNER JOIN Users ON Users.uid = Timeline_Items.author "
+    "LEFT JOIN Songs ON Timeline_Items.type = 'song' "
+    "AND Songs.sid = Timeline_Items.item_id "
+    "LEFT JOIN Posts ON Timeline_Items.type = 'post' "
+    "AND Posts.post_id = Timeline_Items.item_id "
+)
+# Keyset pages also order by the item, as several items can share a time.
+TIMELINE_KEYSET_ORDER = [
+    ("Timeline_Items.time", "DESC"),
+    ("Timeline_Items.type", "DESC"),
+    ("Timeline_Items.item_id", "DESC"),
+]
+
+
+def get_timeline(uid, start_index, items_per_page, keyset=None):
+    """
+    Get a page of a user's timeline, see fan_out_post() & fan_out_song().
     :param uid:
     Int - Uid of the user who's timeline we want.
     :param start_index:
     Int - Start index for the page.
     :param items_per_page:
     Int - Number of items that will be returned.
+    :param keyset:
+    Dict|None - Keyset pagination state, used instead of start_index if not
+    None, see utils.keyset.
     :return:
     List - Contains lists of song & post data in reverse chronological order
     from user's the selected user follows.
     """
-    sql = (
-        "SELECT * FROM ((SELECT sid, "
-        "(SELECT username FROM Users WHERE Songs.uid=Users.uid) as username"
-        ", title, duration, created, public,"
-        "published AS time, url, cover, NULL AS message, "
-        "(SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid=Songs.sid ) "
-        "as likes, "
-        "(SELECT profiler FROM Users WHERE Songs.uid=Users.uid) as profiler, "
-        "(SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid=Songs.sid "
-        "AND Song_Likes.uid=%s) AS like_status, description,"
-        "'song' AS type FROM "
-        "Songs WHERE (uid IN "
-        "(SELECT Followers.following FROM Followers WHERE follower=%s)"
-        " OR uid=%s) AND public=1) UNION (SELECT NULL AS sid, "
-        "(SELECT username FROM Users WHERE Posts.uid=Users.uid) as username"
-        ", NULL AS title,"
-        "NULL AS duration, NULL AS created, NULL AS public, time, NULL AS url,"
-        "NULL AS cover, message, NULL AS likes,"
-        "(SELECT profiler FROM Users WHERE Posts.uid=Users.uid) as profiler,"
-        "NULL AS like_status, NULL AS description, 'post' AS type FROM Posts "
-        "WHERE uid IN "
-        "(SELECT Followers.following FROM Followers WHERE follower=%s) "
-        "OR uid=%s)) AS Sp ORDER BY `time` DESC LIMIT %s, %s;"
+    where = (
+        "WHERE Timeline_Items.uid=%s "
+    )
+    if keyset is not None:
+        page = keyset_clauses(TIMELINE_KEYSET_ORDER, keyset, items_per_page)
+        sql = (
+            TIMELINE_COLUMNS + page["column"] + TIMELINE_SOURCE + where
+            + page["where"] + page["order"]
+        )
+        return query(sql, (uid, uid, *page["args"]), True) or []
+
+    sql = TIMELINE_COLUMNS + TIMELINE_SOURCE + where + (
+        "ORDER BY Timeline_Items.time DESC LIMIT %s, %s"
     )
     args = (
-        uid,
-        uid,
-        uid,
         uid,
         uid,
         start_index,
@@ -678,36 +813,9 @@ def get_timeline_length(uid):
     :return:
     Int - Number of items in that list.
     """
-    sql = (
-        "SELECT COUNT(*) FROM ((SELECT sid, "
-        "(SELECT username FROM Users WHERE Songs.uid=Users.uid) as username"
-        ", title, duration, created, public,"
-        "published AS time, url, cover, NULL AS message, "
-        "(SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid=Songs.sid ) "
-        "as likes, "
-        "(SELECT profiler FROM Users WHERE Songs.uid=Users.uid) as profiler,"
-        "(SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid=Songs.sid "
-        "AND Song_Likes.uid=%s) AS like_status, description,"
-        "'song' AS type FROM "
-        "Songs WHERE (uid IN "
-        "(SELECT Followers.following FROM Followers WHERE follower=%s)"
-        " OR uid=%s) AND public=1) UNION (SELECT NULL AS sid, "
-        "(SELECT username FROM Users WHERE Posts.uid=Users.uid) as username"
-        ", NULL AS title,"
-        "NULL AS duration, NULL AS created, NULL AS public, time, NULL AS url,"
-        "NULL AS cover, message, NULL AS likes, "
-        "(SELECT profiler FROM Users WHERE Posts.uid=Users.uid) as profiler,"
-        "NULL AS like_status, NULL AS description, 'post' AS type FROM Posts "
-        "WHERE uid IN "
-        "(SELECT Followers.following FROM Followers WHERE follower=%s)"
-        " OR uid=%s)) AS Sp ORDER BY `time` DESC;"
-    )
+    sql = "SELECT COUNT(*) FROM Timeline_Items WHERE uid=%s"
     args = (
         uid,
-        uid,
-        uid,
-        uid,
-        uid,
     )
     res = query(sql, args, True)
     if not res:
@@ -715,30 +823,35 @@ def get_timeline_length(uid):
     return res[0][0]
 
 
-def get_timeline_posts_only(uid, start_index, items_per_page):
+def get_timeline_posts_only(uid, start_index, items_per_page, keyset=None):
     """
-    Creates a post only timeline list from the user's following data.
+    Get a page of a user's timeline, with only posts.
     :param uid:
     Int - Uid of the user who's timeline we want.
     :param start_index:
     Int - Start index for the page.
     :param items_per_page:
     Int - Number of items that will be returned.
+    :param keyset:
+    Dict|None - Keyset pagination state, used instead of start_index if not
+    None, see utils.keyset.
     :return:
     List - Contains lists of post data in reverse chronological order
     from user's the selected user follows.
     """
-    sql = (
-        "SELECT * FROM ((SELECT NULL AS sid, "
-        "(SELECT username FROM Users WHERE Posts.uid=Users.uid) as username"
-        ", NULL AS title,"
-        "NULL AS duration, NULL AS created, NULL AS public, time, NULL AS url,"
-        "NULL AS cover, message, NULL AS likes,"
-        "(SELECT profiler FROM Users WHERE Posts.uid=Users.uid) as profiler, "
-        "NULL AS like_status, NULL AS description, 'post' AS type FROM Posts "
-        "WHERE uid IN "
-        "(SELECT Followers.following FROM Followers WHERE follower=%s)"
-        " OR uid=%s )) AS Sp ORDER BY `time` DESC LIMIT %s, %s;"
+    where = (
+        "WHERE Timeline_Items.uid=%s AND Timeline_Items.type='post' "
+    )
+    if keyset is not None:
+        page = keyset_clauses(TIMELINE_KEYSET_ORDER, keyset, items_per_page)
+        sql = (
+            TIMELINE_COLUMNS + page["column"] + TIMELINE_SOURCE + where
+            + page["where"] + page["order"]
+        )
+        return query(sql, (uid, uid, *page["args"]), True) or []
+
+    sql = TIMELINE_COLUMNS + TIMELINE_SOURCE + where + (
+        "ORDER BY Timeline_Items.time DESC LIMIT %s, %s"
     )
     args = (
         uid,
@@ -761,20 +874,11 @@ def get_timeline_posts_only_length(uid):
     Int - Number of items in that list.
     """
     sql = (
-        "SELECT COUNT(*) FROM ((SELECT NULL AS sid, "
-        "(SELECT username FROM Users WHERE Posts.uid=Users.uid) as username"
-        ", NULL AS title,"
-        "NULL AS duration, NULL AS created, NULL AS public, time, NULL AS url,"
-        "NULL AS cover, message, NULL AS likes,"
-        "(SELECT profiler FROM Users WHERE Posts.uid=Users.uid) as profiler, "
-        "NULL AS like_status, NULL AS description, 'post' AS type FROM Posts "
-        "WHERE uid IN "
-        "(SELECT Followers.following FROM Followers WHERE follower=%s)"
-        " OR uid=%s)) AS Sp ORDER BY `time` DESC;"
+        "SELECT COUNT(*) FROM Timeline_Items "
+        "WHERE uid=%s AND type='post'"
     )
     args = (
         uid,
-        uid,
     )
     res = query(sql, args, True)
     if not res:
@@ -782,35 +886,37 @@ def get_timeline_posts_only_length(uid):
     return res[0][0]
 
 
-def get_timeline_song_only(uid, start_index, items_per_page):
+def get_timeline_song_only(uid, start_index, items_per_page, keyset=None):
     """
-    Creates a song only timeline list from the user's following data.
+    Get a page of a user's timeline, with only songs.
     :param uid:
     Int - Uid of the user who's timeline we want.
     :param start_index:
     Int - Start index for the page.
     :param items_per_page:
     Int - Number of items that will be returned.
+    :param keyset:
+    Dict|None - Keyset pagination state, used instead of start_index if not
+    None, see utils.keyset.
     :return:
     List - Contains lists of song data in reverse chronological order
     from user's the selected user follows.
     """
-    sql = (
-        "SELECT * FROM ((SELECT sid, "
-        "(SELECT username FROM Users WHERE Songs.uid=Users.uid) as username"
-        ", title, duration, created, public,"
-        "published AS time, url, cover, NULL AS message, "
-        "(SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid=Songs.sid ) "
-        "as likes, "
-        "(SELECT profiler FROM Users WHERE Songs.uid=Users.uid) as profiler,"
-        "(SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid=Songs.sid "
-        "AND Song_Likes.uid=%s) AS like_status, description, 'song' AS type "
-        "FROM Songs WHERE (uid IN "
-        "(SELECT Followers.following FROM Followers WHERE follower=%s)"
-        " OR uid=%s) AND public=1)) AS Sp ORDER BY `time` DESC LIMIT %s, %s;"
+    where = (
+        "WHERE Timeline_Items.uid=%s AND Timeline_Items.type='song' "
+    )
+    if keyset is not None:
+        page = keyset_clauses(TIMELINE_KEYSET_ORDER, keyset, items_per_page)
+        sql = (
+            TIMELINE_COLUMNS + page["column"] + TIMELINE_SOURCE + where
+            + page["where"] + page["order"]
+        )
+        return query(sql, (uid, uid, *page["args"]), True) or []
+
+    sql = TIMELINE_COLUMNS + TIMELINE_SOURCE + where + (
+        "ORDER BY Timeline_Items.time DESC LIMIT %s, %s"
     )
     args = (
-        uid,
         uid,
         uid,
         start_index,
@@ -831,23 +937,11 @@ def get_timeline_song_only_length(uid):
     Int - Number of items in that list.
     """
     sql = (
-        "SELECT COUNT(*) FROM ((SELECT sid, "
-        "(SELECT username FROM Users WHERE Songs.uid=Users.uid) as username"
-        ", title, duration, created, public,"
-        "published AS time, url, cover, NULL AS message, "
-        "(SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid=Songs.sid ) "
-        "as likes, "
-        "(SELECT profiler FROM Users WHERE Songs.uid=Users.uid) as profiler, "
-        "(SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid=Songs.sid "
-        "AND Song_Likes.uid=%s) AS like_status, description, 'song' AS type "
-        "FROM Songs WHERE (uid IN "
-        "(SELECT Followers.following FROM Followers WHERE follower=%s)"
-        " OR uid=%s) AND public=1)) AS Sp ORDER BY `time` DESC;"
+        "SELECT COUNT(*) FROM Timeline_Items "
+        "WHERE uid=%s AND type='song'"
     )
     args = (
         uid,
-        uid,
-        uid,
     )
     res = query(sql, args, True)
     if not res:
@@ -855,6 +949,245 @@ def get_timeline_song_only_length(uid):
     return res[0][0]
 
 
+def fan_out_post(post_id, uid, time_of_post):
+    """
+    Add a new post to the timelines of its author & all their followers.
+    :param post_id:
+    Int - ID of the new post.
+    :param uid:
+    Int - Uid of the user who made the post.
+    :param time_of_post:
+    Str - Datetime string from when the post was made.
+    :return:
+    None - Adds the timeline items and returns None.
+    """
+    sql = (
+        "INSERT IGNORE INTO Timeline_Items "
+        "(uid, type, item_id, author, time) "
+        "SELECT %s, 'post', %s, %s, %s UNION ALL "
+        "SELECT follower, 'post', %s, %s, %s FROM Followers "
+        "WHERE following=%s"
+    )
+    args = (
+        uid,
+        post_id,
+        uid,
+        time_of_post,
+        post_id,
+        uid,
+        time_of_post,
+        uid,
+    )
+    query(sql, args)
+
+
+def fan_out_song(sid):
+    """
+    Add a newly published song to the timelines of its owner & all their
+    followers, or move it to the top if it was republished.
+    :param sid:
+    Int - ID of the published song.
+    :return:
+    None - Adds the timeline items and returns None.
+    """
+    sql = (
+        "INSERT INTO Timeline_Items (uid, type, item_id, author, time) "
+        "SELECT * FROM (SELECT uid AS owner, 'song', sid, uid, "
+        "COALESCE(published, created) FROM Songs WHERE sid=%s AND public=1 "
+        "UNION ALL SELECT follower, 'song', sid, uid, "
+        "COALESCE(published, created) FROM Songs "
+        "INNER JOIN Followers ON Followers.following = Songs.uid "
+        "WHERE sid=%s AND public=1) AS Fan_Out "
+        "ON DUPLICATE KEY UPDATE time=VALUES(time)"
+    )
+    args = (
+        sid,
+        sid,
+    )
+    query(sql, args)
+
+
+def remove_song_from_timelines(sid):
+    """
+    Remove an unpublished or deleted song from every timeline.
+    :param sid:
+    Int - ID of the song being removed.
+    :return:
+    None - Deletes the timeline items and returns None.
+    """
+    sql = "DELETE FROM Timeline_Items WHERE type='song' AND item_id=%s"
+    args = (
+        sid,
+    )
+    query(sql, args)
+
+
+def backfill_timeline(follower_uid, following_uid):
+    """
+    Add a user's posts & public songs to the timeline of a new follower.
+    :param follower_uid:
+    Int - Uid of the user who is following.
+    :param following_uid:
+    Int - Uid of the user being followed.
+    :return:
+    None - Adds the timeline items and returns None.
+    """
+    sql = (
+        "INSERT IGNORE INTO Timeline_Items "
+        "(uid, type, item_id, author, time) "
+        "SELECT %s, 'post', post_id, uid, time FROM Posts WHERE uid=%s "
+        "UNION ALL SELECT %s, 'song', sid, uid, "
+        "COALESCE(published, created) FROM Songs WHERE uid=%s AND public=1"
+    )
+    args = (
+        follower_uid,
+        following_uid,
+        follower_uid,
+        following_uid,
+    )
+    query(sql, args)
+
+
+def prune_timeline(follower_uid, following_uid):
+    """
+    Remove a user's posts & songs from the timeline of an ex-follower.
+    :param follower_uid:
+    Int - Uid of the user who was following.
+    :param following_uid:
+    Int - Uid of the user who was followed.
+    :return:
+    None - Deletes the timeline items and returns None.
+    """
+    sql = "DELETE FROM Timeline_Items WHERE author=%s AND uid=%s"
+    args = (
+        following_uid,
+        follower_uid,
+    )
+    query(sql, args)
+
+
+def rebuild_timelines():
+    """
+    Rebuild every user's timeline from the Posts, Songs & Followers tables.
+    Used after bulk inserts, which skip the timeline fan out.
+    :return:
+    None - Fills Timeline_Items and returns None.
+    """
+    sql = (
+        "INSERT IGNORE INTO Timeline_Items "
+        "(uid, type, item_id, author, time) "
+        "SELECT uid, 'post', post_id, uid, time FROM Posts UNION ALL "
+        "SELECT follower, 'post', post_id, uid, time FROM Posts "
+        "INNER JOIN Followers ON following = Posts.uid UNION ALL "
+        "SELECT uid, 'song', sid, uid, COALESCE(published, created) "
+        "FROM Songs WHERE public=1 UNION ALL "
+        "SELECT follower, 'song', sid, uid, COALESCE(published, created) "
+        "FROM Songs "
+        "INNER JOIN Followers ON following = Songs.uid "
+        "WHERE public=1"
+    )
+    query(sql, ())
+
+
+# Notification types sent to a user's followers, with the Users column a
+# follower can mute each with. Notification_Audience holds the devices of
+# every follower who hasn't muted the type, so fan outs are one indexed read.
+AUDIENCE_TYPES = (
+    ("post", "silence_post_notifcation"),
+    ("song", "silence_song_notifcation"),
+)
+
+
+def add_to_audience(condition, args):
+    """
+    Add the devices of the followers matching a condition to the
+    notification audiences of the users they follow, for every type of
+    notification they haven't muted.
+    :param condition:
+    Str - SQL condition on the Followers & Notifications tables.
+    :param args:
+    Tuple containing the arguments to populate %s tokens in the condition.
+    :return:
+    None - Adds to the Notification_Audience table and returns None.
+    """
+    sql = (
+        "INSERT IGNORE INTO Notification_Audience "
+        "(uid, type, did, follower) "
+    ) + " UNION ALL ".join(
+        "SELECT Followers.following, '" + notification_type + "', did, "
+        "Followers.follower FROM Followers "
+        "INNER JOIN Users ON Users.uid = Followers.follower "
+        "INNER JOIN Notifications ON Notifications.uid = Followers.follower "
+        "WHERE " + mute_column + " = 0 AND " + condition
+        for notification_type, mute_column in AUDIENCE_TYPES
+    )
+    query(sql, tuple(args) * len(AUDIENCE_TYPES))
+
+
+def refresh_audience(uid):
+    """
+    Recompute where a user's devices appear in notification audiences, eg.
+    after they change which notifications they've muted.
+    :param uid:
+    Int - Uid of the follower.
+    :return:
+    None - Updates the Notification_Audience table and returns None.
+    """
+    sql = "DELETE FROM Notification_Audience WHERE follower=%s"
+    args = (
+        uid,
+    )
+    with transaction():
+        query(sql, args)
+        add_to_audience("Followers.follower = %s", args)
+
+
+def rebuild_notification_audience():
+    """
+    Rebuild every notification audience from the Followers, Users &
+    Notifications tables. Used after bulk inserts, which skip the audience.
+    :return:
+    None - Fills Notification_Audience and returns None.
+    """
+    add_to_audience("TRUE", ())
+
+
+def stream_notification_audience(uid, notification_type, chunk_size):
+    """
+    Get the did's of every follower of a user to send a type of
+    notification to, a chunk at a time. Each chunk is a separate keyset
+    paged query, so it runs on the current transaction's connection & only
+    one chunk is held in memory.
+    :param uid:
+    Int - Uid of the user being followed.
+    :param notification_type:
+    Str - 'post' or 'song'.
+    :param chunk_size:
+    Int - Max number of dids per chunk.
+    :return:
+    Generator - Yields lists of dids.
+    """
+    sql = (
+        "SELECT did FROM Notification_Audience "
+        "WHERE uid=%s AND type=%s AND did > %s "
+        "ORDER BY did LIMIT %s"
+    )
+    last_did = ""
+    while True:
+        args = (
+            uid,
+            notification_type,
+            last_did,
+            chunk_size,
+        )
+        rows = query(sql, args, True)
+        if rows:
+            yield [row[0] for row in rows]
+        if not rows or len(rows) < chunk_size:
+            return
+        last_did = rows[-1][0]
+
+
 def register_device_for_notifications(did, uid):
     """
     Adds a device to the notifications table.
@@ -874,7 +1207,9 @@ def register_device_for_notifications(did, uid):
         did,
         uid,
     )
-    query(sql, args)
+    with transaction():
+        query(sql, args)
+        add_to_audience("Notifications.did = %s", (did,))
 
 
 def unregister_device_for_notifications(did, uid):
@@ -895,7 +1230,13 @@ def unregister_device_for_notifications(did, uid):
         did,
         uid,
     )
-    query(sql, args)
+    with transaction():
+        query(sql, args)
+        sql = (
+            "DELETE FROM Notification_Audience "
+            "WHERE did=%s AND follower=%s"
+        )
+        query(sql, args)
 
 
 def update_silence_all_notificaitons(uid, status):
@@ -922,7 +1263,9 @@ def update_silence_all_notificaitons(uid, status):
         status,
         uid,
     )
-    query(sql, args)
+    with transaction():
+        query(sql, args)
+        refresh_audience(uid)
 
 
 def update_silence_follow_notificaitons(uid, status):
@@ -968,7 +1311,9 @@ def update_silence_post_notificaitons(uid, status):
         status,
         uid,
     )
-    query(sql, args)
+    with transaction():
+        query(sql, args)
+        refresh_audience(uid)
 
 
 def update_silence_song_notificaitons(uid, status):
@@ -991,7 +1336,9 @@ def update_silence_song_notificaitons(uid, status):
         status,
         uid,
     )
-    query(sql, args)
+    with transaction():
+        query(sql, args)
+        refresh_audience(uid)
 
 
 def update_silence_like_notificaitons(uid, status):
@@ -1048,9 +1395,8 @@ def notify_post_dids(uid):
     List - A list of dids.
     """
     sql = (
-        "SELECT did FROM Notifications WHERE uid IN (SELECT uid FROM Users "
-        "WHERE uid IN (SELECT follower FROM Followers WHERE following=%s) "
-        "AND silence_post_notifcation=0);"
+        "SELECT did FROM Notification_Audience "
+        "WHERE uid=%s AND type='post'"
     )
     args = (
         uid,
@@ -1076,40 +1422,156 @@ def delete_user_data(uid):
         uid,
         uid,
     )
+    with transaction():
+        sql = (
+            "DELETE FROM Song_State WHERE sid IN "
+            "(SELECT sid FROM Songs WHERE uid=%s)"
+        )
+        query(sql, args)
+        sql = (
+            "UPDATE Songs INNER JOIN ("
+            "SELECT sid, COUNT(*) AS likes FROM Song_Likes WHERE uid=%s "
+            "GROUP BY sid) AS Counts ON Counts.sid = Songs.sid "
+            "SET Songs.likes_count = Songs.likes_count - Counts.likes"
+        )
+        query(sql, args)
+        sql = "DELETE FROM Song_Likes WHERE uid=%s"
+        query(sql, args)
+        sql = "DELETE FROM Song_Editors WHERE uid=%s"
+        query(sql, args)
+        sql = (
+            "DELETE FROM Playlist_State WHERE sid IN "
+            "(SELECT sid FROM Songs WHERE uid=%s)"
+        )
+        query(sql, args)
+        sql = (
+            "UPDATE User_Stats INNER JOIN ("
+            "SELECT Song_Likes.uid, COUNT(*) AS likes FROM Song_Likes "
+            "INNER JOIN Songs ON Songs.sid = Song_Likes.sid "
+            "WHERE Songs.uid=%s GROUP BY Song_Likes.uid"
+            ") AS Counts ON Counts.uid = User_Stats.uid "
+            "SET User_Stats.likes = User_Stats.likes - Counts.likes"
+        )
+        query(sql, args)
+        sql = "DELETE FROM Songs WHERE uid=%s"
+        query(sql, args)
+        sql = "DELETE FROM Verification WHERE uid=%s"
+        query(sql, args)
+        sql = "DELETE FROM Playlists WHERE uid=%s"
+        query(sql, args)
+        sql = "DELETE FROM Notification_Audience WHERE uid=%s OR follower=%s"
+        query(sql, alt_args)
+        sql = "DELETE FROM Notifications WHERE uid=%s"
+        query(sql, args)
+        sql = (
+            "UPDATE User_Stats INNER JOIN ("
+            "SELECT following AS uid, COUNT(*) AS follows FROM Followers "
+            "WHERE follower=%s GROUP BY following"
+            ") AS Counts ON Counts.uid = User_Stats.uid "
+            "SET User_Stats.followers = User_Stats.followers - Counts.follows"
+        )
+        query(sql, args)
+        sql = (
+            "UPDATE User_Stats INNER JOIN ("
+            "SELECT follower AS uid, COUNT(*) AS follows FROM Followers "
+            "WHERE following=%s GROUP BY follower"
+            ") AS Counts ON Counts.uid = User_Stats.uid "
+            "SET User_Stats.following = User_Stats.following - Counts.follows"
+        )
+        query(sql, args)
+        sql = "DELETE FROM Followers WHERE follower=%s OR following=%s"
+        query(sql, alt_args)
+        sql = "DELETE FROM Timeline_Items WHERE uid=%s OR author=%s"
+        query(sql, alt_args)
+        sql = "DELETE FROM Posts WHERE uid=%s"
+        query(sql, args)
+        sql = "DELETE FROM Logins WHERE uid=%s"
+        query(sql, args)
+        TOKEN_CACHE.discard_user(uid)
+        sql = "DELETE FROM Resets WHERE uid=%s"
+        query(sql, args)
+        sql = (
+            "DELETE FROM Folder WHERE folder_id=("
+            "SELECT root_folder FROM Users WHERE uid=%s);"
+        )
+        query(sql, args)
+
+
+# Columns of the User_Stats table, which holds a running count of each for
+# every user so profiles don't have to COUNT the underlying tables.
+USER_STATS = ("followers", "following", "songs", "posts", "likes")
+
+
+def update_user_stats(stat, deltas):
+    """
+    Adjust one of the User_Stats counters for any number of users, creating
+    their User_Stats row if they don't have one yet.
+    :param stat:
+    Str - The counter being adjusted, one of USER_STATS.
+    :param deltas:
+    [(Int, Int),...] - (uid, change) for each user who's counter changed.
+    :return:
+    None - Updates the counters and returns None.
+    """
+    if stat not in USER_STATS:
+        raise ValueError("Invalid user stat.")
     sql = (
-        "DELETE FROM Song_State WHERE sid IN "
-        "(SELECT sid FROM Songs WHERE uid=%s)"
-    )
-    query(sql, args)
-    sql = "DELETE FROM Song_Likes WHERE uid=%s"
-    query(sql, args)
-    sql = "DELETE FROM Song_Editors WHERE uid=%s"
-    query(sql, args)
+        "INSERT INTO User_Stats (uid, {0}) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE {0} = GREATEST({0} + VALUES({0}), 0)"
+    ).format(stat)
+    query_many(sql, [(uid, delta) for uid, delta in deltas if delta])
+
+
+def get_user_profile(username, viewer_uid):
+    """
+    Get a user's profile info & counters in a single row read.
+    :param username:
+    Str - Username of the user who's profile we want.
+    :param viewer_uid:
+    Int - Uid of the user viewing the profile.
+    :return:
+    List - Containing 1 list with the user's uid, username, profiler, their 4
+    notification silence statuses, their followers, following, songs, posts
+    & likes counts, and 1 if the viewer follows them else 0.
+    """
     sql = (
-        "DELETE FROM Playlist_State WHERE sid IN "
-        "(SELECT sid FROM Songs WHERE uid=%s)"
+        "SELECT Users.uid, username, profiler, silence_follow_notifcation, "
+        "silence_post_notifcation, silence_song_notifcation, "
+        "silence_like_notifcation, COALESCE(followers, 0), "
+        "COALESCE(following, 0), COALESCE(songs, 0), COALESCE(posts, 0), "
+        "COALESCE(likes, 0), EXISTS(SELECT * FROM Followers WHERE "
+        "follower=%s AND following=Users.uid) FROM Users "
+        "LEFT JOIN User_Stats ON User_Stats.uid = Users.uid "
+        "WHERE username=%s"
     )
-    query(sql, args)
-    sql = "DELETE FROM Songs WHERE uid=%s"
-    query(sql, args)
-    sql = "DELETE FROM Verification WHERE uid=%s"
-    query(sql, args)
-    sql = "DELETE FROM Playlists WHERE uid=%s"
-    query(sql, args)
-    sql = "DELETE FROM Notifications WHERE uid=%s"
-    query(sql, args)
-    sql = "DELETE FROM Notifications WHERE uid=%s"
-    query(sql, args)
-    sql = "DELETE FROM Followers WHERE follower=%s OR following=%s"
-    query(sql, alt_args)
-    sql = "DELETE FROM Posts WHERE uid=%s"
-    query(sql, args)
-    sql = "DELETE FROM Logins WHERE uid=%s"
-    query(sql, args)
-    sql = "DELETE FROM Resets WHERE uid=%s"
-    query(sql, args)
-    sql = (
-        "DELETE FROM Folder WHERE folder_id=("
-        "SELECT root_folder FROM Users WHERE uid=%s);"
+    args = (
+        viewer_uid,
+        username,
     )
-    query(sql, args)
+    res = query(sql, args, True)
+    if not res:
+        raise NoResults
+    return res
+
+
+def reconcile_user_stats():
+    """
+    Recount every user's User_Stats counters from the underlying tables,
+    repairing any drift.
+    :return:
+    None - Updates User_Stats and returns None.
+    """
+    sql = (
+        "INSERT INTO User_Stats "
+        "(uid, followers, following, songs, posts, likes) "
+        "SELECT uid, "
+        "(SELECT COUNT(*) FROM Followers WHERE following=Users.uid), "
+        "(SELECT COUNT(*) FROM Followers WHERE follower=Users.uid), "
+        "(SELECT COUNT(*) FROM Songs WHERE uid=Users.uid AND public=1), "
+        "(SELECT COUNT(*) FROM Posts WHERE uid=Users.uid), "
+        "(SELECT COUNT(*) FROM Song_Likes WHERE uid=Users.uid) "
+        "FROM Users ON DUPLICATE KEY UPDATE "
+        "followers=VALUES(followers), following=VALUES(following), "
+        "songs=VALUES(songs), posts=VALUES(posts), likes=VALUES(likes)"
+    )
+    query(sql, ())
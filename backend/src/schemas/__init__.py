@@ -0,0 +1,37 @@
+"""
+Registry of the JSON schemas for every request body, each compiled into a
+validator once at import instead of on every request.
+"""
+from jsonschema.validators import validator_for
+
+from .audio import AUDIO_SCHEMAS
+from .auth import AUTH_SCHEMAS
+from .s3 import S3_SCHEMAS
+from .users import USERS_SCHEMAS
+
+
+def compile_schemas(groups):
+    """
+    Check every schema & build a validator for it.
+    :param groups:
+    Dict - Schemas by name, keyed by the blueprint they're for.
+    :return:
+    Dict - Validators keyed by '<blueprint>.<name>', eg. 'audio.save_song'.
+    :raises:
+    jsonschema.SchemaError - If a schema is invalid.
+    """
+    validators = {}
+    for blueprint, schemas in groups.items():
+        for name, schema in schemas.items():
+            cls = validator_for(schema)
+            cls.check_schema(schema)
+            validators[blueprint + "." + name] = cls(schema)
+    return validators
+
+
+VALIDATORS = compile_schemas({
+    "audio": AUDIO_SCHEMAS,
+    "auth": AUTH_SCHEMAS,
+    "s3": S3_SCHEMAS,
+    "users": USERS_SCHEMAS,
+})
@@ -0,0 +1,269 @@
+"""
+Schemas for the /audio request bodies.
+"""
+
+AUDIO_SCHEMAS = {
+    "create_song": {
+        "type": "object",
+        "properties": {
+            "title": {
+                "type": "string",
+                "minLength": 1
+            }
+        },
+        "required": ["title"]
+    },
+    "rename_song": {
+        "type": "object",
+        "properties": {
+            "sid": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "title": {
+                "type": "string",
+                "minLength": 1
+            }
+        },
+        "required": ["sid", "title"]
+    },
+    "save_song": {
+        "type": "object",
+        "properties": {
+            "sid": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "song_state": {
+                "type": "object"
+            }
+        },
+        "required": ["sid", "song_state"]
+    },
+    "like_song": {
+        "type": "object",
+        "properties": {
+            "sid": {
+                "type": "integer",
+                "minimum": 1
+            }
+        },
+        "required": ["sid"]
+    },
+    "unlike_song": {
+        "type": "object",
+        "properties": {
+            "sid": {
+                "type": "integer",
+                "minimum": 1
+            }
+        },
+        "required": ["sid"]
+    },
+    "publish_song": {
+        "type": "object",
+        "properties": {
+            "sid": {
+                "type": "integer",
+                "minimum": 1
+            }
+        },
+        "required": ["sid"]
+    },
+    "unpublish_song": {
+        "type": "object",
+        "properties": {
+            "sid": {
+                "type": "integer",
+                "minimum": 1
+            }
+        },
+        "required": ["sid"]
+    },
+    "compiled_url": {
+        "type": "object",
+        "properties": {
+            "sid": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "url": {
+                "type": "string",
+                "pattern": (
+                    r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|"
+                    r"(?:%[0-9a-fA-F][0-9a-fA-F]))+"
+                ),
+                "minLength": 1
+            },
+            "duration": {
+                "type": "integer",
+                "minimum": 0
+            }
+        },
+        "required": ["sid", "url", "duration"],
+        "minProperties": 3
+    },
+    "cover_url": {
+        "type": "object",
+        "properties": {
+            "sid": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "url": {
+                "type": "string",
+                "pattern": (
+                    r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|"
+                    r"[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+"
+                ),
+                "minLength": 1
+            }
+        },
+        "required": ["sid", "url"],
+        "minProperties": 2
+    },
+    "create_a_playlist": {
+        "type": "object",
+        "properties": {
+            "title": {
+                "type": "string",
+                "minLength": 1
+            }
+        },
+        "required": ["title"]
+    },
+    "delete_my_playlist": {
+        "type": "object",
+        "properties": {
+            "pid": {
+                "type": "integer",
+                "minimum": 1
+            }
+        },
+        "required": ["pid"]
+    },
+    "rename_playlist": {
+        "type": "object",
+        "properties": {
+            "pid": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "title": {
+                "type": "string",
+                "minLength": 1
+            }
+        },
+        "required": ["pid", "title"]
+    },
+    "add_song_to_playlist": {
+        "type": "object",
+        "properties": {
+            "pid": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "sid": {
+                "type": "integer",
+                "minimum": 1
+            }
+        },
+        "required": ["pid", "sid"]
+    },
+    "remove_song_from_playlist": {
+        "type": "object",
+        "properties": {
+            "pid": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "sid": {
+                "type": "integer",
+                "minimum": 1
+            }
+        },
+        "required": ["pid", "sid"]
+    },
+    "description": {
+        "type": "object",
+        "properties": {
+            "sid": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "description": {
+                "type": "string",
+                "minLength": 1
+            }
+        },
+        "required": ["sid", "description"],
+        "minProperties": 2
+    },
+    "delete_song": {
+        "type": "object",
+        "properties": {
+            "sid": {
+                "type": "integer",
+                "minimum": 1
+            }
+        },
+        "required": ["sid"]
+    },
+    "create_folder": {
+        "type": "object",
+        "properties": {
+            "folder_name": {
+                "type": "string",
+                "minLength": 1
+            },
+            "parent_folder_id": {
+                "type": "integer",
+                "minimum": 1
+            }
+        },
+        "required": ["folder_name"]
+    },
+    "create_file": {
+        "type": "object",
+        "properties": {
+            "file_name": {
+                "type": "string",
+                "minLength": 1
+            },
+            "file_url": {
+                "type": "string",
+                "minLength": 1
+            },
+            "folder_id": {
+                "type": "integer",
+                "minimum": 1
+            }
+        },
+        "required": ["file_name", "file_url"]
+    },
+    "create_synth": {
+        "type": "object",
+        "properties": {
+            "name": {
+                "type": "string",
+                "minLength": 1
+            },
+            "patch": {
+                "type": "object"
+            }
+        },
+        "required": ["name"]
+    },
+    "edit_synth": {
+        "type": "object",
+        "properties": {
+            "patch": {
+                "type": "object"
+            },
+            "name": {
+                "type": "string",
+                "minLength": 1
+            }
+        }
+    },
+}
@@ -0,0 +1,34 @@
+"""
+Schemas for the /auth request bodies.
+"""
+
+AUTH_SCHEMAS = {
+    "login": {
+        "type": "object",
+        "properties": {
+            "username": {
+                "type": "string",
+                "minLength": 1
+            },
+            "password": {
+                "type": "string",
+                "minLength": 1
+            },
+            "did": {
+                "type": "string",
+                "minLength": 1
+            }
+        },
+        "required": ["username", "password"]
+    },
+    "refresh": {
+        "type": "object",
+        "properties": {
+            "refresh_token": {
+                "type": "string",
+                "minLength": 1
+            }
+        },
+        "required": ["refresh_token"]
+    },
+}
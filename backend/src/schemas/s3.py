@@ -0,0 +1,59 @@
+"""
+Schemas for the /s3 request bodies.
+"""
+from ..config import MAX_SIGNED_FORM_POSTS
+
+# Directories files can be uploaded to.
+DIR_PATTERN = "^(audio|profiler|compiled_audio|cover)$"
+
+S3_SCHEMAS = {
+    "signed_form_post": {
+        "type": "object",
+        "properties": {
+            "dir": {
+                "type": "string",
+                "pattern": DIR_PATTERN,
+                "minLength": 1,
+            },
+            "fileName": {
+                "type": "string",
+                "minLength": 1
+            },
+            "fileType": {
+                "type": "string",
+                "minLength": 1,
+            }
+        },
+        "required": ["dir", "fileName", "fileType"]
+    },
+    "signed_form_posts": {
+        "type": "object",
+        "properties": {
+            "dir": {
+                "type": "string",
+                "pattern": DIR_PATTERN,
+                "minLength": 1,
+            },
+            "files": {
+                "type": "array",
+                "minItems": 1,
+                "maxItems": MAX_SIGNED_FORM_POSTS,
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "fileName": {
+                            "type": "string",
+                            "minLength": 1
+                        },
+                        "fileType": {
+                            "type": "string",
+                            "minLength": 1,
+                        }
+                    },
+                    "required": ["fileName", "fileType"]
+                }
+            }
+        },
+        "required": ["dir", "files"]
+    },
+}
@@ -0,0 +1,181 @@
+"""
+Schemas for the /users request bodies.
+"""
+
+USERS_SCHEMAS = {
+    "follow": {
+        "type": "object",
+        "properties": {
+            "username": {
+                "type": "string",
+                "minLength": 1
+            }
+        },
+        "required": ["username"]
+    },
+    "unfollow": {
+        "type": "object",
+        "properties": {
+            "username": {
+                "type": "string",
+                "minLength": 1
+            }
+        },
+        "required": ["username"]
+    },
+    "register": {
+        "type": "object",
+        "properties": {
+            "username": {
+                "type": "string",
+                "minLength": 1
+            },
+            "email": {
+                "type": "string",
+                "pattern": r"[^@]+@[^@]+\.[^@]+",
+                "minLength": 1
+            },
+            "password": {
+                "type": "string",
+                "minLength": 1
+            }
+        },
+        "required": ["username", "email", "password"]
+    },
+    "reverify": {
+        "type": "object",
+        "properties": {
+            "email": {
+                "type": "string",
+                "pattern": r"[^@]+@[^@]+\.[^@]+",
+                "minLength": 1
+            }
+        },
+        "required": ["email"]
+    },
+    "reset": {
+        "type": "object",
+        "properties": {
+            "email": {
+                "type": "string",
+                "pattern": r"[^@]+@[^@]+\.[^@]+",
+                "minLength": 1
+            },
+            "code": {
+                "type": "integer",
+                "minimum": 10000000,
+                "maximum": 99999999
+            },
+            "password": {
+                "type": "string",
+                "minLength": 1
+            }
+        },
+        "required": ["email", "code", "password"]
+    },
+    "post": {
+        "type": "object",
+        "properties": {
+            "message": {
+                "type": "string",
+                "minLength": 1
+            }
+        },
+        "required": ["message"]
+    },
+    "patch_user": {
+        "type": "object",
+        "properties": {
+            "password": {
+                "type": "string",
+                "minLength": 1
+            },
+            "email": {
+                "type": "string",
+                "pattern": r"[^@]+@[^@]+\.[^@]+",
+                "minLength": 1
+            },
+            "current_password": {
+                "type": "string",
+                "minLength": 1
+            }
+        },
+        "required": ["current_password"],
+        "minProperties": 2
+    },
+    "profiler": {
+        "type": "object",
+        "properties": {
+            "url": {
+                "type": "string",
+                "pattern": (
+                    r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|"
+                    r"[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+"
+                ),
+                "minLength": 1
+            },
+        },
+        "required": ["url"],
+        "minProperties": 1
+    },
+    "patch_notification_status": {
+        "type": "object",
+        "properties": {
+            "status": {
+                "type": "integer",
+                "minimum": 0,
+                "maximum": 1
+            }
+        },
+        "required": ["status"],
+        "minProperties": 1
+    },
+    "patch_follow_notification_status": {
+        "type": "object",
+        "properties": {
+            "status": {
+                "type": "integer",
+                "minimum": 0,
+                "maximum": 1
+            }
+        },
+        "required": ["status"],
+        "minProperties": 1
+    },
+    "patch_post_notification_status": {
+        "type": "object",
+        "properties": {
+            "status": {
+                "type": "integer",
+                "minimum": 0,
+                "maximum": 1
+            }
+        },
+        "required": ["status"],
+        "minProperties": 1
+    },
+    "patch_song_notification_status": {
+        "type": "object",
+        "properties": {
+            "status": {
+                "type": "integer",
+                "minimum": 0,
+                "maximum": 1
+            }
+        },
+        "required": ["status"],
+        "minProperties": 1
+    },
+    "patch_like_notification_status": {
+        "type": "object",
+        "properties": {
+            "status": {
+                "type": "integer",
+                "minimum": 0,
+                "maximum": 1
+            }
+        },
+        "required": ["status"],
+        "minProperties": 1
+    },
+}
@@ -1,7 +1,9 @@
 """
 Allowing for easier importing of util functions
 """
-from .query import query
+from .query import query, query_many, transaction, after_commit
+from .keyset import get_keyset, keyset_clauses, keyset_page
+from .etag import make_etag, etag_headers, not_modified
 from .random_string import random_string
 from .send_mail import send_mail
 from .logger import log
@@ -18,3 +20,5 @@ from .notification_sender import notification_sender
 from .gen_folder_object import gen_folder_object
 from .gen_file_object import gen_file_object
 from .gen_synth_object import gen_synth_object
+from .gen_session_tokens import gen_session_tokens
+from .s3_client import get_s3_client
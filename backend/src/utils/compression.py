@@ -0,0 +1,178 @@
+"""
+Negotiated gzip & brotli compression of responses, & decompression of
+compressed request bodies.
+"""
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from flask import request
+
+from ..config import COMPRESSION_CONFIG
+
+# Decompressing brotli with a bounded output needs brotli 1.1+.
+if brotli is not None and not hasattr(
+        brotli.Decompressor, "can_accept_more_data"
+):
+    brotli = None
+
+# Content-Encodings this process can compress & decompress, preferred first.
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Compressed bodies are decompressed into at most this many bytes at a time,
+# so a small body that inflates to a huge one is caught once it passes
+# max_body_size, without inflating any further.
+CHUNK_SIZE = 64 * 1024
+
+# Compressed input fed to the brotli decompressor per call.
+INPUT_CHUNK_SIZE = 1024
+
+
+class BodyTooLarge(Exception):
+    """
+    Raised when a compressed body decompresses to more than max_body_size.
+    """
+
+
+def is_compressible(mimetype):
+    """
+    Check if a response type is worth compressing.
+    :param mimetype:
+    Str - Mimetype of the response, without parameters.
+    :return:
+    Bool - True for JSON & text, False for eg. already compressed audio.
+    """
+    return mimetype == "application/json" or mimetype.startswith("text/")
+
+
+def choose_encoding():
+    """
+    Pick the encoding to compress the current response with from the
+    request's Accept-Encoding.
+    :return:
+    Str|None - 'br' or 'gzip', or None if the client accepts neither.
+    """
+    best = None
+    best_quality = 0
+    for encoding in ENCODINGS:
+        quality = request.accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding):
+    """
+    Compress a response body.
+    :param data:
+    Bytes - Uncompressed body.
+    :param encoding:
+    Str - 'br' or 'gzip'.
+    :return:
+    Bytes - Compressed body.
+    """
+    if encoding == "br":
+        return brotli.compress(
+            data, quality=COMPRESSION_CONFIG['brotli_quality']
+        )
+    return gzip.compress(
+        data, compresslevel=COMPRESSION_CONFIG['gzip_level'], mtime=0
+    )
+
+
+def compress_response(response):
+    """
+    Compress a response for the current request if it's large enough & the
+    client accepts an encoding we support. A strong ETag gets the encoding
+    appended, as the compressed bytes differ from the uncompressed ones.
+    :param response:
+    Response - The response Flask is about to send.
+    :return:
+    Response - The same response, compressed if it was worth it.
+    """
+    if (
+            response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or not is_compressible(response.mimetype or "")
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    if response.content_length is not None and (
+            response.content_length < COMPRESSION_CONFIG['min_size']
+    ):
+        return response
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag + "-" + encoding)
+    return response
+
+
+def decompress(data, encoding):
+    """
+    Decompress a request body.
+    :param data:
+    Bytes - Compressed body.
+    :param encoding:
+    Str - The body's Content-Encoding, 'gzip' or 'br'.
+    :return:
+    Bytes - Decompressed body.
+    :raises:
+    ValueError - If the body isn't valid for its encoding.
+    BodyTooLarge - If it decompresses to more than max_body_size bytes.
+    """
+    limit = COMPRESSION_CONFIG['max_body_size']
+    out = []
+    size = 0
+    if encoding == "gzip":
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            while not decompressor.eof:
+                chunk = decompressor.decompress(data, CHUNK_SIZE)
+                data = decompressor.unconsumed_tail
+                if not chunk and not data:
+                    break
+                out.append(chunk)
+                size += len(chunk)
+                if size > limit:
+                    raise BodyTooLarge()
+            if not decompressor.eof:
+                raise ValueError("Truncated gzip body.")
+        except zlib.error as exc:
+            raise ValueError(str(exc))
+    else:
+        decompressor = brotli.Decompressor()
+        start = 0
+        try:
+            while True:
+                # Input may only be fed once the output of the last input
+                # has all been taken.
+                chunk = b""
+                if decompressor.can_accept_more_data():
+                    if start >= len(data):
+                        break
+                    chunk = data[start:start + INPUT_CHUNK_SIZE]
+                    start += len(chunk)
+                out.append(decompressor.process(
+                    chunk, output_buffer_limit=CHUNK_SIZE
+                ))
+                size += len(out[-1])
+                if size > limit:
+                    raise BodyTooLarge()
+                if not chunk and not out[-1]:
+                    break
+            if not decompressor.is_finished():
+                raise ValueError("Truncated brotli body.")
+        except brotli.error as exc:
+            raise ValueError(str(exc))
+    return b"".join(out)
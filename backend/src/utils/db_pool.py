@@ -0,0 +1,204 @@
+"""
+Bounded, thread-safe pool of MySQL connections used by the query functions.
+"""
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector.errors import PoolError
+
+from ..config import MYSQL_CONFIG, MYSQL_POOL_CONFIG
+
+
+class ConnectionPool:
+    """
+    A LIFO pool of MySQL connections.
+    Connections are created lazily, up to `size` of them. Callers block for
+    at most `timeout` seconds when every connection is checked out, after
+    which a PoolError is raised. Connections older than `max_lifetime`
+    seconds are recycled and connections idle for longer than
+    `ping_interval` seconds are health checked before being handed out.
+    """
+    # pylint: disable=R0913
+    def __init__(
+            self, connect_args, size, timeout, max_lifetime, ping_interval
+    ):
+        self._connect_args = connect_args
+        self._size = size
+        self._timeout = timeout
+        self._max_lifetime = max_lifetime
+        self._ping_interval = ping_interval
+        self._cond = threading.Condition()
+        # Idle connections as (connection, created, last_used) tuples.
+        self._idle = deque()
+        # Creation time of every open connection, keyed by id(connection).
+        self._created = {}
+        self._open = 0
+        self._stats = {
+            "acquired": 0,
+            "created": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+            "discarded": 0,
+            "waits": 0,
+            "exhausted": 0,
+        }
+
+    def _connect(self):
+        """
+        Open a brand new autocommitting connection.
+        :return:
+        MySQLConnection - A freshly opened connection.
+        """
+        cnx = mysql.connector.connect(**self._connect_args)
+        cnx.autocommit = True
+        self._created[id(cnx)] = time.monotonic()
+        with self._cond:
+            self._stats["created"] += 1
+        return cnx
+
+    def _close(self, cnx):
+        """
+        Close a connection, ignoring errors from already broken sockets.
+        :param cnx:
+        MySQLConnection - The connection being thrown away.
+        """
+        self._created.pop(id(cnx), None)
+        try:
+            cnx.close()
+        except mysql.connector.Error:
+            pass
+
+    def _healthy(self, cnx, created, last_used):
+        """
+        Check if an idle connection may be handed out again.
+        :return:
+        Bool - False if the connection should be recycled.
+        """
+        now = time.monotonic()
+        if now - created > self._max_lifetime:
+            with self._cond:
+                self._stats["recycled"] += 1
+            return False
+        if now - last_used > self._ping_interval:
+            try:
+                cnx.ping(reconnect=False)
+            except mysql.connector.Error:
+                with self._cond:
+                    self._stats["health_check_failures"] += 1
+                return False
+        return True
+
+    def acquire(self):
+        """
+        Check a connection out of the pool.
+        :return:
+        MySQLConnection - A connection that must be given back via release().
+        """
+        deadline = time.monotonic() + self._timeout
+        with self._cond:
+            waited = False
+            while True:
+                if self._idle:
+                    cnx, created, last_used = self._idle.pop()
+                    break
+                if self._open < self._size:
+                    self._open += 1
+                    cnx = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["exhausted"] += 1
+                    raise PoolError("MySQL connection pool exhausted.")
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                self._cond.wait(remaining)
+            self._stats["acquired"] += 1
+
+        try:
+            if cnx is not None and not self._healthy(cnx, created, last_used):
+                self._close(cnx)
+                cnx = None
+            if cnx is None:
+                cnx = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        return cnx
+
+    def release(self, cnx, discard=False):
+        """
+        Return a connection to the pool.
+        :param cnx:
+        MySQLConnection - A connection previously returned by acquire().
+        :param discard:
+        Bool - True if the connection is known to be broken.
+        """
+        if not discard:
+            try:
+                if cnx.in_transaction:
+                    cnx.rollback()
+            except mysql.connector.Error:
+                discard = True
+
+        if discard:
+            self._close(cnx)
+        created = self._created.get(id(cnx))
+        with self._cond:
+            if discard or created is None:
+                self._stats["discarded"] += 1
+                self._open -= 1
+            else:
+                self._idle.append((cnx, created, time.monotonic()))
+            self._cond.notify()
+
+    def warm(self, count):
+        """
+        Open connections ahead of the first requests, eg. when a worker
+        process starts.
+        :param count:
+        Int - Number of idle connections wanted, capped at the pool size.
+        :return:
+        Int - Number of connections now idle.
+        """
+        borrowed = []
+        try:
+            for _ in range(min(count, self._size)):
+                borrowed.append(self.acquire())
+        finally:
+            for cnx in borrowed:
+                self.release(cnx)
+        return len(borrowed)
+
+    def clear(self):
+        """
+        Close every idle connection, eg. after forking a worker process.
+        """
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for cnx, _, _ in idle:
+            self._close(cnx)
+
+    def metrics(self):
+        """
+        Get a snapshot of the pool's gauges & counters.
+        :return:
+        Dict - Pool size, usage and lifetime counters.
+        """
+        with self._cond:
+            res = dict(self._stats)
+            res["size"] = self._size
+            res["open"] = self._open
+            res["idle"] = len(self._idle)
+            res["in_use"] = self._open - len(self._idle)
+        return res
+
+
+POOL = ConnectionPool(MYSQL_CONFIG, **MYSQL_POOL_CONFIG)
@@ -0,0 +1,138 @@
+"""
+Bounded in process queue for running slow side effects, like sending
+email, on a pool of worker threads instead of in the request.
+"""
+import os
+import queue
+import threading
+import time
+import traceback
+
+from .logger import log
+
+
+class DispatchQueue:
+    """
+    A FIFO queue of calls to `func`, run by up to `workers` daemon threads.
+    At most `capacity` calls wait in the queue. Submitting to a full queue
+    blocks for at most `block_timeout` seconds, after which the call is
+    dropped & counted as rejected, so a slow downstream service can't hold
+    up requests or use unbounded memory. Workers are started on the first
+    submit in each process, so forked server workers get their own.
+    """
+    # pylint: disable=R0913
+    def __init__(self, name, func, workers, capacity, block_timeout=0):
+        self._name = name
+        self._func = func
+        self._workers = workers
+        self._block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=capacity)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._busy = 0
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "max_depth": 0,
+            "wait_time": 0.0,
+            "run_time": 0.0,
+        }
+
+    def _start(self):
+        """
+        Start the worker threads if they aren't running in this process.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._threads = []
+            for i in range(self._workers):
+                thread = threading.Thread(
+                    target=self._work, name="%s-%s" % (self._name, i),
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        """
+        Worker thread loop, runs queued calls until the process exits.
+        """
+        while True:
+            enqueued, args, kwargs = self._queue.get()
+            start = time.monotonic()
+            with self._lock:
+                self._busy += 1
+                self._stats["wait_time"] += start - enqueued
+            failed = False
+            try:
+                self._func(*args, **kwargs)
+            except Exception:  # pylint:disable=W0703
+                failed = True
+                log("error", self._name + " task failed", traceback.format_exc())
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self._stats["failed" if failed else "completed"] += 1
+                    self._stats["run_time"] += time.monotonic() - start
+                self._queue.task_done()
+
+    def submit(self, *args, **kwargs):
+        """
+        Queue a call to func(*args, **kwargs).
+        :return:
+        Bool - False if the queue was full & the call was dropped.
+        """
+        self._start()
+        try:
+            self._queue.put(
+                (time.monotonic(), args, kwargs),
+                block=self._block_timeout > 0, timeout=self._block_timeout or None
+            )
+        except queue.Full:
+            with self._lock:
+                self._stats["rejected"] += 1
+            log(
+                "warning", self._name + " queue full",
+                "Dropped a task, " + str(self._queue.maxsize) + " are queued."
+            )
+            return False
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["max_depth"] = max(
+                self._stats["max_depth"], self._queue.qsize()
+            )
+        return True
+
+    def join(self, timeout=None):
+        """
+        Wait for every queued call to finish.
+        :param timeout:
+        Float|None - Give up after this many seconds.
+        :return:
+        Bool - True if the queue was drained.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def metrics(self):
+        """
+        Get a snapshot of the queue's gauges & counters.
+        :return:
+        Dict - Queue depth, capacity, worker usage and lifetime counters.
+        """
+        with self._lock:
+            res = dict(self._stats)
+            res["depth"] = self._queue.qsize()
+            res["capacity"] = self._queue.maxsize
+            res["workers"] = self._workers
+            res["busy_workers"] = self._busy
+        return res
@@ -0,0 +1,51 @@
+"""
+Functions for answering conditional GETs with strong ETags, so clients
+polling an unchanged resource get an empty 304 instead of the full body.
+"""
+import hashlib
+
+from flask import request
+
+from .compression import ENCODINGS
+
+
+def make_etag(*parts):
+    """
+    Make a strong ETag from the values a response is built from, eg. a
+    song's state_version or the DB rows of a listing page.
+    :param parts:
+    Any - Values that change whenever the response body would change.
+    :return:
+    Str - Quoted ETag.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16)
+    return '"' + digest.hexdigest() + '"'
+
+
+def etag_headers(etag):
+    """
+    Get the headers to send with a response validated by an ETag. Responses
+    are per user, so they may only be stored by the client & must be
+    revalidated before every use.
+    :param etag:
+    Str - Quoted ETag from make_etag().
+    :return:
+    Dict - ETag & Cache-Control headers.
+    """
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified(etag):
+    """
+    Get a 304 response if the client's cached copy has the current ETag.
+    :param etag:
+    Str - Quoted ETag from make_etag().
+    :return:
+    Tuple|None - Empty 304 response, or None if the response must be sent.
+    """
+    tag = etag.strip('"')
+    # Compressed responses have their encoding appended to the ETag.
+    for variant in (tag,) + tuple(tag + "-" + enc for enc in ENCODINGS):
+        if request.if_none_match.contains_weak(variant):
+            return "", 304, etag_headers('"' + variant + '"')
+    return None
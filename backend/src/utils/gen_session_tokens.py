@@ -0,0 +1,41 @@
+"""
+Utility function to create stateless access & refresh tokens.
+"""
+import time
+import uuid
+
+import jwt
+
+from ..config import JWT_SECRET, ACCESS_TOKEN_LIFETIME, REFRESH_TOKEN_LIFETIME
+
+
+def gen_session_tokens(uid, username):
+    """
+    Create a short lived stateless access_token & the refresh_token used to
+    renew it, see AUTH_MODE in the config.
+    :param uid:
+    Int - ID of the user logging in.
+    :param username:
+    Str - Username of the user logging in.
+    :return:
+    Dict - The raw JWT strings & the access_token's lifetime in seconds.
+    """
+    now = int(time.time())
+    tokens = {}
+    for token_type, lifetime in (
+            ("access", ACCESS_TOKEN_LIFETIME),
+            ("refresh", REFRESH_TOKEN_LIFETIME),
+    ):
+        jwt_payload = {
+            'uid': uid,
+            'username': username,
+            'iat': now,
+            'exp': now + lifetime,
+            'jti': uuid.uuid4().hex,
+            'type': token_type,
+        }
+        tokens[token_type + "_token"] = jwt.encode(
+            jwt_payload, JWT_SECRET, algorithm='HS256'
+        ).decode('utf-8')
+    tokens["expires_in"] = ACCESS_TOKEN_LIFETIME
+    return tokens
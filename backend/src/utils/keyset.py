@@ -0,0 +1,124 @@
+"""
+Functions for keyset (seek) pagination. Instead of a page number, scroll
+tokens carry the sort key of the first or last row on the current page, so
+any page costs the same to fetch however deep it is.
+"""
+import json
+
+import jwt
+
+from ..config import JWT_SECRET
+
+
+def get_keyset(args):
+    """
+    Get the keyset pagination state for a paginated request.
+    :param args:
+    Dict - The request's query string args.
+    :return:
+    Dict|None - The decoded scroll token, a fresh first page state if the
+    keyset param was sent, or None if the request uses page numbers.
+    """
+    next_page = args.get('next_page')
+    back_page = args.get('back_page')
+    if next_page and back_page:
+        return None
+    token = next_page or back_page
+    if token:
+        token = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        if token.get("keyset"):
+            return token
+        return None
+    if args.get('keyset'):
+        return {"keyset": True, "current_page": 1}
+    return None
+
+
+def keyset_clauses(order, keyset, items_per_page):
+    """
+    Build the SQL for fetching a page after (or before) the current one.
+    :param order:
+    [(Str, Str),...] - (column, "ASC"|"DESC") pairs the rows are sorted by,
+    which together must be unique for every row.
+    :param keyset:
+    Dict - Pagination state, see get_keyset().
+    :param items_per_page:
+    Int - Number of items that will be returned.
+    :return:
+    Dict - 'column' to add to the SELECT list, 'where' & 'order' SQL to add
+    after the WHERE clause & 'args' for their %s tokens.
+    """
+    backwards = "before" in keyset
+    seek = keyset.get("before", keyset.get("after"))
+    if backwards:
+        flip = {"ASC": "DESC", "DESC": "ASC"}
+        order = [(column, flip[direction]) for column, direction in order]
+
+    where = ""
+    args = []
+    if seek:
+        # (a, b) after (x, y) == a > x OR (a = x AND b > y), per direction.
+        terms = []
+        for i, (column, direction) in enumerate(order):
+            term = [prev + " = %s" for prev, _ in order[:i]]
+            term.append(column + (" > %s" if direction == "ASC" else " < %s"))
+            terms.append("(" + " AND ".join(term) + ")")
+            args += seek[:i + 1]
+        where = "AND (" + " OR ".join(terms) + ") "
+
+    return {
+        "column": (
+            ", JSON_ARRAY(" + ", ".join(col for col, _ in order) + ") AS seek "
+        ),
+        "where": where,
+        "order": (
+            "ORDER BY "
+            + ", ".join(col + " " + direction for col, direction in order)
+            + " LIMIT %s"
+        ),
+        "args": args + [items_per_page + 1],
+    }
+
+
+def keyset_page(rows, items_per_page, keyset, jwt_payload):
+    """
+    Trim the rows of a keyset query down to a page & create its scroll
+    tokens.
+    :param rows:
+    List - Rows selected with the keyset_clauses() SQL.
+    :param items_per_page:
+    Int - Number of items on a page.
+    :param keyset:
+    Dict - Pagination state the rows were selected with.
+    :param jwt_payload:
+    Dict containing all the parameters for the next search request.
+    :return:
+    Tuple containing the page's rows, without their sort keys, and the
+    back_page & next_page tokens, or None's.
+    """
+    rows = list(rows or [])
+    backwards = "before" in keyset
+    more = len(rows) > items_per_page
+    rows = rows[:items_per_page]
+    if backwards:
+        rows.reverse()
+    keys = [json.loads(row[-1]) for row in rows]
+    rows = [row[:-1] for row in rows]
+
+    current_page = keyset.get("current_page", 1)
+    jwt_payload["keyset"] = True
+    back_page = None
+    if rows and (more if backwards else current_page > 1):
+        back_page = jwt.encode(
+            dict(jwt_payload, current_page=current_page - 1, before=keys[0]),
+            JWT_SECRET, algorithm='HS256'
+        ).decode()
+
+    next_page = None
+    if rows and (backwards or more):
+        next_page = jwt.encode(
+            dict(jwt_payload, current_page=current_page + 1, after=keys[-1]),
+            JWT_SECRET, algorithm='HS256'
+        ).decode()
+
+    return rows, back_page, next_page
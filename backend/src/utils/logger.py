@@ -1,53 +1,209 @@
 """
-Function to handle printing our of error information to api.log.
+Function to handle printing our of error information to api.log. Events are
+queued & written as JSON lines by a background thread, so logging never
+waits on disk I/O in a request.
 """
-import logging
+import atexit
 import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+
+from ..config import LOGGING, LOG_CONFIG
+
+LEVEL_CODES = {
+    "debug": 10,
+    "info": 20,
+    "warning": 30,
+    "error": 40,
+    "critical": 50
+}
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats log() events as one JSON object per line.
+    """
+    def format(self, record):
+        res = {
+            "level": record.levelname.lower(),
+            "event_name": getattr(record, "event_name", record.name),
+            "time_logged": datetime.datetime.fromtimestamp(
+                record.created
+            ).isoformat(),
+            "message": getattr(record, "event_message", record.getMessage()),
+        }
+        if getattr(record, "suppressed", 0):
+            res["suppressed"] = record.suppressed
+        return json.dumps(res, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the writer thread as they are, leaving formatting to
+    it, & drops them rather than waiting if its queue is full.
+    """
+    def __init__(self, capacity):
+        super().__init__(queue.Queue(maxsize=capacity))
+        self.capacity = capacity
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class EventRateLimiter:
+    """
+    A token bucket per event_name, allowing `burst` events at once & `rate`
+    per second after that. Events over the limit are sampled, only
+    `sample_rate` of them are let through.
+    """
+    def __init__(self, rate, burst, sample_rate):
+        self._rate = rate
+        self._burst = burst
+        self._sample_rate = sample_rate
+        self._lock = threading.Lock()
+        # event_name -> [tokens, last refill, suppressed since last logged]
+        self._buckets = {}
+        self._stats = {
+            "logged": 0,
+            "suppressed": 0,
+        }
+
+    def allow(self, event_name):
+        """
+        Check if an event should be logged.
+        :param event_name:
+        Str - Name the event is rate limited by.
+        :return:
+        Int|None - None if the event should be dropped, otherwise the number
+        of events of the same name suppressed since the last one logged.
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(event_name)
+            if bucket is None:
+                bucket = self._buckets[event_name] = [self._burst, now, 0]
+            bucket[0] = min(
+                self._burst, bucket[0] + (now - bucket[1]) * self._rate
+            )
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+            elif random.random() >= self._sample_rate:
+                bucket[2] += 1
+                self._stats["suppressed"] += 1
+                return None
+            suppressed = bucket[2]
+            bucket[2] = 0
+            self._stats["logged"] += 1
+            return suppressed
 
-from ..config import LOGGING
+    def metrics(self):
+        """
+        Get a snapshot of the limiter's counters.
+        :return:
+        Dict - Lifetime counts of events logged & suppressed.
+        """
+        with self._lock:
+            return dict(self._stats)
 
 
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.INFO)
 
-FORMATTER = logging.Formatter("%(message)s")
+FILE_HANDLER = logging.FileHandler("api.log", delay=True)
+FILE_HANDLER.setFormatter(JSONFormatter())
+
+QUEUE_HANDLER = DroppingQueueHandler(LOG_CONFIG['capacity'])
+LOGGER.addHandler(QUEUE_HANDLER)
+
+RATE_LIMITER = EventRateLimiter(
+    LOG_CONFIG['rate'], LOG_CONFIG['burst'], LOG_CONFIG['sample_rate']
+)
 
-FILE_HANDLER = logging.FileHandler("api.log")
-FILE_HANDLER.setFormatter(FORMATTER)
+_LISTENER_LOCK = threading.Lock()
+_LISTENER = {"pid": None, "listener": None}
+
+
+def _start_listener():
+    """
+    Start the writer thread if it isn't running in this process. A forked
+    process gets a fresh queue, as its parent's thread can't drain it.
+    """
+    if _LISTENER["pid"] == os.getpid():
+        return
+    with _LISTENER_LOCK:
+        if _LISTENER["pid"] == os.getpid():
+            return
+        if _LISTENER["pid"] is not None:
+            QUEUE_HANDLER.queue = queue.Queue(maxsize=QUEUE_HANDLER.capacity)
+        listener = logging.handlers.QueueListener(
+            QUEUE_HANDLER.queue, FILE_HANDLER
+        )
+        listener.start()
+        _LISTENER["listener"] = listener
+        _LISTENER["pid"] = os.getpid()
+        atexit.register(_stop_listener, listener)
 
-LOGGER.addHandler(FILE_HANDLER)
+
+def _stop_listener(listener):
+    """
+    Write out any queued events & stop the writer thread, on exit.
+    """
+    try:
+        listener.stop()
+    except queue.Full:
+        pass
+
+
+def log_metrics():
+    """
+    Get a snapshot of the logging pipeline's gauges & counters.
+    :return:
+    Dict - Events logged, suppressed by rate limiting & dropped because the
+    queue was full, plus the queue's depth & capacity.
+    """
+    res = RATE_LIMITER.metrics()
+    res["dropped"] = QUEUE_HANDLER.dropped
+    res["depth"] = QUEUE_HANDLER.queue.qsize()
+    res["capacity"] = QUEUE_HANDLER.capacity
+    return res
 
 
 def log(level, event_name, message):
     """Logs an event to api.log"""
     if LOGGING:
         level = level.lower()
-        if level not in ["debug", "info", "warning", "error", "critical"]:
+        if level not in LEVEL_CODES:
             raise ValueError("Invalid log level.")
+        if not LOGGER.isEnabledFor(LEVEL_CODES[level]):
+            return
 
-        level_code = {
-            "debug": 10,
-            "info": 20,
-            "warning": 30,
-            "error": 40,
-            "critical": 50
-        }
-
-        formatted_message = (
-            "{\n"
-            "   'level':'%s',\n"
-            "   'event_name':'%s',\n"
-            "   'time_logged':'%s',\n"
-            "   'message':'%s'\n"
-            "}"
-        ) % (
-            level,
-            event_name,
-            str(datetime.datetime.now()),
-            message
-        )
+        # Critical events are never rate limited.
+        suppressed = 0
+        if level != "critical":
+            suppressed = RATE_LIMITER.allow(event_name)
+            if suppressed is None:
+                return
 
+        _start_listener()
         LOGGER.log(
-            level=level_code.get(level),
-            msg=formatted_message
+            LEVEL_CODES[level], "%s: %s", event_name, message,
+            extra={
+                "event_name": event_name,
+                "event_message": message,
+                "suppressed": suppressed,
+            }
         )
@@ -0,0 +1,152 @@
+"""
+Outgoing mail queue, sent by worker threads that each keep one logged in
+SMTP connection open instead of connecting for every email.
+"""
+import queue
+import smtplib
+import socket
+import time
+import traceback
+
+from .logger import log
+from .dispatch_queue import DispatchQueue
+
+
+class MailQueue(DispatchQueue):
+    """
+    A DispatchQueue of emails. Each worker sends up to `batch_size` queued
+    emails at a time over its own SMTP connection, which it keeps open until
+    it has been idle for `idle_timeout` seconds. A connection the server has
+    dropped is reopened & the email retried once.
+    """
+    # pylint: disable=R0913
+    def __init__(self, name, smtp_config, workers, capacity, batch_size,
+                 idle_timeout):
+        super().__init__(name, None, workers, capacity)
+        self._smtp_config = smtp_config
+        self._batch_size = batch_size
+        self._idle_timeout = idle_timeout
+        self._stats["connections"] = 0
+        self._stats["batches"] = 0
+
+    def _connect(self):
+        """
+        Open & log in to a new SMTP connection.
+        :return:
+        smtplib.SMTP - The connection.
+        """
+        smtp = smtplib.SMTP(
+            self._smtp_config.get("server"), self._smtp_config.get("port"),
+            timeout=self._smtp_config.get("timeout")
+        )
+        smtp.ehlo()
+        if self._smtp_config.get("starttls"):
+            smtp.starttls()
+            smtp.ehlo()
+        if self._smtp_config.get("user"):
+            smtp.login(
+                self._smtp_config.get("user"),
+                self._smtp_config.get("password")
+            )
+        with self._lock:
+            self._stats["connections"] += 1
+        return smtp
+
+    @staticmethod
+    def _close(smtp):
+        """
+        Close an SMTP connection, ignoring errors from one that's already
+        been dropped.
+        :return:
+        None - So callers can write smtp = self._close(smtp).
+        """
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                smtp.close()
+        return None
+
+    def _send(self, smtp, sent_from, send_to, email_text):
+        """
+        Send one email, connecting first if needed. If the connection is
+        lost before the server accepts the email's DATA, it's resent on a
+        new connection. Once DATA has been sent the server may have
+        accepted it, so it's never resent, to avoid a duplicate email.
+        :param smtp:
+        smtplib.SMTP|None - The worker's open connection.
+        :return:
+        smtplib.SMTP - The connection to use for the next email.
+        """
+        for attempt in range(2):
+            try:
+                if smtp is None:
+                    smtp = self._connect()
+                self._envelope(smtp, sent_from, send_to)
+                break
+            except (smtplib.SMTPServerDisconnected, ConnectionError,
+                    socket.timeout):
+                smtp = self._close(smtp)
+                if attempt:
+                    raise
+        code, resp = smtp.data(email_text)
+        if code != 250:
+            smtp.rset()
+            raise smtplib.SMTPDataError(code, resp)
+        return smtp
+
+    @staticmethod
+    def _envelope(smtp, sent_from, send_to):
+        """
+        Send an email's sender & recipient, the steps of sendmail() before
+        its DATA.
+        """
+        code, resp = smtp.mail(sent_from)
+        if code != 250:
+            smtp.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, sent_from)
+        code, resp = smtp.rcpt(send_to)
+        if code not in (250, 251):
+            smtp.rset()
+            raise smtplib.SMTPRecipientsRefused({send_to: (code, resp)})
+
+    def _work(self):
+        """
+        Worker thread loop, sends queued emails until the process exits.
+        """
+        smtp = None
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self._idle_timeout)]
+            except queue.Empty:
+                smtp = self._close(smtp)
+                continue
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            start = time.monotonic()
+            with self._lock:
+                self._busy += 1
+                self._stats["batches"] += 1
+                self._stats["wait_time"] += sum(
+                    start - enqueued for enqueued, _, _ in batch
+                )
+            for _, args, kwargs in batch:
+                failed = False
+                try:
+                    smtp = self._send(smtp, *args, **kwargs)
+                except Exception:  # pylint:disable=W0703
+                    failed = True
+                    smtp = self._close(smtp)
+                    log("error", self._name + " send failed",
+                        traceback.format_exc())
+                finally:
+                    with self._lock:
+                        self._stats["failed" if failed else "completed"] += 1
+                    self._queue.task_done()
+            with self._lock:
+                self._busy -= 1
+                self._stats["run_time"] += time.monotonic() - start
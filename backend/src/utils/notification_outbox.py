@@ -0,0 +1,278 @@
+"""
+Background drainer for the Notification_Outbox table, which sends queued
+push notifications in batches so they survive the request that made them.
+"""
+import datetime
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+
+import requests
+
+from .logger import log
+from ..models.notifications import (
+    claim_outbox_notifications, delete_outbox_notifications,
+    retry_outbox_notifications, count_outbox_notifications
+)
+
+
+def coalesced_message(rows):
+    """
+    Get the message to send for a group of notifications, eg. "X and 37
+    others liked your song" for several likes of the same song.
+    :param rows:
+    List - Outbox rows with the same title & coalesce_key, oldest first.
+    :return:
+    Str - The single row's message, or one listing every actor.
+    """
+    actors = list(dict.fromkeys(row[7] for row in rows if row[7]))
+    if len(actors) < 2 or not rows[0][8]:
+        return rows[-1][2]
+    if len(actors) == 2:
+        return actors[-1] + " and " + actors[0] + rows[0][8]
+    return (
+        actors[-1] + " and " + str(len(actors) - 1) + " others" + rows[0][8]
+    )
+
+
+class OutboxDrainer:
+    """
+    Sends the notifications in the outbox with `send`, from a daemon thread
+    started on the first wake() in each process. Each drain claims up to
+    `batch_size` due notifications & merges those with the same title &
+    message, or coalesce_key, into calls of at most `chunk_size` devices, all
+    over one keep-alive requests.Session. Notifications that fail to send are
+    retried after `backoff` * 2 ** attempts seconds, capped at `max_backoff`,
+    until they've been tried `max_attempts` times. The outbox depth is
+    counted by the drainer thread at most every `depth_interval` seconds,
+    so reading it from metrics() never touches the DB.
+    """
+    # pylint: disable=R0902,R0913
+    def __init__(self, name, send, batch_size, chunk_size, poll_interval,
+                 lease, backoff, max_backoff, max_attempts, depth_interval):
+        self._name = name
+        self._send = send
+        self._batch_size = batch_size
+        self._chunk_size = chunk_size
+        self._poll_interval = poll_interval
+        self._lease = lease
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._max_attempts = max_attempts
+        self._depth_interval = depth_interval
+        self._depth_due = 0.0
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self._session = None
+        self._session_pid = None
+        self._stats = {
+            "depth": None,
+            "claimed": 0,
+            "sent": 0,
+            "requests": 0,
+            "failed_requests": 0,
+            "retried": 0,
+            "dropped": 0,
+            "drain_time": 0.0,
+            "last_lag": 0.0,
+            "max_lag": 0.0,
+            "total_lag": 0.0,
+        }
+
+    def start(self):
+        """
+        Start the drainer thread if it isn't running in this process.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(
+                target=self._run, name=self._name + "-outbox", daemon=True
+            ).start()
+
+    def _run(self):
+        """
+        Drainer thread loop, drains the outbox until the process exits.
+        """
+        while True:
+            self._wake.clear()
+            try:
+                claimed = self.drain()
+            except Exception:  # pylint:disable=W0703
+                claimed = 0
+                log("error", self._name + " outbox drain failed",
+                    traceback.format_exc())
+            if time.monotonic() >= self._depth_due:
+                self.refresh_depth()
+            if claimed < self._batch_size:
+                self._wake.wait(self._poll_interval)
+
+    def refresh_depth(self):
+        """
+        Count the notifications waiting in the outbox for metrics().
+        """
+        self._depth_due = time.monotonic() + self._depth_interval
+        depth = count_outbox_notifications()
+        with self._lock:
+            self._stats["depth"] = depth
+
+    def _get_session(self):
+        """
+        Get this process's keep-alive HTTP session.
+        :return:
+        requests.Session - Reused for every call the drainer makes.
+        """
+        if self._session_pid != os.getpid():
+            self._session = requests.Session()
+            self._session_pid = os.getpid()
+        return self._session
+
+    def wake(self):
+        """
+        Start draining now instead of at the next poll, eg. once a new
+        notification has been committed.
+        """
+        self.start()
+        self._wake.set()
+
+    def _chunks(self, rows):
+        """
+        Split rows with the same title & message into chunks of at most
+        chunk_size distinct devices. A row is never split across chunks.
+        :param rows:
+        List - (row, dids) pairs.
+        :return:
+        Generator - Yields lists of (row, dids) pairs.
+        """
+        chunk = []
+        chunk_dids = set()
+        for row, dids in rows:
+            if chunk and len(chunk_dids.union(dids)) > self._chunk_size:
+                yield chunk
+                chunk = []
+                chunk_dids = set()
+            chunk.append((row, dids))
+            chunk_dids.update(dids)
+        if chunk:
+            yield chunk
+
+    def _send_chunk(self, title, message, chunk):
+        """
+        Send one chunk of notifications, each device gets the message once.
+        :return:
+        Bool - True if every call to Pushy succeeded.
+        """
+        dids = list(dict.fromkeys(
+            did for _, row_dids in chunk for did in row_dids
+        ))
+        session = self._get_session()
+        try:
+            # A single row can still have more than chunk_size devices.
+            for i in range(0, len(dids), self._chunk_size):
+                self._send(message, dids[i:i + self._chunk_size], title, session)
+                with self._lock:
+                    self._stats["requests"] += 1
+        except Exception:  # pylint:disable=W0703
+            with self._lock:
+                self._stats["failed_requests"] += 1
+            log("warning", self._name + " send failed", traceback.format_exc())
+            return False
+        return True
+
+    def _retry(self, rows):
+        """
+        Reschedule notifications that failed to send, with exponential
+        backoff, dropping those that have run out of attempts.
+        :param rows:
+        List - Outbox rows.
+        """
+        delays = {}
+        dropped = []
+        for row in rows:
+            attempts = row[5] + 1
+            if attempts >= self._max_attempts:
+                dropped.append(row[0])
+                continue
+            delay = min(self._backoff * 2 ** row[5], self._max_backoff)
+            delays.setdefault(delay, []).append(row[0])
+        for delay, ids in delays.items():
+            retry_outbox_notifications(ids, delay)
+        if dropped:
+            delete_outbox_notifications(dropped)
+            log(
+                "error", self._name + " dropped",
+                "Gave up sending outbox notifications " + str(dropped)
+            )
+        with self._lock:
+            self._stats["retried"] += len(rows) - len(dropped)
+            self._stats["dropped"] += len(dropped)
+
+    def drain(self):
+        """
+        Claim & send one batch of due notifications.
+        :return:
+        Int - Number of notifications claimed.
+        """
+        with self._drain_lock:
+            start = time.monotonic()
+            rows = claim_outbox_notifications(
+                uuid.uuid4().hex, self._batch_size, self._lease
+            ) or []
+            groups = {}
+            for row in rows:
+                # Rows with a coalesce_key are merged whatever their message.
+                key = (row[1], row[6], None if row[6] else row[2])
+                groups.setdefault(key, []).append((row, json.loads(row[3])))
+
+            sent = []
+            failed = []
+            for (title, _, _), group in groups.items():
+                message = coalesced_message([row for row, _ in group])
+                for chunk in self._chunks(group):
+                    rows_in_chunk = [row for row, _ in chunk]
+                    if self._send_chunk(title, message, chunk):
+                        sent += rows_in_chunk
+                    else:
+                        failed += rows_in_chunk
+
+            if sent:
+                delete_outbox_notifications([row[0] for row in sent])
+            if failed:
+                self._retry(failed)
+
+            now = datetime.datetime.utcnow()
+            lags = [(now - row[4]).total_seconds() for row in sent]
+            with self._lock:
+                self._stats["claimed"] += len(rows)
+                self._stats["sent"] += len(sent)
+                self._stats["drain_time"] += time.monotonic() - start
+                if lags:
+                    self._stats["last_lag"] = max(lags)
+                    self._stats["max_lag"] = max(
+                        self._stats["max_lag"], max(lags)
+                    )
+                    self._stats["total_lag"] += sum(lags)
+            return len(rows)
+
+    def metrics(self):
+        """
+        Get a snapshot of the drainer's gauges & counters.
+        :return:
+        Dict - Lifetime counters, the last outbox depth counted (None until
+        the drainer thread has counted it), lag (seconds from a notification being
+        queued to being sent) & throughput (notifications sent per second
+        spent draining).
+        """
+        with self._lock:
+            res = dict(self._stats)
+        res["throughput"] = (
+            res["sent"] / res["drain_time"] if res["drain_time"] else 0.0
+        )
+        res["mean_lag"] = res["total_lag"] / res["sent"] if res["sent"] else 0.0
+        return res
@@ -5,12 +5,19 @@ https://pushy.me/docs/resources/python-backend-sample
 import json
 import requests
 
-from ..config import PUSHY_KEY
+from ..config import (
+    PUSHY_KEY, PUSHY_URL, NOTIFICATION_OUTBOX_CONFIG,
+    NOTIFICATION_COALESCE_WINDOW
+)
+from ..models.notifications import insert_outbox_notification
+from .notification_outbox import OutboxDrainer
+from .query import after_commit
 
 
-def notification_sender(message, dids, title):
+def send_notification(message, dids, title, session=requests):
     """
-    Generic function to send push notifications with the Pushy API.
+    Send a push notification with the Pushy API, blocking until Pushy
+    responds or the request times out.
     """
     payload = json.dumps({
         'notification': {
@@ -27,7 +34,52 @@ def notification_sender(message, dids, title):
 
     # Set notification payload and recipients
 
-    url = 'https://api.pushy.me/push?api_key=' + PUSHY_KEY
+    url = PUSHY_URL + '?api_key=' + PUSHY_KEY
     headers = {'Content-Type': 'application/json'}
 
-    requests.post(url, headers=headers, data=payload)
+    res = session.post(
+        url, headers=headers, data=payload,
+        timeout=NOTIFICATION_OUTBOX_CONFIG['timeout']
+    )
+    res.raise_for_status()
+
+
+NOTIFICATION_OUTBOX = OutboxDrainer(
+    "Notification", send_notification,
+    NOTIFICATION_OUTBOX_CONFIG['batch_size'],
+    NOTIFICATION_OUTBOX_CONFIG['chunk_size'],
+    NOTIFICATION_OUTBOX_CONFIG['poll_interval'],
+    NOTIFICATION_OUTBOX_CONFIG['lease'],
+    NOTIFICATION_OUTBOX_CONFIG['backoff'],
+    NOTIFICATION_OUTBOX_CONFIG['max_backoff'],
+    NOTIFICATION_OUTBOX_CONFIG['max_attempts'],
+    NOTIFICATION_OUTBOX_CONFIG['depth_interval']
+)
+
+
+def notification_sender(message, dids, title, coalesce=None):
+    """
+    Generic function to send push notifications with the Pushy API. The
+    notification is written to the outbox in the current transaction, &
+    sent in the background once it commits. Notifications given the same
+    coalesce key are held for NOTIFICATION_COALESCE_WINDOW seconds & sent
+    as one, eg. "X and 37 others liked your song".
+    :param coalesce:
+    Tuple|None - (key, actor, summary), where summary follows the list of
+    actors in the merged message.
+    """
+    if not dids:
+        return
+    if coalesce and NOTIFICATION_COALESCE_WINDOW:
+        coalesce = {
+            "key": coalesce[0],
+            "actor": coalesce[1],
+            "summary": coalesce[2],
+            "window": NOTIFICATION_COALESCE_WINDOW,
+        }
+        insert_outbox_notification(message, dids, title, coalesce)
+        # Not due yet, so just make sure the drainer will poll for it.
+        after_commit(NOTIFICATION_OUTBOX.start)
+        return
+    insert_outbox_notification(message, dids, title)
+    after_commit(NOTIFICATION_OUTBOX.wake)
@@ -1,19 +1,145 @@
 """
 General function for handling MySQL queries.
 """
+import threading
+import time
 import traceback
+from contextlib import contextmanager
 
 import mysql.connector
 
 from .logger import log
-from ..config import MYSQL_CONFIG
+from .db_pool import POOL
+from .query_stats import get_caller, record_query
+
+# Per thread unit of work, see transaction().
+_SESSION = threading.local()
+
+
+@contextmanager
+def transaction():
+    """
+    Run every query() made inside the block on one DB connection, in one
+    transaction. The connection is only borrowed once the first query runs.
+    Nested blocks join the outermost one, which commits if the block exits
+    cleanly & rolls back otherwise.
+    :return:
+    None - Yields None to the with block.
+    """
+    if _in_transaction():
+        _SESSION.depth += 1
+        try:
+            yield
+        finally:
+            _SESSION.depth -= 1
+        return
+
+    _SESSION.depth = 1
+    _SESSION.cnx = None
+    _SESSION.failed = False
+    _SESSION.lost = False
+    _SESSION.on_commit = []
+    committed = False
+    try:
+        yield
+        if _SESSION.cnx is not None and not _SESSION.failed:
+            _SESSION.cnx.commit()
+            committed = True
+    finally:
+        cnx = _SESSION.cnx
+        lost = _SESSION.lost
+        on_commit = _SESSION.on_commit
+        _SESSION.depth = 0
+        _SESSION.cnx = None
+        _SESSION.on_commit = []
+        if cnx is not None:
+            POOL.release(cnx, lost)
+    if cnx is not None and not committed:
+        raise mysql.connector.errors.DatabaseError(
+            "Transaction was rolled back."
+        )
+    for func in on_commit:
+        func()
+
+
+def after_commit(func):
+    """
+    Call func once the current transaction() commits, or straight away if
+    there isn't one. Nothing is called if the transaction rolls back.
+    :param func:
+    Function - Takes no arguments.
+    """
+    if _in_transaction():
+        _SESSION.on_commit.append(func)
+    else:
+        func()
+
+
+def _in_transaction():
+    """
+    Check if the current thread is inside a transaction() block.
+    :return:
+    Bool - True if queries should run on the transaction's connection.
+    """
+    return bool(getattr(_SESSION, "depth", 0))
+
+
+def _borrow_connection(in_session):
+    """
+    Get the connection the next query should run on.
+    :param in_session:
+    Bool - True if the query belongs to the current transaction().
+    :return:
+    MySQLConnection - A pooled or the transaction's connection.
+    """
+    if not in_session:
+        return POOL.acquire()
+    if _SESSION.cnx is None:
+        cnx = POOL.acquire()
+        try:
+            cnx.start_transaction()
+        except Exception:
+            POOL.release(cnx, True)
+            raise
+        _SESSION.cnx = cnx
+    return _SESSION.cnx
+
+
+def _query_failed(exc, in_session):
+    """
+    Handle an error raised by query() or query_many(). Integrity errors are
+    always raised for the caller to handle. Inside a transaction() any other
+    error is raised too, so the unit of work is rolled back instead of
+    committing the queries that did succeed. Outside one the error is
+    logged & swallowed, & the query returns None.
+    :param exc:
+    mysql.connector.Error - The error raised.
+    :param in_session:
+    Bool - True if the query belongs to the current transaction().
+    :return:
+    Bool - True if the connection was lost & must not be reused.
+    """
+    if isinstance(exc, mysql.connector.errors.IntegrityError):
+        raise mysql.connector.errors.IntegrityError
+    lost = isinstance(exc, (
+        mysql.connector.errors.OperationalError,
+        mysql.connector.errors.InterfaceError,
+        mysql.connector.errors.PoolError
+    ))
+    if in_session:
+        _SESSION.failed = True
+        _SESSION.lost = _SESSION.lost or lost
+        raise exc
+    log("error", "MySQL query failed", traceback.format_exc())
+    return lost
 
 
 def query(
         query_string, query_args, get_row=False, get_insert_row_id=False,
-        multi=False):
+        multi=False, get_row_count=False):
     """
-    Connects to the DB & executes the provided query.
+    Executes the provided query on a pooled DB connection, or on the current
+    transaction()'s connection if there is one.
     :param query_string:
     Str defining a specific SQL query.
     :param query_args:
@@ -24,36 +150,91 @@ def query(
     Bool True if we want to get the ID of the row we just inserted.
     :param multi:
     Bool True if we want to execute multiple statements in one query.
+    :param get_row_count:
+    Bool True if we want the number of rows the query changed.
     :return:
-    [] - If get_row && get_insert_row_id == False
+    [] - If get_row && get_insert_row_id && get_row_count == False
     Int - If get_insert_row_id == True && get_row == False
+    Int - If get_row_count == True && get_row == get_insert_row_id == False
     [[row1contents],...] - If get_row == True
     """
     res = []
+    cnx = None
+    in_session = _in_transaction()
+    discard = False
+    rows = 0
+    start = time.perf_counter()
     try:
-        # Open a DB connection.
-        cnx = mysql.connector.connect(**MYSQL_CONFIG)
+        # Borrow a DB connection, pooled connections autocommit.
+        cnx = _borrow_connection(in_session)
         cursor = cnx.cursor()
 
-        # Execute the query.
-        cursor.execute(query_string, query_args, multi=multi)
-
-        # Get rows if SELECT query otherwise commit changes.
-        if get_row:
-            res = cursor.fetchall()
-        elif get_insert_row_id:
-            res = cursor.lastrowid
-            cnx.commit()
+        # Execute the query, multi statement results must all be consumed
+        # before the connection can be reused.
+        if multi:
+            for result in cursor.execute(query_string, query_args, multi=True):
+                if get_row and result.with_rows:
+                    res = result.fetchall()
         else:
-            cnx.commit()
+            cursor.execute(query_string, query_args)
+            if get_row:
+                res = cursor.fetchall()
+            elif get_insert_row_id:
+                res = cursor.lastrowid
+            elif get_row_count:
+                res = cursor.rowcount
 
-        # Close DB connection.
+        rows = len(res) if get_row else max(cursor.rowcount, 0)
         cursor.close()
-        cnx.close()
 
         # Return the result
         return res
-    except mysql.connector.errors.IntegrityError:
-        raise mysql.connector.errors.IntegrityError
-    except mysql.connector.Error:
-        log("error", "MySQL query failed", traceback.format_exc())
+    except mysql.connector.Error as exc:
+        discard = _query_failed(exc, in_session)
+    finally:
+        if not in_session and cnx is not None:
+            # Hand the DB connection back to the pool.
+            POOL.release(cnx, discard)
+        record_query(
+            query_string, query_args, time.perf_counter() - start, rows,
+            get_caller()
+        )
+
+
+def query_many(query_string, seq_of_args):
+    """
+    Executes the provided query once for every set of arguments, in a single
+    round trip where possible. Simple INSERT ... VALUES statements are sent
+    as one multi-row INSERT, so callers should keep each batch well below the
+    server's max_allowed_packet.
+    :param query_string:
+    Str defining a specific SQL query.
+    :param seq_of_args:
+    [Tuple,...] - One tuple of arguments to populate %s tokens per row.
+    :return:
+    Int - Number of rows affected.
+    """
+    seq_of_args = list(seq_of_args)
+    if not seq_of_args:
+        return 0
+    res = 0
+    cnx = None
+    in_session = _in_transaction()
+    discard = False
+    start = time.perf_counter()
+    try:
+        cnx = _borrow_connection(in_session)
+        cursor = cnx.cursor()
+        cursor.executemany(query_string, seq_of_args)
+        res = cursor.rowcount
+        cursor.close()
+        return res
+    except mysql.connector.Error as exc:
+        discard = _query_failed(exc, in_session)
+    finally:
+        if not in_session and cnx is not None:
+            POOL.release(cnx, discard)
+        record_query(
+            query_string, seq_of_args[0], time.perf_counter() - start,
+            max(res, 0), get_caller()
+        )
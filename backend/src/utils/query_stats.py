@@ -0,0 +1,110 @@
+"""
+Instrumentation for the query functions: per request aggregates & the slow
+query log.
+"""
+import json
+import sys
+import threading
+import traceback
+
+import mysql.connector
+
+from .logger import log
+from .db_pool import POOL
+from ..config import SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN
+
+# Per thread aggregate of the queries made while handling the current request.
+_REQUEST = threading.local()
+
+
+def reset_request_stats():
+    """
+    Start a fresh per request aggregate for the current thread.
+    """
+    _REQUEST.queries = 0
+    _REQUEST.db_time = 0.0
+    _REQUEST.rows = 0
+
+
+def get_request_stats():
+    """
+    Get the aggregate for the queries made since reset_request_stats().
+    :return:
+    Dict - Number of queries, total DB time in milliseconds & rows returned.
+    """
+    return {
+        "queries": getattr(_REQUEST, "queries", 0),
+        "db_time_ms": round(getattr(_REQUEST, "db_time", 0.0) * 1000, 3),
+        "rows": getattr(_REQUEST, "rows", 0),
+    }
+
+
+def get_caller(depth=2):
+    """
+    Get the name of the function that called into the query layer.
+    :param depth:
+    Int - How many frames above the caller of get_caller() to look.
+    :return:
+    Str - Dotted module & function name, eg. src.models.audio.get_song_state.
+    """
+    frame = sys._getframe(depth)  # pylint: disable=W0212
+    return "%s.%s" % (frame.f_globals.get("__name__"), frame.f_code.co_name)
+
+
+def explain(query_string, query_args):
+    """
+    Get the query plan for a statement on a separate pooled connection.
+    :return:
+    List|None - EXPLAIN rows as dicts, or None if the plan isn't available.
+    """
+    cnx = None
+    discard = False
+    try:
+        cnx = POOL.acquire()
+        cursor = cnx.cursor(dictionary=True)
+        cursor.execute("EXPLAIN " + query_string, query_args)
+        res = cursor.fetchall()
+        cursor.close()
+        return res
+    except mysql.connector.Error:
+        discard = True
+        log("warning", "Slow query EXPLAIN failed", traceback.format_exc())
+        return None
+    finally:
+        if cnx is not None:
+            POOL.release(cnx, discard)
+
+
+def record_query(query_string, query_args, elapsed, rows, caller):
+    """
+    Record a finished query in the request aggregate and write it to the
+    slow query log if it took longer than SLOW_QUERY_MS.
+    :param query_string:
+    Str - The SQL that was executed.
+    :param query_args:
+    Tuple - Arguments the query was executed with.
+    :param elapsed:
+    Float - Wall time of the query in seconds.
+    :param rows:
+    Int - Number of rows returned or affected.
+    :param caller:
+    Str - The model function that made the query, see get_caller().
+    """
+    _REQUEST.queries = getattr(_REQUEST, "queries", 0) + 1
+    _REQUEST.db_time = getattr(_REQUEST, "db_time", 0.0) + elapsed
+    _REQUEST.rows = getattr(_REQUEST, "rows", 0) + rows
+
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms < SLOW_QUERY_MS:
+        return
+    entry = {
+        "caller": caller,
+        "statement": " ".join(query_string.split()),
+        "time_ms": round(elapsed_ms, 3),
+        "rows": rows,
+    }
+    if SLOW_QUERY_EXPLAIN and entry["statement"].upper().startswith(
+            ("SELECT", "UPDATE", "DELETE", "INSERT")
+    ):
+        entry["explain"] = explain(query_string, query_args)
+    log("warning", "Slow query", json.dumps(entry, default=str))
@@ -5,42 +5,40 @@ import datetime
 import jwt
 
 from ..config import JWT_SECRET
-from ..models.auth import refresh_login, get_login
+from ..models.auth import refresh_login, get_login_time
 
 
-def refresh_token(access_token):
+def refresh_token(access_token, decoded_token=None):
     """
-    Function for refreshing the timestamp for access_tokens.
+    Function for refreshing the timestamp for access_tokens. Tokens are only
+    refreshed in the last 2 days before they expire, and a refresh restarts
+    their 7 days, so each token is written at most once per 5 days.
     :param access_token:
     Str - A raw JWT access_token string.
+    :param decoded_token:
+    Dict|None - The already decoded access_token, if available.
     :return:
     None - This function updates the Database and returns None.
     """
     encoded_token = access_token
 
-    try:
+    if decoded_token is None:
         if isinstance(access_token, str):
             access_token.encode()
-        access_token = jwt.decode(
+        decoded_token = jwt.decode(
             access_token, JWT_SECRET, algorithms=['HS256']
         )
 
-    except Exception as exc:
-        raise exc
+    # Stateless tokens are renewed with a refresh_token instead.
+    if decoded_token.get("jti"):
+        return
 
-    try:
-        login = get_login(access_token.get("uid"), encoded_token)
-    except Exception as exc:
-        raise exc
-
-    if not login:
+    time_issued = get_login_time(decoded_token.get("uid"), encoded_token)
+    if not time_issued:
         raise ValueError
 
-    time_issued = login[0][2]
     expiry_time = time_issued + datetime.timedelta(days=7)
     refresh_time = time_issued + datetime.timedelta(days=5)
     now = datetime.datetime.utcnow()
     if refresh_time < now < expiry_time:
-        refresh_login(
-            datetime.datetime.utcnow(), access_token.get("uid"), encoded_token
-        )
+        refresh_login(now, decoded_token.get("uid"), encoded_token)
@@ -0,0 +1,112 @@
+"""
+Per route request latency histograms & status code counters, exposed with
+the other in process gauges at /metrics.
+"""
+import bisect
+import threading
+
+# Upper bounds, in seconds, of the latency & DB time histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Cumulative bucket counts, sum & count of observed values, in the shape
+    of a Prometheus histogram. Not thread-safe, RequestMetrics locks it.
+    """
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        # One count per bucket plus +Inf, not yet cumulative.
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """
+        Record one value.
+        :param value:
+        Float - Observed value in seconds.
+        """
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self):
+        """
+        Get the histogram's cumulative buckets.
+        :return:
+        Dict - 'buckets' as (upper bound, count) pairs ending with '+Inf',
+        plus the 'sum' & 'count' of observed values.
+        """
+        buckets = []
+        running = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), self.counts):
+            running += count
+            buckets.append((bound, running))
+        return {"buckets": buckets, "sum": self.total, "count": self.count}
+
+
+class RequestMetrics:
+    """
+    Latency & per request DB time histograms for every (blueprint, route,
+    method), & request counts by status code. Routes are the URL rule, eg.
+    /api/v1/audio/state, never the raw path, so the number of series stays
+    bounded; requests that match no rule are recorded as 'unmatched'.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (blueprint, route, method) -> [latency, db_time Histogram]
+        self._routes = {}
+        # (blueprint, route, method, status) -> requests
+        self._statuses = {}
+
+    def observe(self, blueprint, route, method, status, elapsed, db_time):
+        """
+        Record one finished request.
+        :param blueprint:
+        Str - Name of the blueprint that served it, eg. 'audio'.
+        :param route:
+        Str - URL rule it matched.
+        :param method:
+        Str - HTTP method.
+        :param status:
+        Int - HTTP status code of the response.
+        :param elapsed:
+        Float - Seconds taken to handle the request.
+        :param db_time:
+        Float - Seconds spent in DB queries while handling it.
+        """
+        key = (blueprint, route, method)
+        with self._lock:
+            histograms = self._routes.get(key)
+            if histograms is None:
+                histograms = self._routes[key] = [Histogram(), Histogram()]
+            histograms[0].observe(elapsed)
+            histograms[1].observe(db_time)
+            key += (status,)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+    def metrics(self):
+        """
+        Get a snapshot of the histograms & counters.
+        :return:
+        Dict - 'latency' & 'db_time' histogram snapshots keyed by (blueprint,
+        route, method), & 'statuses' request counts keyed by (blueprint,
+        route, method, status).
+        """
+        with self._lock:
+            return {
+                "latency": {
+                    key: histograms[0].snapshot()
+                    for key, histograms in self._routes.items()
+                },
+                "db_time": {
+                    key: histograms[1].snapshot()
+                    for key, histograms in self._routes.items()
+                },
+                "statuses": dict(self._statuses),
+            }
+
+
+REQUEST_METRICS = RequestMetrics()
@@ -0,0 +1,134 @@
+"""
+In process mirror of the Revoked_Tokens table, so stateless access_tokens
+can be checked for revocation without a query per request.
+"""
+import calendar
+import datetime
+import threading
+import time
+
+from mysql.connector.errors import IntegrityError
+
+from ..config import REVOCATION_SYNC_INTERVAL
+from ..models.auth import revoke_token, claim_token, get_revoked_tokens
+from .query import after_commit
+
+# Revocations are reloaded with this much overlap, in case a revocation
+# commits after a newer one has already been loaded.
+SYNC_OVERLAP = datetime.timedelta(minutes=1)
+
+
+class RevocationSet:
+    """
+    Set of revoked stateless token IDs (jti's). Tokens revoked in this
+    process apply immediately, those revoked by other processes are loaded
+    from the DB at most every `sync_interval` seconds. Tokens are forgotten
+    once they expire, so the set stays as small as the number of tokens
+    revoked within one token lifetime.
+    """
+    def __init__(self, sync_interval):
+        self._sync_interval = sync_interval
+        self._lock = threading.Lock()
+        # jti -> expiry as a unix timestamp.
+        self._revoked = {}
+        self._since = datetime.datetime(1970, 1, 1)
+        self._next_sync = 0.0
+
+    def revoke(self, jti, expires):
+        """
+        Revoke a token until it expires.
+        :param jti:
+        Str - Unique ID of the token.
+        :param expires:
+        Int - The token's exp claim.
+        """
+        revoke_token(jti, datetime.datetime.utcfromtimestamp(expires))
+        with self._lock:
+            self._revoked[jti] = expires
+
+    def claim(self, jti, expires):
+        """
+        Revoke a single use token, eg. a refresh_token, as it's used. The
+        DB decides which request gets to use it, so a token can't be used
+        twice at once or in another process before the next sync.
+        :param jti:
+        Str - Unique ID of the token.
+        :param expires:
+        Int - The token's exp claim.
+        :return:
+        Bool - True if the token was claimed, False if it was already used
+        or revoked.
+        """
+        with self._lock:
+            if jti in self._revoked:
+                return False
+        try:
+            claim_token(jti, datetime.datetime.utcfromtimestamp(expires))
+        except IntegrityError:
+            claimed = False
+        else:
+            claimed = True
+        if claimed:
+            # Only remembered once the claim commits, it's undone otherwise.
+            after_commit(lambda: self._remember(jti, expires))
+        else:
+            self._remember(jti, expires)
+        return claimed
+
+    def _remember(self, jti, expires):
+        """
+        Add a token to the in process set.
+        """
+        with self._lock:
+            self._revoked[jti] = expires
+
+    def is_revoked(self, jti):
+        """
+        Check if a token has been revoked.
+        :param jti:
+        Str - Unique ID of the token.
+        :return:
+        Bool - True if the token may no longer be used.
+        """
+        self.sync()
+        with self._lock:
+            expires = self._revoked.get(jti)
+        return expires is not None and expires > time.time()
+
+    def sync(self, force=False):
+        """
+        Load tokens revoked by other processes, if the last sync is older
+        than the sync interval.
+        :param force:
+        Bool - If True, sync regardless of when the last sync was.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and now < self._next_sync:
+                return
+            self._next_sync = now + self._sync_interval
+            since = self._since
+
+        rows = get_revoked_tokens(since) or []
+        with self._lock:
+            for jti, expires, revoked in rows:
+                self._revoked[jti] = calendar.timegm(expires.timetuple())
+                self._since = max(self._since, revoked - SYNC_OVERLAP)
+            now = time.time()
+            for jti in [
+                    jti for jti, expires in self._revoked.items()
+                    if expires <= now
+            ]:
+                del self._revoked[jti]
+
+    def clear(self):
+        """
+        Forget every revocation & reload them all on the next check.
+        """
+        with self._lock:
+            self._revoked.clear()
+            self._since = datetime.datetime(1970, 1, 1)
+            self._next_sync = 0.0
+
+
+REVOKED_TOKENS = RevocationSet(REVOCATION_SYNC_INTERVAL)
@@ -0,0 +1,44 @@
+"""
+Process wide S3 client, building a boto3 client is too slow to do per request.
+"""
+import os
+import threading
+
+import boto3
+
+from ..config import AWS_CREDS
+
+_LOCK = threading.Lock()
+# pid -> client, boto3 clients are thread safe but can't be shared by forks.
+_CLIENTS = {}
+
+
+def get_s3_client():
+    """
+    Get this process's S3 client, creating it on first use.
+    :return:
+    botocore.client.S3 - Shared by every thread in the process.
+    """
+    pid = os.getpid()
+    client = _CLIENTS.get(pid)
+    if client is None:
+        with _LOCK:
+            client = _CLIENTS.get(pid)
+            if client is None:
+                client = boto3.client(
+                    's3',
+                    aws_access_key_id=AWS_CREDS['AWSAccessKeyId'],
+                    aws_secret_access_key=AWS_CREDS['AWSSecretAccessKey'],
+                    endpoint_url=AWS_CREDS['EndpointUrl']
+                )
+                _CLIENTS.clear()
+                _CLIENTS[pid] = client
+    return client
+
+
+def clear_s3_client():
+    """
+    Forget the cached client, so the next call builds a new one.
+    """
+    with _LOCK:
+        _CLIENTS.clear()
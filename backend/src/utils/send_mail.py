@@ -1,14 +1,21 @@
 """
 Generic function for ending emails.
 """
-import smtplib
+from functools import partial
 
-from ..config import SMTP_CONFIG
+from ..config import SMTP_CONFIG, MAIL_QUEUE_CONFIG
+from .mail_queue import MailQueue
+from .query import after_commit
+
+
+MAIL_QUEUE = MailQueue("Mail", SMTP_CONFIG, **MAIL_QUEUE_CONFIG)
 
 
 def send_mail(send_to, subject, body):
     """
-    Sends an email to the provided address.
+    Sends an email to the provided address. The email is queued once the
+    current transaction commits & sent by a worker, so this returns
+    straight away.
     :param send_to:
     Str - A valid email address string for the person we are sending a mail to.
     :param subject:
@@ -16,20 +23,9 @@ def send_mail(send_to, subject, body):
     :param body:
     Str - The main contents of the email.
     :return:
-    None - Sends the mail and returns None.
+    None - Queues the mail and returns None.
     """
-    # Connect to SMTP server.
     sent_from = SMTP_CONFIG.get("sender")
     email_text = """From: %s\nTo: %s\nSubject: %s\n\n%s
         """ % (sent_from, send_to, subject, body)
-    smtp = smtplib.SMTP()
-    server = SMTP_CONFIG.get("server")
-    port = 587
-    smtp.connect(server, port)
-    smtp.ehlo()
-    smtp.starttls()
-    smtp.login(SMTP_CONFIG.get("user"), SMTP_CONFIG.get("password"))
-
-    # Send email & close connection.
-    smtp.sendmail(sent_from, send_to, email_text)
-    smtp.close()
+    after_commit(partial(MAIL_QUEUE.submit, sent_from, send_to, email_text))
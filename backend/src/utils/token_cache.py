@@ -0,0 +1,109 @@
+"""
+Bounded, thread-safe in process cache of validated access_tokens, saving
+the auth middleware a Logins lookup on every request.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from ..config import TOKEN_CACHE_CONFIG
+
+
+class TokenCache:
+    """
+    An LRU cache mapping raw access_tokens to their (uid, time_issued) login.
+    Entries are trusted for at most `ttl` seconds, after which the login is
+    read from the DB again, so logins deleted by another process stop being
+    accepted here within `ttl` seconds. At most `size` tokens are kept.
+    """
+    def __init__(self, size, ttl):
+        self._size = size
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        # access_token -> (uid, time_issued, cached_at), oldest use first.
+        self._entries = OrderedDict()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    def get(self, access_token):
+        """
+        Get the cached login for an access_token.
+        :param access_token:
+        Str - Raw JWT string.
+        :return:
+        Tuple|None - (uid, time_issued), or None if not cached or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(access_token)
+            if entry is None or time.monotonic() - entry[2] > self._ttl:
+                if entry is not None:
+                    del self._entries[access_token]
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(access_token)
+            self._stats["hits"] += 1
+            return entry[0], entry[1]
+
+    def put(self, access_token, uid, time_issued):
+        """
+        Cache the login for a validated access_token.
+        :param access_token:
+        Str - Raw JWT string.
+        :param uid:
+        Int - ID of the user the token belongs to.
+        :param time_issued:
+        Datetime - When the token was issued or last refreshed.
+        """
+        with self._lock:
+            self._entries[access_token] = (uid, time_issued, time.monotonic())
+            self._entries.move_to_end(access_token)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def discard(self, access_token):
+        """
+        Stop accepting a cached access_token, eg. on logout.
+        :param access_token:
+        Str - Raw JWT string.
+        """
+        with self._lock:
+            self._entries.pop(access_token, None)
+
+    def discard_user(self, uid):
+        """
+        Stop accepting any cached access_token belonging to a user.
+        :param uid:
+        Int - ID of the user who's tokens are being revoked.
+        """
+        with self._lock:
+            for access_token in [
+                    token for token, entry in self._entries.items()
+                    if entry[0] == uid
+            ]:
+                del self._entries[access_token]
+
+    def clear(self):
+        """
+        Empty the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        """
+        Get a snapshot of the cache's gauges & counters.
+        :return:
+        Dict - Cache size, usage and lifetime counters.
+        """
+        with self._lock:
+            res = dict(self._stats)
+            res["size"] = self._size
+            res["entries"] = len(self._entries)
+        return res
+
+
+TOKEN_CACHE = TokenCache(**TOKEN_CACHE_CONFIG)
@@ -6,12 +6,14 @@ from . import verify_token, refresh_token
 
 def verify_and_refresh(access_token):
     """
-    Function to verify & refresh an access_token.
+    Function to verify & refresh an access_token. The token is decoded once
+    & its login is read from the token cache when it was validated recently,
+    so the hot path needs no DB queries.
     :param access_token:
     Str - The raw JWT string we want to verify & refresh the DB entry for.
     :return:
     Dict - Contains all of the user information encoded in the JWT.
     """
     user = verify_token(access_token)
-    refresh_token(access_token)
+    refresh_token(access_token, user)
     return user
@@ -5,24 +5,37 @@ import datetime
 import jwt
 
 from ..config import JWT_SECRET
-from ..models.auth import get_login
+from ..models.auth import get_login_time
+from .revoked_tokens import REVOKED_TOKENS
 
 
 def verify_token(access_token):
     """
-    Verify that the provided access_token is valid.
+    Verify that the provided access_token is valid. Stateless tokens, which
+    carry a jti, are checked without touching the Logins table.
     :param access_token:
     Str - The raw JWT string we want to verify.
     :return:
     Dict - Contains all of the user information encoded in the JWT.
     """
     encoded_token = access_token
-    access_token = jwt.decode(access_token, JWT_SECRET, algorithms=['HS256'])
+    try:
+        access_token = jwt.decode(
+            access_token, JWT_SECRET, algorithms=['HS256']
+        )
+    except jwt.exceptions.ExpiredSignatureError:
+        raise ValueError
+
+    if access_token.get("jti"):
+        if access_token.get("type") != "access":
+            raise ValueError
+        if REVOKED_TOKENS.is_revoked(access_token.get("jti")):
+            raise ValueError
+        return access_token
 
-    login = get_login(access_token.get("uid"), encoded_token)
-    if not login:
+    time_issued = get_login_time(access_token.get("uid"), encoded_token)
+    if not time_issued:
         raise ValueError
-    time_issued = login[0][2]
     expiry_time = time_issued + datetime.timedelta(days=7)
     time_issued -= datetime.timedelta(seconds=15)
     now = datetime.datetime.utcnow()
@@ -3,14 +3,26 @@
 Test suite for /audio endpoints.
 """
 import unittest
+import gzip
 import json
+import sqlite3
+import tracemalloc
+import zlib
 import mock
 import pytest
 
+import jwt
 from jwt.exceptions import InvalidSignatureError
 
 from ..src import APP
+from ..src.config import JWT_SECRET
 from ..src.models.errors import NoResults
+from ..src.models.audio import (
+    SONG_KEYSET_ORDERS, LIKE_SEARCH_SOURCE, get_search_source, get_search_page,
+    post_like, post_likes, post_unlike, reconcile_like_counts
+)
+from ..src.utils.keyset import keyset_clauses, keyset_page
+from ..src.utils.compression import brotli
 from .constants import TEST_TOKEN, MOCKED_TOKEN, ALT_MOCKED_TOKEN
 
 
@@ -290,6 +302,10 @@ class AudioTests(unittest.TestCase):
                 )
                 self.assertEqual(403, res.status_code)
 
+    @mock.patch(
+        'backend.src.controllers.audio.controllers.get_song_state_version',
+        mock.MagicMock(return_value=1)
+    )
     @mock.patch('backend.src.controllers.audio.controllers.get_song_state')
     @mock.patch('backend.src.controllers.audio.controllers.permitted_to_edit')
     def test_load_song_success(self, mocked_edit, mocked_state):
@@ -313,6 +329,53 @@ class AudioTests(unittest.TestCase):
             expected_body = {'song_state': {'tempo': 140, 'tracks': []}}
             self.assertEqual(expected_body, json.loads(res.data))
 
+    @mock.patch('backend.src.controllers.audio.controllers.get_song_state_version')
+    @mock.patch('backend.src.controllers.audio.controllers.get_song_state')
+    @mock.patch('backend.src.controllers.audio.controllers.permitted_to_edit')
+    def test_load_song_not_modified(self, mocked_edit, mocked_state, mocked_version):
+        """
+        Ensure a song state is only sent again once a new one has been saved.
+        """
+        mocked_edit.return_value = 1
+        mocked_state.return_value = "{\"tempo\": 140, \"tracks\": []}"
+        mocked_version.return_value = 3
+        with mock.patch('backend.src.middleware.auth_required.verify_and_refresh') as mock_token:
+            mock_token.return_value = ALT_MOCKED_TOKEN
+            res = self.test_client.get(
+                "/api/v1/audio/state",
+                query_string={"sid": 1},
+                headers={'Authorization': 'Bearer ' + TEST_TOKEN},
+                follow_redirects=True
+            )
+            self.assertEqual(200, res.status_code)
+            etag = res.headers["ETag"]
+            res = self.test_client.get(
+                "/api/v1/audio/state",
+                query_string={"sid": 1},
+                headers={
+                    'Authorization': 'Bearer ' + TEST_TOKEN,
+                    'If-None-Match': etag
+                },
+                follow_redirects=True
+            )
+            self.assertEqual(304, res.status_code)
+            self.assertEqual(b"", res.data)
+            self.assertEqual(etag, res.headers["ETag"])
+            self.assertEqual(1, mocked_state.call_count)
+
+            mocked_version.return_value = 4
+            res = self.test_client.get(
+                "/api/v1/audio/state",
+                query_string={"sid": 1},
+                headers={
+                    'Authorization': 'Bearer ' + TEST_TOKEN,
+                    'If-None-Match': etag
+                },
+                follow_redirects=True
+            )
+            self.assertEqual(200, res.status_code)
+            self.assertNotEqual(etag, res.headers["ETag"])
+
     def test_load_song_fail_missing_access_token(self):
         """
         Ensure loading a song fails if no access_token is sent.
@@ -410,6 +473,47 @@ class AudioTests(unittest.TestCase):
             )
             self.assertEqual(403, res.status_code)
 
+    @mock.patch('backend.src.controllers.audio.controllers.get_all_compiled_songs')
+    @mock.patch('backend.src.controllers.audio.controllers.get_number_of_compiled_songs')
+    def test_get_compiled_songs_not_modified(self, mocked_num_songs, mocked_songs):
+        """
+        Ensure a page of compiled songs is only sent again once it changes.
+        """
+        test_songs = [
+            [1, "username", "A test song", 0, "Wed, 13 Nov 2019 17:07:39 GMT", 1, None, None, 8, 0, "a description"]
+        ]
+        mocked_num_songs.return_value = 1
+        mocked_songs.return_value = test_songs
+        with mock.patch('backend.src.middleware.auth_required.verify_and_refresh') as mock_token:
+            mock_token.return_value = ALT_MOCKED_TOKEN
+            res = self.test_client.get(
+                "/api/v1/audio/compiled_songs",
+                headers={'Authorization': 'Bearer ' + TEST_TOKEN},
+                follow_redirects=True
+            )
+            etag = res.headers["ETag"]
+            res = self.test_client.get(
+                "/api/v1/audio/compiled_songs",
+                headers={
+                    'Authorization': 'Bearer ' + TEST_TOKEN,
+                    'If-None-Match': etag
+                },
+                follow_redirects=True
+            )
+            self.assertEqual(304, res.status_code)
+
+            test_songs[0][8] = 9
+            res = self.test_client.get(
+                "/api/v1/audio/compiled_songs",
+                headers={
+                    'Authorization': 'Bearer ' + TEST_TOKEN,
+                    'If-None-Match': etag
+                },
+                follow_redirects=True
+            )
+            self.assertEqual(200, res.status_code)
+            self.assertEqual(9, json.loads(res.data)["songs"][0]["likes"])
+
     @mock.patch('backend.src.controllers.audio.controllers.get_all_compiled_songs')
     @mock.patch('backend.src.controllers.audio.controllers.get_number_of_compiled_songs')
     def test_get_compiled_songs_success_no_scroll_token_or_username(self, mocked_num_songs, mocked_songs):
@@ -722,6 +826,35 @@ class AudioTests(unittest.TestCase):
             }
             self.assertEqual(expected_body, json.loads(res.data))
 
+    @mock.patch('backend.src.controllers.audio.controllers.get_all_compiled_songs')
+    @mock.patch('backend.src.controllers.audio.controllers.get_number_of_compiled_songs')
+    def test_get_compiled_songs_success_keyset(self, mocked_num_songs, mocked_songs):
+        """
+        Ensure keyset pages skip the total count & carry the last sort key in the next_page token.
+        """
+        test_songs = [
+            [3, "username", "A test song", 0, "Wed, 13 Nov 2019 17:07:39 GMT", 1, None, None, 8, 0, "a description", "[3]"],
+            [2, "username", "A test song", 0, "Wed, 13 Nov 2019 17:07:39 GMT", 1, None, None, 8, 0, "a description", "[2]"]
+        ]
+        mocked_songs.return_value = test_songs
+        with mock.patch('backend.src.middleware.auth_required.verify_and_refresh') as mock_token:
+            mock_token.return_value = ALT_MOCKED_TOKEN
+            res = self.test_client.get(
+                "/api/v1/audio/compiled_songs",
+                query_string={"keyset": 1, "songs_per_page": 1},
+                headers={'Authorization': 'Bearer ' + TEST_TOKEN},
+                follow_redirects=True
+            )
+            self.assertEqual(200, res.status_code)
+            body = json.loads(res.data)
+            mocked_num_songs.assert_not_called()
+            self.assertIsNone(body["total_pages"])
+            self.assertIsNone(body["back_page"])
+            self.assertEqual([3], [song["sid"] for song in body["songs"]])
+            token = jwt.decode(body["next_page"], JWT_SECRET, algorithms=['HS256'])
+            self.assertEqual([3], token["after"])
+            self.assertEqual(2, token["current_page"])
+
     def test_get_compiled_songs_fail_missing_access_token(self):
         """
         Ensure getting songs fails if no access_token is sent.
@@ -1467,6 +1600,10 @@ class AudioTests(unittest.TestCase):
 
     @mock.patch("backend.src.controllers.audio.controllers.get_song_data")
     @mock.patch('backend.src.controllers.audio.controllers.get_like_pair')
+    @mock.patch(
+        'backend.src.controllers.audio.controllers.notify_like_dids',
+        mock.MagicMock(return_value=[])
+    )
     def test_like_success(self, mocked_likes, mocked_song):
         """
         Ensure liking is successful.
@@ -1663,29 +1800,38 @@ class AudioTests(unittest.TestCase):
             )
             self.assertEqual(422, res.status_code)
 
+    @mock.patch('backend.src.controllers.audio.controllers.stream_notification_audience')
     @mock.patch('backend.src.controllers.audio.controllers.get_song_data')
-    def test_publish_success(self, mocked_song):
+    def test_publish_success(self, mocked_song, mocked_audience):
         """
-        Ensure publish is successful.
+        Ensure publish is successful & notifies the publisher's audience.
         """
         test_req_data = {
             "sid": 1,
         }
         mocked_song.return_value = [[None, None, "A Cool Tune"]]
+        mocked_audience.return_value = iter([["did1", "did2"]])
         with mock.patch("backend.src.controllers.audio.controllers.permitted_to_edit"):
             with mock.patch("backend.src.controllers.audio.controllers.update_published_status"):
                 with mock.patch("backend.src.controllers.audio.controllers.update_publised_timestamp"):
                     with mock.patch('backend.src.middleware.auth_required.verify_and_refresh') as mock_token:
                         mock_token.return_value = MOCKED_TOKEN
-                        res = self.test_client.post(
-                            "/api/v1/audio/publish",
-                            json=test_req_data,
-                            headers={'Authorization': 'Bearer ' + TEST_TOKEN},
-                            follow_redirects=True
-                        )
-                        self.assertEqual(200, res.status_code)
-                        expected_body = {"message": "Song published."}
-                        self.assertEqual(expected_body, json.loads(res.data))
+                        with mock.patch("backend.src.controllers.audio.controllers.notification_sender") as mocked_sender:
+                            res = self.test_client.post(
+                                "/api/v1/audio/publish",
+                                json=test_req_data,
+                                headers={'Authorization': 'Bearer ' + TEST_TOKEN},
+                                follow_redirects=True
+                            )
+                            self.assertEqual(200, res.status_code)
+                            expected_body = {"message": "Song published."}
+                            self.assertEqual(expected_body, json.loads(res.data))
+                            mocked_audience.assert_called_once_with(
+                                MOCKED_TOKEN["uid"], "song", mock.ANY
+                            )
+                            self.assertEqual(
+                                ["did1", "did2"], mocked_sender.call_args[0][1]
+                            )
 
     def test_publish_fail_missing_access_token(self):
         """
@@ -1784,6 +1930,10 @@ class AudioTests(unittest.TestCase):
             expected_body = {"message": "You can't publish that song!"}
             self.assertEqual(expected_body, json.loads(res.data))
 
+    @mock.patch(
+        'backend.src.controllers.audio.controllers.update_publised_timestamp',
+        mock.MagicMock()
+    )
     def test_unpublish_success(self):
         """
         Ensure unpublish is successful.
@@ -4298,9 +4448,8 @@ class AudioTests(unittest.TestCase):
                 )
                 self.assertEqual(401, res.status_code)
 
-    @mock.patch('backend.src.controllers.audio.controllers.get_all_search_results')
-    @mock.patch('backend.src.controllers.audio.controllers.get_number_of_searchable_songs')
-    def test_get_search_success_no_scroll_token(self, mocked_num_songs, mocked_songs):
+    @mock.patch('backend.src.controllers.audio.controllers.get_search_page')
+    def test_get_search_success_no_scroll_token(self, mocked_songs):
         """
         Ensure searching for songs is successful without scroll tokens.
         """
@@ -4308,8 +4457,7 @@ class AudioTests(unittest.TestCase):
             [1, "username", "A test song", 0, "Wed, 13 Nov 2019 17:07:39 GMT",
              1, None, None, 8, 0, "a description"]
         ]
-        mocked_num_songs.return_value = 2
-        mocked_songs.return_value = test_songs
+        mocked_songs.return_value = (2, test_songs)
         with mock.patch('backend.src.middleware.auth_required.verify_and_refresh') as mock_token:
             mock_token.return_value = ALT_MOCKED_TOKEN
             res = self.test_client.get(
@@ -4344,8 +4492,7 @@ class AudioTests(unittest.TestCase):
             self.assertEqual(expected_body, json.loads(res.data))
 
     @mock.patch('backend.src.controllers.audio.controllers.get_all_search_results')
-    @mock.patch('backend.src.controllers.audio.controllers.get_number_of_searchable_songs')
-    def test_get_search_success_next_scroll_token(self, mocked_num_songs, mocked_songs):
+    def test_get_search_success_next_scroll_token(self, mocked_songs):
         """
         Ensure searching for songs is successful with a next page scroll token.
         """
@@ -4354,7 +4501,6 @@ class AudioTests(unittest.TestCase):
              "Wed, 13 Nov 2019 17:07:40 GMT", 1, None, None, 8, 0,
              "a description"]
         ]
-        mocked_num_songs.return_value = 2
         mocked_songs.return_value = test_song
         test_req_data = {
             "next_page": (
@@ -4400,8 +4546,7 @@ class AudioTests(unittest.TestCase):
             self.assertEqual(expected_body, json.loads(res.data))
 
     @mock.patch('backend.src.controllers.audio.controllers.get_all_search_results')
-    @mock.patch('backend.src.controllers.audio.controllers.get_number_of_searchable_songs')
-    def test_get_search_success_back_scroll_token(self, mocked_num_songs, mocked_songs):
+    def test_get_search_success_back_scroll_token(self, mocked_songs):
         """
         Ensure searching for songs is successful with a back page scroll token.
         """
@@ -4411,7 +4556,6 @@ class AudioTests(unittest.TestCase):
              "a description"]
         ]
         mocked_songs.return_value = test_song
-        mocked_num_songs.return_value = 2
         test_req_data = {
             "back_page": (
                 "eyJ0eXAiOiJKV1QiLCJhbGciOiJIUzI1NiJ9.eyJzZWFyY2hfdGVybSI6InRl"
@@ -4507,12 +4651,12 @@ class AudioTests(unittest.TestCase):
             )
             self.assertEqual(500, res.status_code)
 
-    @mock.patch('backend.src.controllers.audio.controllers.get_number_of_searchable_songs')
-    def test_get_search_fail_no_scroll_token_exceeded_last_page(self, mocked_num_songs):
+    @mock.patch('backend.src.controllers.audio.controllers.get_search_page')
+    def test_get_search_fail_no_scroll_token_exceeded_last_page(self, mocked_songs):
         """
         Ensure searching for songs fails if the user tries to access a page that doesn't exist.
         """
-        mocked_num_songs.return_value = 2
+        mocked_songs.return_value = (2, [])
         test_req_data = {
             "current_page": 12,
             "posts_per_page": 1,
@@ -4586,6 +4730,48 @@ class AudioTests(unittest.TestCase):
             self.assertEqual(expected_body, json.loads(res.data))
 
 
+    @mock.patch('backend.src.controllers.audio.controllers.get_child_files')
+    @mock.patch('backend.src.controllers.audio.controllers.get_child_folders')
+    @mock.patch('backend.src.controllers.audio.controllers.get_folder_entry')
+    def test_get_folder_not_modified(self, mock_folder, mock_child_folders, mock_child_files):
+        """
+        Ensure a folder is only sent again once its contents change.
+        """
+        mock_folder.return_value = [[1, None, "A Folder"]]
+        mock_child_folders.return_value = []
+        mock_child_files.return_value = []
+        with mock.patch('backend.src.middleware.auth_required.verify_and_refresh') as mock_token:
+            mock_token.return_value = ALT_MOCKED_TOKEN
+            res = self.test_client.get(
+                "/api/v1/audio/folders",
+                query_string={"folder_id": 1},
+                headers={'Authorization': 'Bearer ' + TEST_TOKEN},
+                follow_redirects=True
+            )
+            etag = res.headers["ETag"]
+            res = self.test_client.get(
+                "/api/v1/audio/folders",
+                query_string={"folder_id": 1},
+                headers={
+                    'Authorization': 'Bearer ' + TEST_TOKEN,
+                    'If-None-Match': etag
+                },
+                follow_redirects=True
+            )
+            self.assertEqual(304, res.status_code)
+
+            mock_child_files.return_value = [[2, "clap.wav", "a_url"]]
+            res = self.test_client.get(
+                "/api/v1/audio/folders",
+                query_string={"folder_id": 1},
+                headers={
+                    'Authorization': 'Bearer ' + TEST_TOKEN,
+                    'If-None-Match': etag
+                },
+                follow_redirects=True
+            )
+            self.assertEqual(200, res.status_code)
+
     def test_get_folder_fail_missing_access_token(self):
         """
         Ensure getting a folder fails if no access_token is sent.
@@ -5339,3 +5525,440 @@ class AudioTests(unittest.TestCase):
                 follow_redirects=True
             )
             self.assertEqual(500, res.status_code)
+
+
+class KeysetTests(unittest.TestCase):
+    """
+    Unit tests for keyset pagination.
+    """
+    def test_first_page_has_no_seek_predicate(self):
+        """
+        Ensure the first page only fetches one extra row.
+        """
+        page = keyset_clauses([("Songs.sid", "DESC")], {"current_page": 1}, 10)
+        self.assertEqual("", page["where"])
+        self.assertEqual("ORDER BY Songs.sid DESC LIMIT %s", page["order"])
+        self.assertEqual([11], page["args"])
+
+    def test_seek_after_compound_key(self):
+        """
+        Ensure later pages seek past the last row's sort key.
+        """
+        order = [("title", "ASC"), ("Songs.sid", "ASC")]
+        page = keyset_clauses(order, {"after": ["b", 7]}, 10)
+        self.assertEqual(
+            "AND ((title > %s) OR (title = %s AND Songs.sid > %s)) ",
+            page["where"]
+        )
+        self.assertEqual(["b", "b", 7, 11], page["args"])
+
+    def test_seek_before_flips_order(self):
+        """
+        Ensure back pages are fetched in reverse order.
+        """
+        page = keyset_clauses([("Songs.sid", "DESC")], {"before": [5]}, 10)
+        self.assertEqual("AND ((Songs.sid > %s)) ", page["where"])
+        self.assertEqual("ORDER BY Songs.sid ASC LIMIT %s", page["order"])
+
+    def test_pages_across_null_publish_dates(self):
+        """
+        Ensure paging by publish date reaches every song, including those
+        without a published timestamp, in both directions.
+        """
+        db = sqlite3.connect(":memory:")
+        db.execute("CREATE TABLE Songs (sid INT, published TEXT)")
+        db.executemany("INSERT INTO Songs VALUES (?, ?)", [
+            (1, "2019-01-03 00:00:00"), (2, None), (3, "2019-01-01 00:00:00"),
+            (4, None), (5, "2019-01-03 00:00:00"), (6, None)
+        ])
+
+        def get_page(sort, keyset):
+            page = keyset_clauses(SONG_KEYSET_ORDERS[sort], keyset, 2)
+            sql = (
+                "SELECT sid" + page["column"] + "FROM Songs WHERE 1=1 "
+                + page["where"] + page["order"]
+            ).replace("%s", "?")
+            return keyset_page(
+                db.execute(sql, page["args"]).fetchall(), 2, keyset, {}
+            )
+
+        for sort, expected in (
+                ("publish_down", [5, 1, 3, 6, 4, 2]),
+                ("publish_up", [2, 4, 6, 3, 1, 5])
+        ):
+            keyset = {"current_page": 1}
+            seen, pages = [], []
+            while keyset:
+                rows, back_page, next_page = get_page(sort, keyset)
+                seen += [row[0] for row in rows]
+                pages.append((rows, back_page))
+                keyset = next_page and jwt.decode(
+                    next_page, JWT_SECRET, algorithms=['HS256']
+                )
+            self.assertEqual(expected, seen)
+
+            keyset = jwt.decode(
+                pages[-1][1], JWT_SECRET, algorithms=['HS256']
+            )
+            rows, _, _ = get_page(sort, keyset)
+            self.assertEqual(pages[-2][0], rows)
+
+    def test_page_tokens(self):
+        """
+        Ensure pages are trimmed & get tokens in the right directions.
+        """
+        rows = [(3, "[3]"), (2, "[2]"), (1, "[1]")]
+        res, back_page, next_page = keyset_page(
+            rows, 2, {"current_page": 1}, {}
+        )
+        self.assertEqual([(3,), (2,)], res)
+        self.assertIsNone(back_page)
+        self.assertIsNotNone(next_page)
+
+        res, back_page, next_page = keyset_page(
+            [(4, "[4]")], 2, {"before": [5], "current_page": 2}, {}
+        )
+        self.assertEqual([(4,)], res)
+        self.assertIsNone(back_page)
+        self.assertIsNotNone(next_page)
+
+
+class SearchTests(unittest.TestCase):
+    """
+    Unit tests for building song search queries.
+    """
+    def test_stopwords_left_out_of_fulltext_query(self):
+        """
+        Ensure stopwords, which are never indexed, aren't required.
+        """
+        _, args, _ = get_search_source("The Beatles")
+        self.assertEqual(("+Beatles*",) * 4, args)
+
+    def test_only_stopwords_fall_back_to_like(self):
+        """
+        Ensure a search made up of stopwords uses a LIKE scan.
+        """
+        source, args, relevance_sql = get_search_source("the who")
+        self.assertEqual(LIKE_SEARCH_SOURCE, source)
+        self.assertEqual(("%the who%",) * 2, args)
+        self.assertIsNone(relevance_sql)
+
+    @mock.patch('backend.src.models.audio.DB_WINDOW_FUNCTIONS', False)
+    @mock.patch('backend.src.models.audio.query')
+    def test_search_page_without_window_functions(self, mocked_query):
+        """
+        Ensure servers without window functions count results separately.
+        """
+        mocked_query.side_effect = [[[7]], [["song"]]]
+        self.assertEqual(
+            (7, [["song"]]), get_search_page(0, 10, 1, "beatles", None, False)
+        )
+        for call in mocked_query.call_args_list:
+            self.assertNotIn("OVER()", call[0][0])
+
+    @mock.patch('backend.src.models.audio.DB_WINDOW_FUNCTIONS', True)
+    @mock.patch('backend.src.models.audio.query')
+    def test_search_page_with_window_functions(self, mocked_query):
+        """
+        Ensure the total is selected alongside the page on MySQL 8.
+        """
+        mocked_query.return_value = [["song", 7]]
+        self.assertEqual(
+            (7, [["song"]]), get_search_page(0, 10, 1, "beatles", None, False)
+        )
+        mocked_query.assert_called_once()
+        self.assertIn("COUNT(*) OVER()", mocked_query.call_args[0][0])
+
+
+class CompressionTests(unittest.TestCase):
+    """
+    Unit tests for response compression & compressed request bodies.
+    """
+    def setUp(self):
+        self.test_client = APP.test_client(self)
+        for target, value in (
+                ('backend.src.middleware.auth_required.verify_and_refresh', ALT_MOCKED_TOKEN),
+                ('backend.src.controllers.audio.controllers.get_folder_entry', [[1, None, "A Folder"]]),
+                ('backend.src.controllers.audio.controllers.get_child_folders', []),
+                ('backend.src.controllers.audio.controllers.get_child_files', [
+                    [i, "sample_%s.wav" % i, "https://example.com/sample_%s.wav" % i] for i in range(50)
+                ]),
+                ('backend.src.controllers.audio.controllers.permitted_to_edit', True),
+        ):
+            patcher = mock.patch(target, mock.MagicMock(return_value=value))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get_folder(self, **headers):
+        """
+        GET the mocked folder with the given extra headers.
+        """
+        headers['Authorization'] = 'Bearer ' + TEST_TOKEN
+        return self.test_client.get(
+            "/api/v1/audio/folders",
+            query_string={"folder_id": 1},
+            headers=headers,
+            follow_redirects=True
+        )
+
+    def test_gzip_response(self):
+        """
+        Ensure large responses are gzipped for clients that accept it, with
+        the encoding in their ETag.
+        """
+        plain = self.get_folder()
+        self.assertNotIn("Content-Encoding", plain.headers)
+        res = self.get_folder(**{'Accept-Encoding': 'gzip'})
+        self.assertEqual(200, res.status_code)
+        self.assertEqual("gzip", res.headers["Content-Encoding"])
+        self.assertIn("Accept-Encoding", res.headers["Vary"])
+        self.assertEqual(plain.data, gzip.decompress(res.data))
+        self.assertLess(len(res.data), len(plain.data))
+        self.assertEqual(
+            plain.headers["ETag"][:-1] + '-gzip"', res.headers["ETag"]
+        )
+
+        res = self.get_folder(**{
+            'Accept-Encoding': 'gzip', 'If-None-Match': res.headers["ETag"]
+        })
+        self.assertEqual(304, res.status_code)
+
+    def test_small_response_not_compressed(self):
+        """
+        Ensure responses under min_size are sent as they are.
+        """
+        with mock.patch.dict(
+                'backend.src.utils.compression.COMPRESSION_CONFIG', {'min_size': 10 ** 6}
+        ):
+            res = self.get_folder(**{'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(200, res.status_code)
+        self.assertNotIn("Content-Encoding", res.headers)
+
+    def test_identity_only_not_compressed(self):
+        """
+        Ensure responses aren't compressed for clients that don't accept it.
+        """
+        res = self.get_folder(**{'Accept-Encoding': 'gzip;q=0, identity'})
+        self.assertNotIn("Content-Encoding", res.headers)
+
+    @unittest.skipIf(brotli is None, "brotli isn't installed")
+    def test_brotli_preferred(self):
+        """
+        Ensure brotli is used when the client accepts it.
+        """
+        plain = self.get_folder()
+        res = self.get_folder(**{'Accept-Encoding': 'gzip, br'})
+        self.assertEqual("br", res.headers["Content-Encoding"])
+        self.assertEqual(plain.data, brotli.decompress(res.data))
+
+    def save_song(self, body, encoding):
+        """
+        POST a compressed song state.
+        """
+        return self.test_client.post(
+            "/api/v1/audio/state",
+            data=body,
+            headers={
+                'Authorization': 'Bearer ' + TEST_TOKEN,
+                'Content-Type': 'application/json',
+                'Content-Encoding': encoding
+            },
+            follow_redirects=True
+        )
+
+    @mock.patch('backend.src.controllers.audio.controllers.insert_song_state')
+    def test_save_song_gzipped(self, mocked_insert):
+        """
+        Ensure song states can be saved gzipped.
+        """
+        state = {"tracks": [{"name": "track %s" % i} for i in range(100)]}
+        body = gzip.compress(json.dumps({"sid": 1, "song_state": state}).encode())
+        res = self.save_song(body, "gzip")
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(state, json.loads(mocked_insert.call_args[0][1]))
+
+    @unittest.skipIf(brotli is None, "brotli isn't installed")
+    @mock.patch('backend.src.controllers.audio.controllers.insert_song_state')
+    def test_save_song_brotli(self, mocked_insert):
+        """
+        Ensure song states can be saved brotli compressed.
+        """
+        state = {"tracks": []}
+        body = brotli.compress(json.dumps({"sid": 1, "song_state": state}).encode())
+        res = self.save_song(body, "br")
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(state, json.loads(mocked_insert.call_args[0][1]))
+
+    @mock.patch('backend.src.controllers.audio.controllers.insert_song_state')
+    def test_save_song_fail_bad_compressed_body(self, mocked_insert):
+        """
+        Ensure malformed, oversized & unsupported compressed bodies are
+        rejected.
+        """
+        body = gzip.compress(json.dumps({"sid": 1, "song_state": {}}).encode())
+        self.assertEqual(400, self.save_song(body[:-8], "gzip").status_code)
+        self.assertEqual(400, self.save_song(b"not gzip", "gzip").status_code)
+        self.assertEqual(415, self.save_song(body, "deflate").status_code)
+        with mock.patch.dict(
+                'backend.src.utils.compression.COMPRESSION_CONFIG', {'max_body_size': 10}
+        ):
+            self.assertEqual(413, self.save_song(body, "gzip").status_code)
+        mocked_insert.assert_not_called()
+
+    @mock.patch('backend.src.controllers.audio.controllers.insert_song_state')
+    def test_save_song_fail_compressed_body_over_cap(self, mocked_insert):
+        """
+        Ensure compressed bodies larger than max_compressed_size are rejected
+        before they're decompressed.
+        """
+        body = gzip.compress(json.dumps({"sid": 1, "song_state": {}}).encode())
+        with mock.patch.dict(
+                'backend.src.middleware.decompress_body.COMPRESSION_CONFIG',
+                {'max_compressed_size': 10}
+        ), mock.patch('backend.src.middleware.decompress_body.decompress') as mocked_decompress:
+            self.assertEqual(413, self.save_song(body, "gzip").status_code)
+            mocked_decompress.assert_not_called()
+        mocked_insert.assert_not_called()
+
+    def test_save_song_fail_compressed_body_unauthenticated(self):
+        """
+        Ensure compressed bodies are only decompressed for logged in users.
+        """
+        body = gzip.compress(json.dumps({"sid": 1, "song_state": {}}).encode())
+        with mock.patch('backend.src.middleware.decompress_body.decompress') as mocked_decompress:
+            res = self.test_client.post(
+                "/api/v1/audio/state",
+                data=body,
+                headers={
+                    'Content-Type': 'application/json',
+                    'Content-Encoding': 'gzip'
+                },
+                follow_redirects=True
+            )
+            self.assertEqual(401, res.status_code)
+            mocked_decompress.assert_not_called()
+
+    def assert_bomb_rejected(self, body, encoding):
+        """
+        POST a body that inflates to 256MB & ensure it's rejected with a 413
+        without inflating much past max_body_size.
+        """
+        with mock.patch.dict(
+                'backend.src.utils.compression.COMPRESSION_CONFIG', {'max_body_size': 1024 * 1024}
+        ):
+            tracemalloc.start()
+            try:
+                res = self.save_song(body, encoding)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        self.assertEqual(413, res.status_code)
+        self.assertLess(peak, 32 * 1024 * 1024)
+
+    def test_save_song_fail_gzip_bomb(self):
+        """
+        Ensure a gzip body with a huge compression ratio is cut off.
+        """
+        compressor = zlib.compressobj(1, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        zeros = bytes(1024 * 1024)
+        body = b"".join(compressor.compress(zeros) for _ in range(256))
+        self.assert_bomb_rejected(body + compressor.flush(), "gzip")
+
+    @unittest.skipIf(brotli is None, "brotli isn't installed")
+    def test_save_song_fail_brotli_bomb(self):
+        """
+        Ensure a brotli body with a huge compression ratio is cut off.
+        """
+        compressor = brotli.Compressor(quality=1)
+        zeros = bytes(1024 * 1024)
+        body = b"".join(compressor.process(zeros) for _ in range(256))
+        self.assert_bomb_rejected(body + compressor.finish(), "br")
+
+
+class LikeCountTests(unittest.TestCase):
+    """
+    Unit tests for keeping Songs.likes_count in step with Song_Likes, run
+    against an in memory SQLite DB.
+    """
+    def setUp(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.execute("CREATE TABLE Songs (sid INT, likes_count INT)")
+        self.db.execute("CREATE TABLE Song_Likes (uid INT, sid INT)")
+        self.db.executemany(
+            "INSERT INTO Songs VALUES (?, 0)", [(1,), (2,), (3,)]
+        )
+        for name, value in (
+                ("query", self.query), ("query_many", self.query_many),
+                ("transaction", mock.MagicMock()),
+                ("update_user_stats", mock.MagicMock())
+        ):
+            patcher = mock.patch(
+                "backend.src.models.audio." + name, value
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def query(self, sql, args, get_row=False, get_row_count=False):
+        """
+        Run a query on the SQLite DB the way utils.query does on MySQL.
+        """
+        cursor = self.db.execute(sql.replace("%s", "?"), args)
+        if get_row:
+            return cursor.fetchall()
+        return cursor.rowcount if get_row_count else None
+
+    def query_many(self, sql, seq_of_args):
+        """
+        Run a batched query on the SQLite DB.
+        """
+        return self.db.executemany(sql.replace("%s", "?"), seq_of_args).rowcount
+
+    def likes_count(self, sid):
+        """
+        Get a song's likes_count.
+        """
+        return self.db.execute(
+            "SELECT likes_count FROM Songs WHERE sid=?", (sid,)
+        ).fetchone()[0]
+
+    def test_like_then_unlike(self):
+        """
+        Ensure liking & unliking a song leaves its count where it started.
+        """
+        post_like(1, 1)
+        post_like(2, 1)
+        self.assertEqual(2, self.likes_count(1))
+        post_unlike(1, 1)
+        post_unlike(2, 1)
+        self.assertEqual(0, self.likes_count(1))
+
+    def test_unlike_never_liked(self):
+        """
+        Ensure unliking a song that was never liked doesn't decrement it.
+        """
+        post_like(1, 1)
+        post_unlike(2, 1)
+        post_unlike(1, 2)
+        self.assertEqual(1, self.likes_count(1))
+        self.assertEqual(0, self.likes_count(2))
+
+    def test_bulk_likes(self):
+        """
+        Ensure a batch of likes adds each song's likes to its count.
+        """
+        post_likes([(1, 1), (2, 1), (3, 1), (1, 2)])
+        self.assertEqual(3, self.likes_count(1))
+        self.assertEqual(1, self.likes_count(2))
+        self.assertEqual(0, self.likes_count(3))
+
+    def test_reconcile_repairs_drift(self):
+        """
+        Ensure reconciliation corrects drifted counts & leaves the rest.
+        """
+        post_likes([(1, 1), (2, 1), (1, 2)])
+        self.db.execute("UPDATE Songs SET likes_count = 7 WHERE sid = 1")
+        self.db.execute("UPDATE Songs SET likes_count = -1 WHERE sid = 3")
+        self.assertEqual(2, reconcile_like_counts())
+        self.assertEqual(2, self.likes_count(1))
+        self.assertEqual(1, self.likes_count(2))
+        self.assertEqual(0, self.likes_count(3))
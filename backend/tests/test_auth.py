@@ -3,14 +3,23 @@
 Test suite for /auth endpoints.
 """
 import unittest
+import datetime
 import json
 import mock
+import jwt
 
 from jwt.exceptions import InvalidSignatureError
+from mysql.connector.errors import IntegrityError
 from argon2.exceptions import VerifyMismatchError
 
 from ..src import APP
 from ..src.utils.random_string import random_string
+from ..src.utils import gen_session_tokens, verify_and_refresh
+from ..src.utils.token_cache import TokenCache, TOKEN_CACHE
+from ..src.utils.revoked_tokens import REVOKED_TOKENS
+from ..src.models.auth import delete_login, refresh_login, token_digest
+from ..src.models.errors import NoResults
+from ..src.config import JWT_SECRET
 from .constants import TEST_TOKEN, MOCKED_TOKEN
 
 
@@ -259,3 +268,318 @@ class AuthTests(unittest.TestCase):
                 follow_redirects=True
             )
             self.assertEqual(500, res.status_code)
+
+    @mock.patch('backend.src.controllers.auth.controllers.AUTH_MODE', "stateless")
+    @mock.patch('backend.src.controllers.auth.controllers.PasswordHasher.verify')
+    @mock.patch('backend.src.controllers.auth.controllers.get_user_via_username')
+    def test_login_success_stateless(self, mocked_user, mocked_verify):
+        """
+        Ensure stateless logins issue expiring tokens without a Logins entry.
+        """
+        mocked_user.return_value = [[-1, "username@fakemail.noshow", "username", "apassword", 1, "http://image.fake"]]
+        mocked_verify.return_value = True
+        test_req_data = {
+            "username": "username",
+            "password": "1234"
+        }
+        with mock.patch('backend.src.controllers.auth.controllers.insert_login') as mocked_login:
+            res = self.test_client.post(
+                "/api/v1/auth/login",
+                json=test_req_data,
+                follow_redirects=True
+            )
+            self.assertEqual(200, res.status_code)
+            mocked_login.assert_not_called()
+            body = json.loads(res.data)
+            access_token = jwt.decode(body["access_token"], JWT_SECRET, algorithms=['HS256'])
+            refresh_token = jwt.decode(body["refresh_token"], JWT_SECRET, algorithms=['HS256'])
+            self.assertEqual("access", access_token["type"])
+            self.assertEqual("refresh", refresh_token["type"])
+            self.assertEqual(access_token["iat"] + body["expires_in"], access_token["exp"])
+
+    @mock.patch('backend.src.controllers.auth.controllers.REVOKED_TOKENS')
+    @mock.patch('backend.src.controllers.auth.controllers.get_user_via_uid')
+    def test_refresh_success(self, mocked_user, mocked_revoked):
+        """
+        Ensure refresh tokens can be swapped for new tokens once.
+        """
+        mocked_user.return_value = [[-1, "username@fakemail.noshow", "username", "apassword", 1, "http://image.fake"]]
+        mocked_revoked.claim.return_value = True
+        refresh_token = gen_session_tokens(-1, "username")["refresh_token"]
+        res = self.test_client.post(
+            "/api/v1/auth/refresh",
+            json={"refresh_token": refresh_token},
+            follow_redirects=True
+        )
+        self.assertEqual(200, res.status_code)
+        self.assertIn("access_token", json.loads(res.data))
+        jti = jwt.decode(refresh_token, JWT_SECRET, algorithms=['HS256'])["jti"]
+        self.assertEqual(jti, mocked_revoked.claim.call_args[0][0])
+        mocked_user.assert_called_once_with(-1)
+
+    @mock.patch('backend.src.controllers.auth.controllers.REVOKED_TOKENS')
+    def test_refresh_fail_revoked(self, mocked_revoked):
+        """
+        Ensure revoked refresh tokens can't be used.
+        """
+        mocked_revoked.claim.return_value = False
+        res = self.test_client.post(
+            "/api/v1/auth/refresh",
+            json={"refresh_token": gen_session_tokens(-1, "username")["refresh_token"]},
+            follow_redirects=True
+        )
+        self.assertEqual(401, res.status_code)
+
+    @mock.patch('backend.src.controllers.auth.controllers.get_user_via_uid')
+    @mock.patch('backend.src.models.auth.query')
+    def test_refresh_fail_already_claimed(self, mocked_query, mocked_user):
+        """
+        Ensure a refresh token used by another request is rejected before
+        new tokens are issued.
+        """
+        mocked_query.side_effect = IntegrityError
+        res = self.test_client.post(
+            "/api/v1/auth/refresh",
+            json={"refresh_token": gen_session_tokens(-1, "username")["refresh_token"]},
+            follow_redirects=True
+        )
+        self.assertEqual(401, res.status_code)
+        self.assertTrue(mocked_query.call_args[0][0].startswith("INSERT INTO"))
+        mocked_user.assert_not_called()
+
+    def test_refresh_fail_bad_claims(self):
+        """
+        Ensure refresh tokens with malformed claims are rejected.
+        """
+        for payload in (
+                {"type": "refresh", "uid": -1, "jti": "a", "exp": "soon"},
+                {"type": "refresh", "uid": -1},
+        ):
+            res = self.test_client.post(
+                "/api/v1/auth/refresh",
+                json={"refresh_token": jwt.encode(payload, JWT_SECRET, algorithm='HS256').decode()},
+                follow_redirects=True
+            )
+            self.assertEqual(401, res.status_code)
+
+    def test_refresh_fail_access_token(self):
+        """
+        Ensure access tokens can't be used as refresh tokens.
+        """
+        res = self.test_client.post(
+            "/api/v1/auth/refresh",
+            json={"refresh_token": gen_session_tokens(-1, "username")["access_token"]},
+            follow_redirects=True
+        )
+        self.assertEqual(401, res.status_code)
+
+    @mock.patch('backend.src.controllers.auth.controllers.REVOKED_TOKENS')
+    def test_logout_success_stateless(self, mocked_revoked):
+        """
+        Ensure stateless logouts revoke the access token instead of deleting a login.
+        """
+        tokens = gen_session_tokens(-2, "username2")
+        access_token = jwt.decode(tokens["access_token"], JWT_SECRET, algorithms=['HS256'])
+        with mock.patch('backend.src.controllers.auth.controllers.delete_login') as mocked_delete:
+            with mock.patch('backend.src.middleware.auth_required.verify_and_refresh') as mock_token:
+                mock_token.return_value = access_token
+                res = self.test_client.post(
+                    "/api/v1/auth/logout",
+                    json={"refresh_token": tokens["refresh_token"]},
+                    headers={'Authorization': 'Bearer ' + tokens["access_token"]},
+                    follow_redirects=True
+                )
+                self.assertEqual(200, res.status_code)
+                mocked_delete.assert_not_called()
+                self.assertEqual(2, mocked_revoked.revoke.call_count)
+                mocked_revoked.revoke.assert_any_call(access_token["jti"], access_token["exp"])
+
+
+class TokenCacheTests(unittest.TestCase):
+    """
+    Unit tests for the validated access_token cache.
+    """
+    def setUp(self):
+        TOKEN_CACHE.clear()
+        self.addCleanup(TOKEN_CACHE.clear)
+        self.token = jwt.encode(
+            {"uid": 1}, JWT_SECRET, algorithm='HS256'
+        ).decode()
+
+    def test_least_recently_used_evicted(self):
+        """
+        Ensure the cache is bounded & evicts the least recently used token.
+        """
+        cache = TokenCache(size=2, ttl=60)
+        cache.put("a", 1, None)
+        cache.put("b", 2, None)
+        cache.get("a")
+        cache.put("c", 3, None)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((1, None), cache.get("a"))
+        self.assertEqual(1, cache.metrics()["evictions"])
+
+    def test_entries_expire(self):
+        """
+        Ensure tokens are read from the DB again after the ttl.
+        """
+        cache = TokenCache(size=2, ttl=60)
+        cache.put("a", 1, None)
+        with mock.patch('backend.src.utils.token_cache.time.monotonic') as mock_time:
+            mock_time.return_value = 10 ** 9
+            self.assertIsNone(cache.get("a"))
+
+    def test_discard_user(self):
+        """
+        Ensure all of a user's tokens can be revoked.
+        """
+        cache = TokenCache(size=3, ttl=60)
+        cache.put("a", 1, None)
+        cache.put("b", 1, None)
+        cache.put("c", 2, None)
+        cache.discard_user(1)
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((2, None), cache.get("c"))
+
+    @mock.patch('backend.src.models.auth.query')
+    def test_verify_and_refresh_cached(self, mocked_query):
+        """
+        Ensure a recently validated token is accepted without querying the DB.
+        """
+        mocked_query.return_value = [(1, self.token, datetime.datetime.utcnow())]
+        self.assertEqual({"uid": 1}, verify_and_refresh(self.token))
+        self.assertEqual({"uid": 1}, verify_and_refresh(self.token))
+        self.assertEqual(1, mocked_query.call_count)
+
+    @mock.patch('backend.src.models.auth.query')
+    def test_login_looked_up_by_digest(self, mocked_query):
+        """
+        Ensure logins are found via the indexed token digest.
+        """
+        mocked_query.return_value = [(1, self.token, datetime.datetime.utcnow())]
+        verify_and_refresh(self.token)
+        sql, args = mocked_query.call_args[0][:2]
+        self.assertIn("token_digest = %s", sql)
+        self.assertEqual((token_digest(self.token), 1), args)
+        self.assertEqual(64, len(args[0]))
+
+    @mock.patch('backend.src.models.auth.query')
+    def test_refresh_written_once(self, mocked_query):
+        """
+        Ensure a token due a refresh is only written to the DB once.
+        """
+        time_issued = datetime.datetime.utcnow() - datetime.timedelta(days=6)
+        mocked_query.return_value = [(1, self.token, time_issued)]
+        verify_and_refresh(self.token)
+        verify_and_refresh(self.token)
+        self.assertEqual(2, mocked_query.call_count)
+        self.assertTrue(mocked_query.call_args[0][0].startswith("UPDATE Logins"))
+
+    @mock.patch('backend.src.models.auth.after_commit')
+    @mock.patch('backend.src.models.auth.query')
+    def test_refresh_cached_after_commit(self, mocked_query, mocked_after):
+        """
+        Ensure a refreshed login is only cached once its transaction commits.
+        """
+        now = datetime.datetime.utcnow()
+        refresh_login(now, 1, self.token)
+        mocked_query.assert_called_once()
+        self.assertIsNone(TOKEN_CACHE.get(self.token))
+        mocked_after.call_args[0][0]()
+        self.assertEqual((1, now), TOKEN_CACHE.get(self.token))
+
+    @mock.patch('backend.src.models.auth.query')
+    def test_logout_invalidates(self, mocked_query):
+        """
+        Ensure deleted logins are no longer served from the cache.
+        """
+        mocked_query.return_value = [(1, self.token, datetime.datetime.utcnow())]
+        verify_and_refresh(self.token)
+        delete_login(self.token)
+        mocked_query.return_value = []
+        with self.assertRaises(NoResults):
+            verify_and_refresh(self.token)
+
+
+class StatelessTokenTests(unittest.TestCase):
+    """
+    Unit tests for stateless access_tokens.
+    """
+    def setUp(self):
+        REVOKED_TOKENS.clear()
+        self.addCleanup(REVOKED_TOKENS.clear)
+        self.tokens = gen_session_tokens(1, "username")
+
+    @mock.patch('backend.src.models.auth.query')
+    def test_verified_without_logins(self, mocked_query):
+        """
+        Ensure stateless tokens are verified without looking up a login.
+        """
+        mocked_query.return_value = []
+        user = verify_and_refresh(self.tokens["access_token"])
+        self.assertEqual(1, user["uid"])
+        for call in mocked_query.call_args_list:
+            self.assertNotIn("Logins", call[0][0])
+
+    @mock.patch('backend.src.models.auth.query')
+    def test_revoked_token_rejected(self, mocked_query):
+        """
+        Ensure revoked tokens are rejected.
+        """
+        mocked_query.return_value = []
+        user = verify_and_refresh(self.tokens["access_token"])
+        REVOKED_TOKENS.revoke(user["jti"], user["exp"])
+        with self.assertRaises(ValueError):
+            verify_and_refresh(self.tokens["access_token"])
+
+    @mock.patch('backend.src.models.auth.query')
+    def test_revocations_loaded_from_db(self, mocked_query):
+        """
+        Ensure tokens revoked by other processes are loaded from the DB.
+        """
+        user = jwt.decode(
+            self.tokens["access_token"], JWT_SECRET, algorithms=['HS256']
+        )
+        mocked_query.return_value = [(
+            user["jti"],
+            datetime.datetime.utcfromtimestamp(user["exp"]),
+            datetime.datetime.utcnow()
+        )]
+        with self.assertRaises(ValueError):
+            verify_and_refresh(self.tokens["access_token"])
+
+    @mock.patch('backend.src.models.auth.query')
+    def test_claim_only_once(self, mocked_query):
+        """
+        Ensure a single use token can only be claimed once, whether it was
+        claimed in this process or another.
+        """
+        self.assertTrue(REVOKED_TOKENS.claim("a", 2 ** 31))
+        self.assertFalse(REVOKED_TOKENS.claim("a", 2 ** 31))
+        self.assertEqual(1, mocked_query.call_count)
+
+        mocked_query.side_effect = IntegrityError
+        self.assertFalse(REVOKED_TOKENS.claim("b", 2 ** 31))
+        mocked_query.side_effect = None
+        mocked_query.return_value = []
+        self.assertTrue(REVOKED_TOKENS.is_revoked("b"))
+
+    def test_expired_token_rejected(self):
+        """
+        Ensure expired tokens are rejected without a DB lookup.
+        """
+        token = jwt.encode(
+            {"uid": 1, "jti": "a", "type": "access", "exp": 1},
+            JWT_SECRET, algorithm='HS256'
+        ).decode()
+        with self.assertRaises(ValueError):
+            verify_and_refresh(token)
+
+    def test_refresh_token_rejected(self):
+        """
+        Ensure refresh tokens can't be used as access tokens.
+        """
+        with mock.patch.object(REVOKED_TOKENS, "sync"):
+            with self.assertRaises(ValueError):
+                verify_and_refresh(self.tokens["refresh_token"])
@@ -4,11 +4,15 @@ Test suite for /s3 endpoints.
 """
 import unittest
 import json
+import boto3
 import mock
+from moto import mock_aws
 
 from jwt.exceptions import InvalidSignatureError
 
 from ..src import APP
+from ..src.config import AWS_CREDS, MAX_SIGNED_FORM_POSTS
+from ..src.utils.s3_client import get_s3_client, clear_s3_client
 from .constants import TEST_TOKEN, MOCKED_TOKEN
 
 
@@ -30,7 +34,7 @@ class S3Tests(unittest.TestCase):
     def setUp(self):
         self.test_client = APP.test_client(self)
 
-    @mock.patch("backend.src.controllers.s3.controllers.boto3.client")
+    @mock.patch("backend.src.controllers.s3.controllers.get_s3_client")
     def test_signed_form_post_success(self, mock_url):
         """
         Ensure reading from the S3 bucket behave correctly.
@@ -328,3 +332,115 @@ class S3Tests(unittest.TestCase):
                 follow_redirects=True
             )
             self.assertEqual(500, res.status_code)
+
+    @mock.patch("backend.src.controllers.s3.controllers.get_s3_client")
+    def test_signed_form_posts_success(self, mock_url):
+        """
+        Ensure every file in a batch is signed, in order.
+        """
+        mock_url.return_value = MockBoto3Client()
+        test_req_data = {
+            "dir": "audio",
+            "files": [
+                {"fileName": "kick.wav", "fileType": "audio/wav"},
+                {"fileName": "snare.wav", "fileType": "audio/wav"},
+            ]
+        }
+        with mock.patch('backend.src.middleware.auth_required.verify_and_refresh') as mock_token:
+            mock_token.return_value = MOCKED_TOKEN
+            res = self.test_client.post(
+                "/api/v1/s3/signed-form-posts",
+                json=test_req_data,
+                headers={'Authorization': 'Bearer ' + TEST_TOKEN},
+                follow_redirects=True
+            )
+            self.assertEqual(200, res.status_code)
+            expected_body = {
+                "message": "Signed urls for file uploading have been provided",
+                "signed_urls": ['http://fake.url', 'http://fake.url']
+            }
+            self.assertEqual(expected_body, json.loads(res.data))
+
+    def test_signed_form_posts_fail_too_many_files(self):
+        """
+        Ensure batches larger than MAX_SIGNED_FORM_POSTS are rejected.
+        """
+        test_req_data = {
+            "dir": "audio",
+            "files": [
+                {"fileName": str(i) + ".wav", "fileType": "audio/wav"}
+                for i in range(MAX_SIGNED_FORM_POSTS + 1)
+            ]
+        }
+        with mock.patch('backend.src.middleware.auth_required.verify_and_refresh') as mock_token:
+            mock_token.return_value = MOCKED_TOKEN
+            res = self.test_client.post(
+                "/api/v1/s3/signed-form-posts",
+                json=test_req_data,
+                headers={'Authorization': 'Bearer ' + TEST_TOKEN},
+                follow_redirects=True
+            )
+            self.assertEqual(422, res.status_code)
+
+    def test_signed_form_posts_fail_missing_file_type(self):
+        """
+        Ensure every file in a batch needs a fileType.
+        """
+        test_req_data = {
+            "dir": "audio",
+            "files": [{"fileName": "kick.wav"}]
+        }
+        with mock.patch('backend.src.middleware.auth_required.verify_and_refresh') as mock_token:
+            mock_token.return_value = MOCKED_TOKEN
+            res = self.test_client.post(
+                "/api/v1/s3/signed-form-posts",
+                json=test_req_data,
+                headers={'Authorization': 'Bearer ' + TEST_TOKEN},
+                follow_redirects=True
+            )
+            self.assertEqual(422, res.status_code)
+
+    @mock_aws
+    def test_signed_form_posts_against_moto(self):
+        """
+        Ensure the presigned posts are valid for an S3 stand-in, & the
+        client is built once for many requests.
+        """
+        clear_s3_client()
+        self.addCleanup(clear_s3_client)
+        creds = mock.patch.dict(AWS_CREDS, {
+            'AWSAccessKeyId': 'testing',
+            'AWSSecretAccessKey': 'testing',
+            'Bucket': 'musicloud-test',
+        })
+        creds.start()
+        self.addCleanup(creds.stop)
+        boto3.client("s3", region_name="us-east-1").create_bucket(
+            Bucket=AWS_CREDS['Bucket']
+        )
+        test_req_data = {
+            "dir": "audio",
+            "files": [{"fileName": "kick.wav", "fileType": "audio/wav"}]
+        }
+        with mock.patch('backend.src.middleware.auth_required.verify_and_refresh') as mock_token:
+            mock_token.return_value = MOCKED_TOKEN
+            with mock.patch(
+                    "backend.src.utils.s3_client.boto3.client",
+                    wraps=boto3.client
+            ) as mock_client:
+                for _ in range(2):
+                    res = self.test_client.post(
+                        "/api/v1/s3/signed-form-posts",
+                        json=test_req_data,
+                        headers={'Authorization': 'Bearer ' + TEST_TOKEN},
+                        follow_redirects=True
+                    )
+                    self.assertEqual(200, res.status_code)
+                mock_client.assert_called_once()
+        signed = json.loads(res.data)["signed_urls"][0]
+        self.assertEqual(
+            "audio/" + MOCKED_TOKEN["username"] + "/kick.wav",
+            signed["fields"]["key"]
+        )
+        self.assertEqual("audio/wav", signed["fields"]["Content-Type"])
+        self.assertIs(get_s3_client(), get_s3_client())
@@ -13,6 +13,9 @@ from argon2.exceptions import VerifyMismatchError
 
 from ..src import APP
 from ..src.models.errors import NoResults
+from ..src.models.users import (
+    fan_out_song, backfill_timeline, post_follow, stream_notification_audience
+)
 from .constants import TEST_TOKEN, MOCKED_TOKEN, ALT_MOCKED_TOKEN
 
 
@@ -285,6 +288,10 @@ class UserTests(unittest.TestCase):
         self.assertEqual(409, res.status_code)
 
     @mock.patch('backend.src.controllers.users.controllers.get_user_via_email')
+    @mock.patch(
+        'backend.src.controllers.users.controllers.get_verification',
+        mock.MagicMock(return_value=[])
+    )
     def test_reverify_success(self, mocked_user):
         """
         Ensure resending of the verification email is working.
@@ -357,6 +364,10 @@ class UserTests(unittest.TestCase):
 
     @mock.patch('backend.src.controllers.users.controllers.get_user_via_username')
     @mock.patch('backend.src.controllers.users.controllers.get_following_pair')
+    @mock.patch(
+        'backend.src.controllers.users.controllers.get_dids_for_a_user',
+        mock.MagicMock(return_value=[])
+    )
     def test_follow_success(self, mocked_followers, mocked_user):
         """
         Ensure following is successful.
@@ -495,6 +506,10 @@ class UserTests(unittest.TestCase):
 
     @mock.patch('backend.src.controllers.users.controllers.get_user_via_username')
     @mock.patch('backend.src.controllers.users.controllers.get_following_pair')
+    @mock.patch(
+        'backend.src.controllers.users.controllers.post_unfollow',
+        mock.MagicMock()
+    )
     def test_unfollow_success(self, mocked_followers, mocked_user):
         """
         Ensure unfollowing is successful.
@@ -611,24 +626,12 @@ class UserTests(unittest.TestCase):
             )
         self.assertEqual(401, res.status_code)
 
-    @mock.patch('backend.src.controllers.users.controllers.get_following_pair')
-    @mock.patch('backend.src.controllers.users.controllers.get_follower_count')
-    @mock.patch('backend.src.controllers.users.controllers.get_following_count')
-    @mock.patch('backend.src.controllers.users.controllers.get_song_count')
-    @mock.patch('backend.src.controllers.users.controllers.get_number_of_posts')
-    @mock.patch('backend.src.controllers.users.controllers.get_number_of_likes')
-    @mock.patch('backend.src.controllers.users.controllers.get_user_via_username')
-    def test_get_user_success(self, mocked_user, likes, posts, songs, following, follower, follow_status):  # pylint: disable=R0913
+    @mock.patch('backend.src.controllers.users.controllers.get_user_profile')
+    def test_get_user_success(self, mocked_profile):
         """
         Ensure getting a user's info is successful.
         """
-        likes.return_value = 5
-        posts.return_value = 4
-        songs.return_value = 3
-        following.return_value = 2
-        follower.return_value = 1
-        follow_status.return_value = []
-        mocked_user.return_value = [[-1, "username@fakemail.noshow", "username", "apassword", 0, "http://image.fake", 0, 0, 0, 0]]
+        mocked_profile.return_value = [[-1, "username", "http://image.fake", 0, 0, 0, 0, 1, 2, 3, 4, 5, 0]]
         test_req_data = {
             "username": "username",
         }
@@ -733,7 +736,7 @@ class UserTests(unittest.TestCase):
             )
             self.assertEqual(422, res.status_code)
 
-    @mock.patch('backend.src.controllers.users.controllers.get_user_via_username')
+    @mock.patch('backend.src.controllers.users.controllers.get_user_profile')
     def test_get_user_fail_bad_username(self, mocked_user):
         """
         Ensure getting a user's info fails if a user sends a nonexistent username.
@@ -1107,17 +1110,19 @@ class UserTests(unittest.TestCase):
             "message": "A message",
         }
         with mock.patch('backend.src.controllers.users.controllers.make_post'):
-            with mock.patch('backend.src.middleware.auth_required.verify_and_refresh') as mock_token:
-                mock_token.return_value = ALT_MOCKED_TOKEN
-                res = self.test_client.post(
-                    "/api/v1/users/post",
-                    json=test_req_data,
-                    headers={'Authorization': 'Bearer ' + TEST_TOKEN},
-                    follow_redirects=True
-                )
-                self.assertEqual(200, res.status_code)
-                expected_body = {'message': 'Message posted.'}
-                self.assertEqual(expected_body, json.loads(res.data))
+            with mock.patch('backend.src.controllers.users.controllers.stream_notification_audience') as mock_audience:
+                mock_audience.return_value = iter([])
+                with mock.patch('backend.src.middleware.auth_required.verify_and_refresh') as mock_token:
+                    mock_token.return_value = ALT_MOCKED_TOKEN
+                    res = self.test_client.post(
+                        "/api/v1/users/post",
+                        json=test_req_data,
+                        headers={'Authorization': 'Bearer ' + TEST_TOKEN},
+                        follow_redirects=True
+                    )
+                    self.assertEqual(200, res.status_code)
+                    expected_body = {'message': 'Message posted.'}
+                    self.assertEqual(expected_body, json.loads(res.data))
 
     def test_post_fail_missing_access_token(self):
         """
@@ -2660,6 +2665,60 @@ class UserTests(unittest.TestCase):
             )
             self.assertEqual(422, res.status_code)
 
+    @mock.patch('backend.src.models.users.query')
+    def test_fan_out_song_selects_public_songs(self, mocked_query):
+        """
+        Ensure published songs reach timelines even without a published
+        timestamp, as they did in the old feed.
+        """
+        fan_out_song(5)
+        sql, args = mocked_query.call_args[0]
+        self.assertEqual((5, 5), args)
+        self.assertIn("public=1", sql)
+        self.assertIn("COALESCE(published, created)", sql)
+        self.assertNotIn("published IS NOT NULL", sql)
+
+    @mock.patch('backend.src.models.users.query')
+    def test_backfill_timeline_selects_public_songs(self, mocked_query):
+        """
+        Ensure a new follower gets the user's posts & every public song.
+        """
+        backfill_timeline(1, 2)
+        sql, args = mocked_query.call_args[0]
+        self.assertEqual((1, 2, 1, 2), args)
+        self.assertIn("FROM Posts WHERE uid=%s", sql)
+        self.assertIn("public=1", sql)
+        self.assertNotIn("published IS NOT NULL", sql)
+
+    @mock.patch('backend.src.models.users.add_to_audience')
+    @mock.patch('backend.src.models.users.update_user_stats')
+    @mock.patch('backend.src.models.users.backfill_timeline')
+    @mock.patch('backend.src.models.users.query')
+    def test_follow_backfills_timeline(self, mocked_query, mocked_backfill,
+                                       mocked_stats, mocked_audience):
+        """
+        Ensure following a user backfills the follower's timeline.
+        """
+        post_follow(1, 2)
+        mocked_query.assert_called_once()
+        mocked_backfill.assert_called_once_with(1, 2)
+        self.assertEqual(2, mocked_stats.call_count)
+        mocked_audience.assert_called_once()
+
+    @mock.patch('backend.src.models.users.query')
+    def test_notification_audience_read_in_chunks(self, mocked_query):
+        """
+        Ensure the audience is read a keyset paged chunk at a time, on the
+        request's connection.
+        """
+        mocked_query.side_effect = [[("a",), ("b",)], [("c",)]]
+        chunks = list(stream_notification_audience(1, "post", 2))
+        self.assertEqual([["a", "b"], ["c"]], chunks)
+        self.assertEqual(
+            [(1, "post", "", 2), (1, "post", "b", 2)],
+            [call[0][1] for call in mocked_query.call_args_list]
+        )
+
     def test_patch_notification_status_success(self):
         """
         Ensure editing a user's notification preferences works.
@@ -2890,6 +2949,10 @@ class UserTests(unittest.TestCase):
             )
             self.assertEqual(422, res.status_code)
 
+    @mock.patch(
+        'backend.src.controllers.users.controllers.update_silence_post_notificaitons',
+        mock.MagicMock()
+    )
     def test_patch_post_notification_status_success(self):
         """
         Ensure editing a user's post notification preferences works.
@@ -3007,6 +3070,10 @@ class UserTests(unittest.TestCase):
             )
             self.assertEqual(422, res.status_code)
 
+    @mock.patch(
+        'backend.src.controllers.users.controllers.update_silence_like_notificaitons',
+        mock.MagicMock()
+    )
     def test_patch_like_notification_status_success(self):
         """
         Ensure editing a user's like notification preferences works.
@@ -3122,6 +3189,10 @@ class UserTests(unittest.TestCase):
             )
             self.assertEqual(422, res.status_code)
 
+    @mock.patch(
+        'backend.src.controllers.users.controllers.update_silence_song_notificaitons',
+        mock.MagicMock()
+    )
     def test_patch_song_notification_status_success(self):
         """
         Ensure editing a user's song notification preferences works.
@@ -0,0 +1,858 @@
+# pylint: disable=C0302, C0301, R0904
+"""
+Test suite for the utils & middleware shared by every blueprint.
+"""
+import unittest
+import datetime
+import json
+import logging
+import smtplib
+import threading
+import jsonschema
+import mock
+
+from mysql.connector.errors import (
+    InterfaceError, OperationalError, PoolError, ProgrammingError
+)
+
+from ..src import APP, warm_up
+from ..src.utils.db_pool import ConnectionPool, POOL
+from ..src.utils.query import query, query_many, transaction, after_commit
+from ..src.utils.query_stats import reset_request_stats, get_request_stats
+from ..src.utils.request_metrics import RequestMetrics
+from ..src.schemas import VALIDATORS, USERS_SCHEMAS
+from ..src.utils.dispatch_queue import DispatchQueue
+from ..src.utils.notification_outbox import OutboxDrainer
+from ..src.utils.notification_sender import NOTIFICATION_OUTBOX
+from ..src.utils.mail_queue import MailQueue
+from ..src.utils.logger import (
+    log, EventRateLimiter, JSONFormatter, DroppingQueueHandler
+)
+
+
+class WarmUpTests(unittest.TestCase):
+    """
+    Unit tests for warming up a worker as the app is created.
+    """
+    @mock.patch('backend.src.log')
+    @mock.patch('backend.src.NOTIFICATION_OUTBOX')
+    @mock.patch('backend.src.get_s3_client')
+    @mock.patch('backend.src.POOL')
+    def test_failed_step_is_skipped(self, mock_pool, mock_s3, mock_outbox,
+                                    mock_log):
+        """
+        Ensure a failing step is logged & doesn't stop the others.
+        """
+        mock_s3.side_effect = ValueError("No credentials")
+        timings = warm_up()
+        self.assertIsNone(timings["s3_client"])
+        self.assertIsNotNone(timings["db_pool"])
+        mock_pool.warm.assert_called_once()
+        mock_outbox.start.assert_called_once()
+        self.assertEqual("warning", mock_log.call_args_list[0][0][0])
+
+    @mock.patch('backend.src.log')
+    @mock.patch('backend.src.NOTIFICATION_OUTBOX')
+    @mock.patch('backend.src.get_s3_client')
+    @mock.patch('backend.src.POOL')
+    def test_db_down_logged_once(self, mock_pool, mock_s3, mock_outbox,
+                                 mock_log):
+        """
+        Ensure an unreachable DB skips the steps needing it & is logged as
+        one warning without a traceback.
+        """
+        mock_pool.warm.side_effect = InterfaceError("No database")
+        timings = warm_up()
+        self.assertIsNone(timings["db_pool"])
+        self.assertIsNone(timings["notification_outbox"])
+        mock_s3.assert_called_once()
+        mock_outbox.start.assert_not_called()
+        warnings = [
+            call for call in mock_log.call_args_list if call[0][0] == "warning"
+        ]
+        self.assertEqual(1, len(warnings))
+        self.assertNotIn("Traceback", warnings[0][0][2])
+
+
+class MockConnection:   # pylint: disable=R0903
+    """
+    A fake MySQL connection for mocking in tests.
+    """
+    def __init__(self):
+        self.autocommit = False
+        self.in_transaction = False
+        self.closed = False
+        self.healthy = True
+
+    def ping(self, reconnect=False):  # pylint: disable=W0613
+        """
+        Mocked ping func
+        """
+        if not self.healthy:
+            raise InterfaceError("Connection lost")
+
+    def rollback(self):
+        """
+        Mocked rollback func
+        """
+        self.in_transaction = False
+
+    def close(self):
+        """
+        Mocked close func
+        """
+        self.closed = True
+
+
+class PoolTests(unittest.TestCase):
+    """
+    Unit tests for the MySQL connection pool.
+    """
+    def setUp(self):
+        patcher = mock.patch(
+            'backend.src.utils.db_pool.mysql.connector.connect',
+            side_effect=lambda **kwargs: MockConnection()
+        )
+        self.mock_connect = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = ConnectionPool(
+            {}, size=2, timeout=0.01, max_lifetime=60, ping_interval=30
+        )
+
+    def test_connections_are_reused(self):
+        """
+        Ensure released connections are handed out again.
+        """
+        cnx = self.pool.acquire()
+        self.assertTrue(cnx.autocommit)
+        self.pool.release(cnx)
+        self.assertIs(cnx, self.pool.acquire())
+        self.assertEqual(1, self.mock_connect.call_count)
+
+    def test_pool_exhausted(self):
+        """
+        Ensure the pool is bounded & counts exhaustion.
+        """
+        self.pool.acquire()
+        self.pool.acquire()
+        with self.assertRaises(PoolError):
+            self.pool.acquire()
+        metrics = self.pool.metrics()
+        self.assertEqual(1, metrics["exhausted"])
+        self.assertEqual(2, metrics["in_use"])
+
+    def test_discarded_connection_frees_slot(self):
+        """
+        Ensure broken connections are closed & replaced.
+        """
+        cnx = self.pool.acquire()
+        self.pool.acquire()
+        self.pool.release(cnx, discard=True)
+        self.assertTrue(cnx.closed)
+        self.assertIsNot(cnx, self.pool.acquire())
+        self.assertEqual(1, self.pool.metrics()["discarded"])
+
+    def test_old_connection_recycled(self):
+        """
+        Ensure connections past their max lifetime are recycled.
+        """
+        cnx = self.pool.acquire()
+        self.pool.release(cnx)
+        with mock.patch('backend.src.utils.db_pool.time.monotonic') as mock_time:
+            mock_time.return_value = 10 ** 9
+            new_cnx = self.pool.acquire()
+        self.assertIsNot(cnx, new_cnx)
+        self.assertTrue(cnx.closed)
+        self.assertEqual(1, self.pool.metrics()["recycled"])
+
+    def test_unhealthy_idle_connection_replaced(self):
+        """
+        Ensure idle connections failing a ping are replaced.
+        """
+        pool = ConnectionPool(
+            {}, size=1, timeout=0.01, max_lifetime=60, ping_interval=-1
+        )
+        cnx = pool.acquire()
+        cnx.healthy = False
+        pool.release(cnx)
+        self.assertIsNot(cnx, pool.acquire())
+        self.assertEqual(1, pool.metrics()["health_check_failures"])
+
+    def test_open_transaction_rolled_back_on_release(self):
+        """
+        Ensure connections are never returned mid transaction.
+        """
+        cnx = self.pool.acquire()
+        cnx.in_transaction = True
+        self.pool.release(cnx)
+        self.assertFalse(cnx.in_transaction)
+
+    def test_warm_opens_idle_connections(self):
+        """
+        Ensure warming opens connections up to the pool size & leaves them
+        idle for the first requests.
+        """
+        self.assertEqual(2, self.pool.warm(5))
+        self.assertEqual(2, self.mock_connect.call_count)
+        metrics = self.pool.metrics()
+        self.assertEqual(2, metrics["idle"])
+        self.assertEqual(0, metrics["in_use"])
+        self.pool.acquire()
+        self.pool.acquire()
+        self.assertEqual(2, self.mock_connect.call_count)
+
+
+class TransactionTests(unittest.TestCase):
+    """
+    Unit tests for the request scoped transaction helper.
+    """
+    def setUp(self):
+        self.cnx = mock.MagicMock()
+        self.cnx.cursor.return_value.lastrowid = 1
+        self.cnx.cursor.return_value.rowcount = 1
+        self.mock_pool = mock.MagicMock()
+        self.mock_pool.acquire.return_value = self.cnx
+        for name in ("acquire", "release"):
+            patcher = mock.patch.object(
+                POOL, name, getattr(self.mock_pool, name)
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_queries_share_one_connection(self):
+        """
+        Ensure a transaction borrows one connection & commits it once.
+        """
+        with transaction():
+            query("SELECT 1", ())
+            with transaction():
+                query("SELECT 2", ())
+        self.assertEqual(1, self.mock_pool.acquire.call_count)
+        self.cnx.start_transaction.assert_called_once_with()
+        self.cnx.commit.assert_called_once_with()
+        self.mock_pool.release.assert_called_once_with(self.cnx, False)
+
+    def test_exception_rolls_back(self):
+        """
+        Ensure the transaction isn't committed if the block raises.
+        """
+        with self.assertRaises(ValueError):
+            with transaction():
+                query("SELECT 1", ())
+                raise ValueError
+        self.cnx.commit.assert_not_called()
+        self.mock_pool.release.assert_called_once_with(self.cnx, False)
+
+    def test_failed_query_rolls_back(self):
+        """
+        Ensure a failed query inside a transaction is raised & nothing it
+        made is committed.
+        """
+        cursor = self.cnx.cursor.return_value
+        cursor.execute.side_effect = [
+            None, ProgrammingError("Bad query")
+        ]
+        with self.assertRaises(ProgrammingError):
+            with transaction():
+                query("INSERT INTO Posts VALUES (%s)", (1,))
+                query("SELECT nonsense", ())
+        self.cnx.commit.assert_not_called()
+        self.mock_pool.release.assert_called_once_with(self.cnx, False)
+
+    def test_failed_query_outside_transaction_swallowed(self):
+        """
+        Ensure a failed query outside a transaction is logged & returns None.
+        """
+        cursor = self.cnx.cursor.return_value
+        cursor.execute.side_effect = ProgrammingError(
+            "Bad query"
+        )
+        self.assertIsNone(query("SELECT nonsense", (), get_row=True))
+        self.mock_pool.release.assert_called_once_with(self.cnx, False)
+
+    def test_lost_connection_discarded(self):
+        """
+        Ensure a connection lost mid transaction isn't returned to the pool.
+        """
+        cursor = self.cnx.cursor.return_value
+        cursor.executemany.side_effect = OperationalError(
+            "Lost connection"
+        )
+        with self.assertRaises(OperationalError):
+            with transaction():
+                query_many("INSERT INTO Posts VALUES (%s)", [(1,)])
+        self.mock_pool.release.assert_called_once_with(self.cnx, True)
+
+    def test_unused_transaction_borrows_nothing(self):
+        """
+        Ensure a block without queries never touches the pool.
+        """
+        with transaction():
+            pass
+        self.mock_pool.acquire.assert_not_called()
+
+    def test_after_commit_waits_for_commit(self):
+        """
+        Ensure after_commit callbacks only run once the transaction commits.
+        """
+        called = []
+        with transaction():
+            query("SELECT 1", ())
+            after_commit(lambda: called.append(1))
+            self.assertEqual([], called)
+        self.assertEqual([1], called)
+
+        with self.assertRaises(ValueError):
+            with transaction():
+                query("SELECT 1", ())
+                after_commit(lambda: called.append(2))
+                raise ValueError
+        self.assertEqual([1], called)
+
+    def test_query_many_batches_rows(self):
+        """
+        Ensure query_many sends every row through one executemany call.
+        """
+        self.cnx.cursor.return_value.rowcount = 3
+        rows = [(1, 2), (3, 4), (5, 6)]
+        with transaction():
+            res = query_many("INSERT INTO Followers VALUES (%s, %s)", rows)
+        self.assertEqual(3, res)
+        self.cnx.cursor.return_value.executemany.assert_called_once_with(
+            "INSERT INTO Followers VALUES (%s, %s)", rows
+        )
+        self.cnx.commit.assert_called_once_with()
+
+    def test_query_many_without_rows(self):
+        """
+        Ensure an empty batch never touches the pool.
+        """
+        self.assertEqual(0, query_many("INSERT INTO Followers", []))
+        self.mock_pool.acquire.assert_not_called()
+
+
+class QueryStatsTests(unittest.TestCase):
+    """
+    Unit tests for the query instrumentation.
+    """
+    def setUp(self):
+        self.cnx = mock.MagicMock()
+        self.cnx.cursor.return_value.fetchall.return_value = [(1,), (2,)]
+        for name, value in (
+                ("acquire", mock.MagicMock(return_value=self.cnx)),
+                ("release", mock.MagicMock())
+        ):
+            patcher = mock.patch.object(POOL, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        reset_request_stats()
+
+    def test_request_aggregate(self):
+        """
+        Ensure every query is counted in the request aggregate.
+        """
+        query("SELECT 1", (), get_row=True)
+        query("SELECT 2", (), get_row=True)
+        stats = get_request_stats()
+        self.assertEqual(2, stats["queries"])
+        self.assertEqual(4, stats["rows"])
+
+    @mock.patch('backend.src.utils.query_stats.log')
+    @mock.patch('backend.src.utils.query_stats.SLOW_QUERY_MS', 0)
+    def test_slow_query_logged_with_caller(self, mocked_log):
+        """
+        Ensure slow queries are logged with the calling function.
+        """
+        query("SELECT 1", (), get_row=True)
+        level, event, message = mocked_log.call_args[0]
+        self.assertEqual("warning", level)
+        self.assertEqual("Slow query", event)
+        self.assertIn("test_slow_query_logged_with_caller", message)
+        self.assertIn('"rows": 2', message)
+
+    @mock.patch('backend.src.utils.query_stats.log')
+    def test_fast_query_not_logged(self, mocked_log):
+        """
+        Ensure queries under the threshold aren't logged.
+        """
+        query("SELECT 1", (), get_row=True)
+        mocked_log.assert_not_called()
+
+
+class DispatchQueueTests(unittest.TestCase):
+    """
+    Unit tests for the background dispatch queue.
+    """
+    def test_calls_run_on_workers(self):
+        """
+        Ensure queued calls are run off the calling thread.
+        """
+        threads = []
+        dispatch = DispatchQueue(
+            "Test", lambda: threads.append(threading.current_thread()), 2, 10
+        )
+        for _ in range(5):
+            self.assertTrue(dispatch.submit())
+        self.assertTrue(dispatch.join(timeout=5))
+        self.assertEqual(5, len(threads))
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertEqual(5, dispatch.metrics()["completed"])
+
+    @mock.patch('backend.src.utils.dispatch_queue.log')
+    def test_full_queue_rejects(self, mocked_log):
+        """
+        Ensure calls are dropped rather than blocking once the queue is full.
+        """
+        release = threading.Event()
+        dispatch = DispatchQueue("Test", release.wait, 1, 1)
+        dispatch.submit()
+        while dispatch.metrics()["busy_workers"] == 0:
+            pass
+        self.assertTrue(dispatch.submit())
+        self.assertFalse(dispatch.submit())
+        release.set()
+        self.assertTrue(dispatch.join(timeout=5))
+        metrics = dispatch.metrics()
+        self.assertEqual(1, metrics["rejected"])
+        self.assertEqual(2, metrics["completed"])
+        self.assertEqual("warning", mocked_log.call_args[0][0])
+
+    @mock.patch('backend.src.utils.dispatch_queue.log')
+    def test_failures_counted(self, mocked_log):
+        """
+        Ensure failing calls are logged & don't stop the worker.
+        """
+        dispatch = DispatchQueue("Test", lambda: 1 / 0, 1, 10)
+        dispatch.submit()
+        dispatch.submit()
+        self.assertTrue(dispatch.join(timeout=5))
+        self.assertEqual(2, dispatch.metrics()["failed"])
+        self.assertEqual(2, mocked_log.call_count)
+
+
+class OutboxDrainerTests(unittest.TestCase):
+    """
+    Unit tests for the notification outbox drainer.
+    """
+    def setUp(self):
+        self.sent = []
+        self.created = datetime.datetime.utcnow()
+        self.drainer = OutboxDrainer(
+            "Test", self.send, 100, 3, 5, 60, 2, 3600, 3, 30
+        )
+        self.mocks = {}
+        for name in (
+                "claim_outbox_notifications", "delete_outbox_notifications",
+                "retry_outbox_notifications", "count_outbox_notifications",
+                "log"
+        ):
+            patcher = mock.patch(
+                "backend.src.utils.notification_outbox." + name
+            )
+            self.mocks[name] = patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def send(self, message, dids, title, session):
+        """
+        Fake Pushy call, recording what would have been sent.
+        """
+        self.assertIsNotNone(session)
+        if "fail" in dids:
+            raise ValueError
+        self.sent.append((title, message, dids))
+
+    def row(self, nid, message, dids, attempts=0, coalesce=(None, None, None)):
+        """
+        Build an outbox row.
+        """
+        return (
+            nid, "New Like", message, json.dumps(dids), self.created, attempts
+        ) + coalesce
+
+    def test_same_message_sent_together(self):
+        """
+        Ensure rows with the same message are merged into chunked calls.
+        """
+        self.mocks["claim_outbox_notifications"].return_value = [
+            self.row(1, "a", ["d1", "d2"]),
+            self.row(2, "b", ["d1"]),
+            self.row(3, "a", ["d2", "d3"]),
+            self.row(4, "a", ["d4", "d5"]),
+        ]
+        self.assertEqual(4, self.drainer.drain())
+        self.assertEqual([
+            ("New Like", "a", ["d1", "d2", "d3"]),
+            ("New Like", "a", ["d4", "d5"]),
+            ("New Like", "b", ["d1"]),
+        ], self.sent)
+        self.mocks["delete_outbox_notifications"].assert_called_once_with(
+            [1, 3, 4, 2]
+        )
+        self.mocks["retry_outbox_notifications"].assert_not_called()
+        metrics = self.drainer.metrics()
+        self.assertEqual(4, metrics["sent"])
+        self.assertEqual(3, metrics["requests"])
+        self.assertGreaterEqual(metrics["max_lag"], 0)
+
+    def test_large_row_split_into_calls(self):
+        """
+        Ensure one row with more devices than fit in a call is split up.
+        """
+        self.mocks["claim_outbox_notifications"].return_value = [
+            self.row(1, "a", ["d1", "d2", "d3", "d4"]),
+        ]
+        self.drainer.drain()
+        self.assertEqual(
+            [["d1", "d2", "d3"], ["d4"]], [sent[2] for sent in self.sent]
+        )
+
+    def test_failed_rows_backed_off(self):
+        """
+        Ensure failed rows are retried with exponential backoff & dropped
+        once they run out of attempts.
+        """
+        self.mocks["claim_outbox_notifications"].return_value = [
+            self.row(1, "a", ["fail"]),
+            self.row(2, "b", ["fail"], attempts=1),
+            self.row(3, "c", ["fail"], attempts=2),
+            self.row(4, "d", ["d1"]),
+        ]
+        self.drainer.drain()
+        self.mocks["retry_outbox_notifications"].assert_has_calls(
+            [mock.call([1], 2), mock.call([2], 4)]
+        )
+        self.assertEqual(
+            [mock.call([4]), mock.call([3])],
+            self.mocks["delete_outbox_notifications"].call_args_list
+        )
+        metrics = self.drainer.metrics()
+        self.assertEqual(2, metrics["retried"])
+        self.assertEqual(1, metrics["dropped"])
+        self.assertEqual(3, metrics["failed_requests"])
+
+    def test_coalesced_rows_merged(self):
+        """
+        Ensure rows with the same coalesce_key go out as one notification.
+        """
+        summary = " liked your song: \"Song\""
+        self.mocks["claim_outbox_notifications"].return_value = [
+            self.row(1, "a liked", ["d1"], coalesce=("like:1", "a", summary)),
+            self.row(2, "b liked", ["d1"], coalesce=("like:1", "b", summary)),
+            self.row(3, "c liked", ["d1"], coalesce=("like:1", "c", summary)),
+            self.row(4, "a liked", ["d1"], coalesce=("like:1", "a", summary)),
+            self.row(5, "d liked", ["d2"], coalesce=("like:2", "d", summary)),
+            self.row(6, "e liked", ["d2"], coalesce=("like:2", "e", summary)),
+            self.row(7, "f liked", ["d3"], coalesce=("like:3", "f", summary)),
+        ]
+        self.drainer.drain()
+        self.assertEqual([
+            ("New Like", "c and 2 others" + summary, ["d1"]),
+            ("New Like", "e and d" + summary, ["d2"]),
+            ("New Like", "f liked", ["d3"]),
+        ], self.sent)
+        self.mocks["delete_outbox_notifications"].assert_called_once_with(
+            [1, 2, 3, 4, 5, 6, 7]
+        )
+
+    def test_empty_outbox(self):
+        """
+        Ensure draining an empty outbox sends nothing.
+        """
+        self.mocks["claim_outbox_notifications"].return_value = []
+        self.assertEqual(0, self.drainer.drain())
+        self.assertEqual([], self.sent)
+        self.mocks["delete_outbox_notifications"].assert_not_called()
+
+    def test_depth_counted(self):
+        """
+        Ensure the outbox depth is only reported once the drainer has
+        counted it.
+        """
+        self.mocks["count_outbox_notifications"].return_value = 12
+        self.assertIsNone(self.drainer.metrics()["depth"])
+        self.drainer.refresh_depth()
+        self.assertEqual(12, self.drainer.metrics()["depth"])
+        self.mocks["count_outbox_notifications"].assert_called_once_with()
+
+
+class MailQueueTests(unittest.TestCase):
+    """
+    Unit tests for the background mail queue.
+    """
+    SMTP_CONFIG = {
+        "server": "smtp.example.com",
+        "port": 587,
+        "starttls": True,
+        "user": "user",
+        "password": "password",
+        "timeout": 10,
+    }
+
+    @staticmethod
+    def make_smtp():
+        """
+        Build a fake SMTP connection that accepts every email.
+        """
+        smtp = mock.MagicMock()
+        smtp.mail.return_value = (250, b"OK")
+        smtp.rcpt.return_value = (250, b"OK")
+        smtp.data.return_value = (250, b"OK")
+        return smtp
+
+    @mock.patch('backend.src.utils.mail_queue.smtplib.SMTP')
+    def test_batch_sent_over_one_connection(self, mocked_smtp):
+        """
+        Ensure queued emails reuse one logged in connection.
+        """
+        smtp = mocked_smtp.return_value = self.make_smtp()
+        mail = MailQueue("Test", self.SMTP_CONFIG, 1, 10, 50, 30)
+        for i in range(3):
+            mail.submit("from@example.com", "to@example.com", str(i))
+        self.assertTrue(mail.join(timeout=5))
+        mocked_smtp.assert_called_once_with("smtp.example.com", 587, timeout=10)
+        smtp.starttls.assert_called_once_with()
+        smtp.login.assert_called_once_with("user", "password")
+        self.assertEqual(3, smtp.data.call_count)
+        metrics = mail.metrics()
+        self.assertEqual(3, metrics["completed"])
+        self.assertEqual(1, metrics["connections"])
+
+    @mock.patch('backend.src.utils.mail_queue.smtplib.SMTP')
+    def test_dropped_connection_reopened(self, mocked_smtp):
+        """
+        Ensure an email is retried on a new connection if the server closed
+        the old one before it was sent.
+        """
+        stale = self.make_smtp()
+        stale.mail.side_effect = smtplib.SMTPServerDisconnected
+        fresh = self.make_smtp()
+        mocked_smtp.side_effect = [stale, fresh]
+        mail = MailQueue("Test", self.SMTP_CONFIG, 1, 10, 50, 30)
+        mail.submit("from@example.com", "to@example.com", "Hi")
+        self.assertTrue(mail.join(timeout=5))
+        stale.data.assert_not_called()
+        fresh.data.assert_called_once_with("Hi")
+        self.assertEqual(1, mail.metrics()["completed"])
+
+    @mock.patch('backend.src.utils.mail_queue.log')
+    @mock.patch('backend.src.utils.mail_queue.smtplib.SMTP')
+    def test_disconnect_after_data_not_resent(self, mocked_smtp, mocked_log):
+        """
+        Ensure an email isn't sent twice if the connection drops once the
+        server may already have accepted it.
+        """
+        stale = self.make_smtp()
+        stale.data.side_effect = smtplib.SMTPServerDisconnected
+        fresh = self.make_smtp()
+        mocked_smtp.side_effect = [stale, fresh]
+        mail = MailQueue("Test", self.SMTP_CONFIG, 1, 10, 50, 30)
+        mail.submit("from@example.com", "to@example.com", "Hi")
+        mail.submit("from@example.com", "to@example.com", "Bye")
+        self.assertTrue(mail.join(timeout=5))
+        stale.data.assert_called_once_with("Hi")
+        fresh.data.assert_called_once_with("Bye")
+        metrics = mail.metrics()
+        self.assertEqual(1, metrics["failed"])
+        self.assertEqual(1, metrics["completed"])
+        self.assertEqual("error", mocked_log.call_args[0][0])
+
+    @mock.patch('backend.src.utils.mail_queue.log')
+    @mock.patch('backend.src.utils.mail_queue.smtplib.SMTP')
+    def test_failed_email_logged(self, mocked_smtp, mocked_log):
+        """
+        Ensure a refused email is counted as failed without stopping the
+        worker.
+        """
+        smtp = mocked_smtp.return_value = self.make_smtp()
+        smtp.rcpt.side_effect = [(550, b"No such user"), (250, b"OK")]
+        mail = MailQueue("Test", self.SMTP_CONFIG, 1, 10, 50, 30)
+        mail.submit("from@example.com", "bad@example.com", "Hi")
+        mail.submit("from@example.com", "to@example.com", "Hi")
+        self.assertTrue(mail.join(timeout=5))
+        metrics = mail.metrics()
+        self.assertEqual(1, metrics["failed"])
+        self.assertEqual(1, metrics["completed"])
+        self.assertEqual("error", mocked_log.call_args[0][0])
+
+
+class LoggerTests(unittest.TestCase):
+    """
+    Unit tests for the queued JSON logging pipeline.
+    """
+    @mock.patch('backend.src.utils.logger.random.random', return_value=0.5)
+    def test_rate_limit_per_event_name(self, _):
+        """
+        Ensure each event_name gets its own burst, & the next event logged
+        after a storm says how many were suppressed.
+        """
+        limiter = EventRateLimiter(0, 2, 0.01)
+        self.assertEqual(0, limiter.allow("Storm"))
+        self.assertEqual(0, limiter.allow("Storm"))
+        self.assertIsNone(limiter.allow("Storm"))
+        self.assertIsNone(limiter.allow("Storm"))
+        self.assertEqual(0, limiter.allow("Other"))
+        with mock.patch('backend.src.utils.logger.random.random', return_value=0):
+            self.assertEqual(2, limiter.allow("Storm"))
+        self.assertEqual({"logged": 4, "suppressed": 2}, limiter.metrics())
+
+    def test_json_lines(self):
+        """
+        Ensure events are formatted as valid single line JSON.
+        """
+        record = logging.LogRecord(
+            "test", logging.WARNING, __file__, 1, "%s: %s",
+            ("Bad 'input'", "line\nbreak"), None
+        )
+        record.event_name = "Bad 'input'"
+        record.event_message = "line\nbreak"
+        record.suppressed = 3
+        line = JSONFormatter().format(record)
+        self.assertNotIn("\n", line)
+        res = json.loads(line)
+        self.assertEqual("warning", res["level"])
+        self.assertEqual("Bad 'input'", res["event_name"])
+        self.assertEqual("line\nbreak", res["message"])
+        self.assertEqual(3, res["suppressed"])
+
+    def test_full_queue_drops(self):
+        """
+        Ensure logging never blocks on a full queue.
+        """
+        handler = DroppingQueueHandler(1)
+        record = logging.LogRecord(
+            "test", logging.ERROR, __file__, 1, "msg", (), None
+        )
+        handler.handle(record)
+        handler.handle(record)
+        self.assertEqual(1, handler.queue.qsize())
+        self.assertEqual(1, handler.dropped)
+
+    def test_invalid_level(self):
+        """
+        Ensure unknown log levels are rejected.
+        """
+        with self.assertRaises(ValueError):
+            log("loud", "Test", "message")
+
+
+class MetricsTests(unittest.TestCase):
+    """
+    Unit tests for the request metrics & the /metrics endpoint.
+    """
+    def setUp(self):
+        APP.config['TESTING'] = True
+        self.test_client = APP.test_client()
+
+    def test_histogram_buckets_cumulative(self):
+        """
+        Ensure latencies are counted in every bucket at or above them.
+        """
+        metrics = RequestMetrics()
+        for elapsed in (0.001, 0.02, 0.02, 20):
+            metrics.observe("audio", "/state", "GET", 200, elapsed, 0.001)
+        latency = metrics.metrics()["latency"][("audio", "/state", "GET")]
+        buckets = dict(latency["buckets"])
+        self.assertEqual(1, buckets[0.005])
+        self.assertEqual(3, buckets[0.025])
+        self.assertEqual(3, buckets[10.0])
+        self.assertEqual(4, buckets["+Inf"])
+        self.assertEqual(4, latency["count"])
+
+    @mock.patch(
+        'backend.src.controllers.metrics.controllers.METRICS_TOKEN', "secret"
+    )
+    @mock.patch(
+        'backend.src.utils.notification_outbox.count_outbox_notifications',
+        mock.MagicMock(return_value=7)
+    )
+    def test_metrics_exposition(self):
+        """
+        Ensure requests are recorded by route & status code and exposed with
+        the in process gauges.
+        """
+        NOTIFICATION_OUTBOX.refresh_depth()
+        self.test_client.get('/api/v1/audio/state?sid=1')
+        res = self.test_client.get(
+            '/metrics', headers={"Authorization": "Bearer secret"}
+        )
+        self.assertEqual(200, res.status_code)
+        self.assertTrue(res.content_type.startswith("text/plain"))
+        body = res.get_data(as_text=True)
+        self.assertIn(
+            'musicloud_http_requests_total{blueprint="audio",'
+            'route="/api/v1/audio/state",method="GET",status="401"}', body
+        )
+        self.assertIn(
+            'musicloud_http_request_duration_seconds_bucket{blueprint="audio",'
+            'route="/api/v1/audio/state",method="GET",le="+Inf"}', body
+        )
+        self.assertIn("musicloud_http_request_db_seconds_count", body)
+        self.assertIn("musicloud_db_pool_in_use ", body)
+        self.assertIn("musicloud_token_cache_hit_ratio ", body)
+        self.assertIn("musicloud_notification_outbox_depth 7\n", body)
+        self.assertIn("musicloud_mail_queue_depth ", body)
+
+    @mock.patch(
+        'backend.src.utils.notification_outbox.count_outbox_notifications'
+    )
+    @mock.patch(
+        'backend.src.controllers.metrics.controllers.METRICS_TOKEN', "secret"
+    )
+    def test_metrics_no_db_query(self, mocked_count):
+        """
+        Ensure scrapes read the outbox depth the drainer last counted instead
+        of counting it themselves.
+        """
+        res = self.test_client.get(
+            '/metrics', headers={"Authorization": "Bearer secret"}
+        )
+        self.assertEqual(200, res.status_code)
+        mocked_count.assert_not_called()
+
+    @mock.patch(
+        'backend.src.controllers.metrics.controllers.METRICS_TOKEN', "secret"
+    )
+    def test_metrics_token_required(self):
+        """
+        Ensure scrapes must send the metrics token once one is configured.
+        """
+        res = self.test_client.get('/metrics')
+        self.assertEqual(401, res.status_code)
+        res = self.test_client.get(
+            '/metrics', headers={"Authorization": "Bearer wrong"}
+        )
+        self.assertEqual(401, res.status_code)
+
+    @mock.patch(
+        'backend.src.controllers.metrics.controllers.METRICS_TOKEN', None
+    )
+    def test_metrics_disabled_without_token(self):
+        """
+        Ensure /metrics isn't served at all until a token is configured.
+        """
+        res = self.test_client.get('/metrics')
+        self.assertEqual(403, res.status_code)
+
+
+class ValidateBodyTests(unittest.TestCase):
+    """
+    Unit tests for the precompiled request body validators.
+    """
+    def test_every_schema_compiled(self):
+        """
+        Ensure every schema is in the registry under its blueprint's name.
+        """
+        for name in USERS_SCHEMAS:
+            self.assertIn("users." + name, VALIDATORS)
+
+    def test_error_matches_validate(self):
+        """
+        Ensure rejected bodies get the same message jsonschema.validate()
+        would raise.
+        """
+        body = {"email": "test@example.com", "username": ""}
+        with self.assertRaises(jsonschema.ValidationError) as ctx:
+            jsonschema.validate(body, USERS_SCHEMAS["register"])
+        res = APP.test_client().post("/api/v1/users", json=body)
+        self.assertEqual(422, res.status_code)
+        self.assertEqual(str(ctx.exception), res.get_json()["message"])
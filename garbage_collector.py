@@ -71,6 +71,32 @@ def main():
             "MINUTE)"
         )
         query(old_resets_removal_query, ())
+        expired_revocations_removal_query = (
+            "DELETE FROM Revoked_Tokens WHERE expires < UTC_TIMESTAMP()"
+        )
+        query(expired_revocations_removal_query, ())
+        like_count_reconciliation_query = (
+            "UPDATE Songs SET likes_count = ("
+            "SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid = Songs.sid"
+            ") WHERE likes_count <> ("
+            "SELECT COUNT(*) FROM Song_Likes WHERE Song_Likes.sid = Songs.sid"
+            ")"
+        )
+        query(like_count_reconciliation_query, ())
+        user_stats_reconciliation_query = (
+            "INSERT INTO User_Stats "
+            "(uid, followers, following, songs, posts, likes) "
+            "SELECT uid, "
+            "(SELECT COUNT(*) FROM Followers WHERE following=Users.uid), "
+            "(SELECT COUNT(*) FROM Followers WHERE follower=Users.uid), "
+            "(SELECT COUNT(*) FROM Songs WHERE uid=Users.uid AND public=1), "
+            "(SELECT COUNT(*) FROM Posts WHERE uid=Users.uid), "
+            "(SELECT COUNT(*) FROM Song_Likes WHERE uid=Users.uid) "
+            "FROM Users ON DUPLICATE KEY UPDATE "
+            "followers=VALUES(followers), following=VALUES(following), "
+            "songs=VALUES(songs), posts=VALUES(posts), likes=VALUES(likes)"
+        )
+        query(user_stats_reconciliation_query, ())
         print("Garbage collection successful")
     except Exception as exc:
         print("Garbage collection failed")
@@ -1,26 +1,145 @@
+import argparse
 import random
 import datetime
 import json
+import time
+from itertools import islice
 
 from argon2 import PasswordHasher
 
 from backend.src.models.users import (
-    insert_full_user_data, make_post, post_follow
+    insert_full_users, make_posts, post_follows, rebuild_timelines,
+    rebuild_notification_audience
 )
 from backend.src.models.audio import (
-    insert_full_song, post_like, insert_editor, insert_song_state
+    insert_full_folders, insert_full_songs, post_likes, insert_editors,
+    insert_song_states
 )
-from backend.src.utils import random_string
+from backend.src.utils import random_string, transaction
 
 
 HASHER = PasswordHasher()
 
+# Rows sent per multi-row INSERT. Larger batches mean fewer round trips but
+# must stay below the MySQL server's max_allowed_packet.
+DEFAULT_BATCH_SIZE = 5000
 
-def populate_users(number_of_users=1000, offset=0):
+PROFILER_URL = "https://dcumusicloudbucket.s3-eu-west-1.amazonaws.com/profilers/1.jpeg"
+SONG_URL = "https://dcumusicloudbucket.s3-eu-west-1.amazonaws.com/compiled_audio/-1.mp3"
+COVER_URL = "https://ak1.ostkcdn.com//images/products/is/images/direct/7b6c3256bfe728cf81c9be8ec0d56b62da59571e/Title-Unavailable.jpg"
+
+SONG_STATE = json.dumps({
+    "tempo": 400,
+    "tracks": [
+        {
+            '0': {
+                "volume": 0.1,
+                "mute": False,
+                "solo": False,
+                "pan": 0,
+                "name": 'Kick',
+                "samples": [
+                    {
+                        "id": 1,
+                        "time": 1,
+                        "url": '/static/media/kick.0bfa7d2f.wav',
+                        "duration": 0.5,
+                        "volume": 0.1,
+                        "track": 0,
+                        "buffer": {},
+                        "endTime": 5.341360544217687
+                    },
+                    {
+                        "id": 'MC40OTQ2MzU1',
+                        "time": 5,
+                        "url": '/static/media/kick.0bfa7d2f.wav',
+                        "duration": 0.5,
+                        "track": 0,
+                        "volume": 0.1,
+                        "buffer": {},
+                        "endTime": 5.9413605442176864
+                    },
+                    {
+                        "id": 'MC44NDMzNjU5',
+                        "time": 13,
+                        "url": '/static/media/kick.0bfa7d2f.wav',
+                        "duration": 0.5,
+                        "track": 0,
+                        "volume": 0.1,
+                        "buffer": {},
+                        "endTime": 7.141360544217687
+                    }
+                ]
+            }
+        }
+    ]
+})
+
+
+def random_datetime():
+    """
+    Get a random datetime between 1970 and 2019.
+    """
+    return datetime.datetime(
+        random.randrange(1970, 2020),
+        random.randrange(1, 13),
+        random.randrange(1, 29),
+        random.randrange(0, 24),
+        random.randrange(0, 60),
+        random.randrange(0, 60)
+    )
+
+
+def insert_in_batches(rows, insert_func, batch_size, label, total):
+    """
+    Feed rows to a batch insert model function, batch_size rows at a time,
+    each batch in its own transaction.
+    """
+    rows = iter(rows)
+    inserted = 0
+    start = time.perf_counter()
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        with transaction():
+            insert_func(batch)
+        inserted += len(batch)
+        print(str(inserted) + " out of " + str(total) + " " + label + " added.")
+    elapsed = time.perf_counter() - start
+    if elapsed:
+        print(
+            str(inserted) + " " + label + " in " + str(round(elapsed, 2))
+            + "s, " + str(int(inserted / elapsed)) + " rows/sec."
+        )
+
+
+def unique_pairs(start_a, end_a, start_b, end_b, number_of_pairs,
+                 allow_equal=True):
+    """
+    Yield number_of_pairs distinct random (a, b) pairs. Pass
+    allow_equal=False to skip pairs where a == b, eg. users following
+    themselves.
+    """
+    possible = (end_a - start_a) * (end_b - start_b)
+    if not allow_equal:
+        possible -= max(0, min(end_a, end_b) - max(start_a, start_b))
+    number_of_pairs = min(number_of_pairs, possible)
+    seen = set()
+    while len(seen) < number_of_pairs:
+        pair = (random.randrange(start_a, end_a), random.randrange(start_b, end_b))
+        if pair in seen or (not allow_equal and pair[0] == pair[1]):
+            continue
+        seen.add(pair)
+        yield pair
+
+
+def populate_users(number_of_users=1000, offset=0, batch_size=DEFAULT_BATCH_SIZE):
     """
-    Populates the user's table with randomly generated user's
+    Populates the user's table with randomly generated user's, uids run from
+    offset + 1 to offset + number_of_users. Each user gets a root folder with
+    the same ID as their uid.
     """
-    insertion_count = 1
     email_extensions = [
         "@gmail.com", "@hotmail.com", "@yahoo.com", "@outlook.com", "@gmail.co.uk", "@hotmail.co.uk",
         "@yahoo.co.uk", "@outlook.ie"
@@ -28,209 +147,137 @@ def populate_users(number_of_users=1000, offset=0):
     with open("names.txt") as f:
         names = f.readlines()
         names = [name.strip() for name in names]
-    while insertion_count < number_of_users:
-        try:
+    # Every user has the same password, so only pay for hashing it once.
+    password = HASHER.hash("1234")
+
+    def users():
+        usernames = set()
+        for uid in range(offset + 1, offset + number_of_users + 1):
             username = random.choice(names)
-            insert_full_user_data(
-                insertion_count + offset,
+            if username in usernames:
+                username += str(uid)
+            usernames.add(username)
+            yield (
+                uid,
                 username + random.choice(email_extensions),
                 username,
-                HASHER.hash("1234"),
+                password,
                 1,
-                "https://dcumusicloudbucket.s3-eu-west-1.amazonaws.com/profilers/1.jpeg"
+                PROFILER_URL,
+                uid,
             )
-            insertion_count += 1
-            print(str(insertion_count) + " out of " + str(number_of_users) + " users added.")
-        except:
-            continue
 
+    def insert_users(batch):
+        insert_full_folders([(user[0], None, "root") for user in batch])
+        insert_full_users(batch)
+
+    insert_in_batches(users(), insert_users, batch_size, "users", number_of_users)
 
-def populate_posts(start_uid, end_uid, number_of_posts=10000):
+
+def populate_posts(start_uid, end_uid, number_of_posts=10000, batch_size=DEFAULT_BATCH_SIZE):
     """
     Populate Posts table with random posts from random user's at random times.
     """
-    total = number_of_posts
-    while number_of_posts:
-        try:
-            uid = random.randrange(start_uid, end_uid)
-            message = random_string(32)
-            time_of_post = datetime.datetime(
-                random.randrange(1970, 2020),
-                random.randrange(1, 13),
-                random.randrange(1, 29),
-                random.randrange(0, 24),
-                random.randrange(0, 60),
-                random.randrange(0, 60)
-            )
-            make_post(uid, message, time_of_post)
-            number_of_posts -= 1
-            print(str(total - number_of_posts) + " out of " + str(total) + " posts added.")
-        except:
-            continue
+    posts = (
+        (random.randrange(start_uid, end_uid), random_string(32), random_datetime())
+        for _ in range(number_of_posts)
+    )
+    insert_in_batches(posts, make_posts, batch_size, "posts", number_of_posts)
 
 
-def populate_followers(start_uid, end_uid, number_of_followers=10000):
+def populate_followers(start_uid, end_uid, number_of_followers=10000, batch_size=DEFAULT_BATCH_SIZE):
     """
     Adds random follower pairings to the DB
     """
-    total = number_of_followers
-    follow_pairs = []
-    while number_of_followers:
-        uid_follower = random.randrange(start_uid, end_uid)
-        uid_following = random.randrange(start_uid, end_uid)
-        if (uid_follower, uid_following) in follow_pairs:
-            continue
-        try:
-            post_follow(uid_follower, uid_following)
-            number_of_followers -= 1
-            follow_pairs.append((uid_follower, uid_following))
-            print(str(total - number_of_followers) + " out of " + str(total) + " followers added.")
-        except:
-            continue
+    pairs = unique_pairs(
+        start_uid, end_uid, start_uid, end_uid, number_of_followers,
+        allow_equal=False
+    )
+    insert_in_batches(pairs, post_follows, batch_size, "followers", number_of_followers)
 
 
-def populate_songs(start_uid, end_uid, number_of_songs=1000, offset=0):
+def populate_songs(start_uid, end_uid, number_of_songs=1000, offset=0, batch_size=DEFAULT_BATCH_SIZE):
     """
-    Creates random song entries in the DB
+    Creates random song entries & their states in the DB, sids run from
+    offset + 1 to offset + number_of_songs.
     """
-    insertion_count = 1
     genres = ["rock", "pop", "blues", "jazz", "techno", "classical", "grime", "rap", "r&b", "funky", "disco"]
-    while insertion_count < number_of_songs:
-        try:
-            time_created = datetime.datetime(
-                random.randrange(1970, 2020),
-                random.randrange(1, 13),
-                random.randrange(1, 29),
-                random.randrange(0, 24),
-                random.randrange(0, 60),
-                random.randrange(0, 60)
-            )
-            url = "https://dcumusicloudbucket.s3-eu-west-1.amazonaws.com/compiled_audio/-1.mp3"
-            cover = "https://ak1.ostkcdn.com//images/products/is/images/direct/7b6c3256bfe728cf81c9be8ec0d56b62da59571e/Title-Unavailable.jpg"
-            insert_full_song(
-                insertion_count + offset,
+
+    def songs():
+        for sid in range(offset + 1, offset + number_of_songs + 1):
+            yield (
+                sid,
                 random.randrange(start_uid, end_uid),
-                "Test Song " + str(insertion_count),
+                "Test Song " + str(sid - offset),
                 155000,
-                time_created,
+                random_datetime(),
                 1,
-                url,
-                cover,
+                SONG_URL,
+                COVER_URL,
                 random.choice(genres)
             )
-            state = json.dumps({
-                "tempo": 400,
-                "tracks": [
-                    {
-                        '0': {
-                            "volume": 0.1,
-                            "mute": False,
-                            "solo": False,
-                            "pan": 0,
-                            "name": 'Kick',
-                            "samples": [
-                                {
-                                    "id": 1,
-                                    "time": 1,
-                                    "url": '/static/media/kick.0bfa7d2f.wav',
-                                    "duration": 0.5,
-                                    "volume": 0.1,
-                                    "track": 0,
-                                    "buffer": {},
-                                    "endTime": 5.341360544217687
-                                },
-                                {
-                                    "id": 'MC40OTQ2MzU1',
-                                    "time": 5,
-                                    "url": '/static/media/kick.0bfa7d2f.wav',
-                                    "duration": 0.5,
-                                    "track": 0,
-                                    "volume": 0.1,
-                                    "buffer": {},
-                                    "endTime": 5.9413605442176864
-                                },
-                                {
-                                    "id": 'MC44NDMzNjU5',
-                                    "time": 13,
-                                    "url": '/static/media/kick.0bfa7d2f.wav',
-                                    "duration": 0.5,
-                                    "track": 0,
-                                    "volume": 0.1,
-                                    "buffer": {},
-                                    "endTime": 7.141360544217687
-                                }
-                            ]
-                        }
-                    }
-                ]
-            })
-            insert_song_state(insertion_count + offset, state, time_created)
-            insertion_count += 1
-            print(
-                str(insertion_count) + " out of " + str(number_of_songs)
-                + " songs added."
-            )
-        except:
-            continue
 
+    def insert_songs(batch):
+        insert_full_songs(batch)
+        insert_song_states([(song[0], SONG_STATE, song[4]) for song in batch])
+
+    insert_in_batches(songs(), insert_songs, batch_size, "songs", number_of_songs)
 
-def populate_song_likes(start_uid, end_uid, start_sid, end_sid, number_of_song_likes=10000):
+
+def populate_song_likes(start_uid, end_uid, start_sid, end_sid, number_of_song_likes=10000,
+                        batch_size=DEFAULT_BATCH_SIZE):
     """
     Adds random Song Like pairings to the DB
     """
-    total = number_of_song_likes
-    like_pairs = []
-    while number_of_song_likes:
-        uid_liker = random.randrange(start_uid, end_uid)
-        sid_liked = random.randrange(start_sid, end_sid)
-        if (uid_liker, sid_liked) in like_pairs:
-            continue
-        try:
-            post_like(uid_liker, sid_liked)
-            number_of_song_likes -= 1
-            like_pairs.append((uid_liker, sid_liked))
-            print(str(total - number_of_song_likes) + " out of " + str(total) + " song likes added.")
-        except:
-            continue
+    pairs = unique_pairs(start_uid, end_uid, start_sid, end_sid, number_of_song_likes)
+    insert_in_batches(pairs, post_likes, batch_size, "song likes", number_of_song_likes)
 
 
-def populate_song_editors(start_uid, end_uid, start_sid, end_sid, number_of_song_editors=10000):
+def populate_song_editors(start_uid, end_uid, start_sid, end_sid, number_of_song_editors=10000,
+                          batch_size=DEFAULT_BATCH_SIZE):
     """
     Adds random Song Editor pairings to the DB
     """
-    total = number_of_song_editors
-    editor_pairs = []
-    while number_of_song_editors:
-        uid = random.randrange(start_uid, end_uid)
-        sid = random.randrange(start_sid, end_sid)
-        if (sid, uid) in editor_pairs:
-            continue
-        try:
-            insert_editor(sid, uid)
-            number_of_song_editors -= 1
-            editor_pairs.append((sid, uid))
-            print(str(total - number_of_song_editors) + " out of " + str(total) + " song editors added.")
-        except:
-            continue
+    pairs = (
+        (sid, uid) for uid, sid in
+        unique_pairs(start_uid, end_uid, start_sid, end_sid, number_of_song_editors)
+    )
+    insert_in_batches(pairs, insert_editors, batch_size, "song editors", number_of_song_editors)
 
 
-def populate_db():
+def populate_db(number_of_users=1000, user_offset=0, number_of_songs=1000, song_offset=0,
+                number_of_rows=10000, batch_size=DEFAULT_BATCH_SIZE):
     """
     A simple utility function to populate the DB with a diverse range of
     test data for development purposes. It is prudent to reset the DB prior
     to running this script
     """
-    number_of_users = 1000
-    user_offset = 0
-    number_of_songs = 1000
-    song_offset = 0
-    populate_users(number_of_users, user_offset)
-    populate_posts(user_offset, user_offset + number_of_users)
-    populate_followers(user_offset, user_offset + number_of_users)
-    populate_songs(user_offset, user_offset + number_of_users, number_of_songs, song_offset)
-    populate_song_likes(user_offset, user_offset + number_of_users, song_offset, song_offset + number_of_songs)
-    populate_song_editors(user_offset, user_offset + number_of_users, song_offset, song_offset + number_of_songs)
+    start_uid, end_uid = user_offset + 1, user_offset + number_of_users + 1
+    start_sid, end_sid = song_offset + 1, song_offset + number_of_songs + 1
+    populate_users(number_of_users, user_offset, batch_size)
+    populate_posts(start_uid, end_uid, number_of_rows, batch_size)
+    populate_followers(start_uid, end_uid, number_of_rows, batch_size)
+    populate_songs(start_uid, end_uid, number_of_songs, song_offset, batch_size)
+    populate_song_likes(start_uid, end_uid, start_sid, end_sid, number_of_rows, batch_size)
+    populate_song_editors(start_uid, end_uid, start_sid, end_sid, number_of_rows, batch_size)
+    # The batch inserts skip the per row timeline & audience fan out.
+    rebuild_timelines()
+    rebuild_notification_audience()
 
 
 if __name__ == "__main__":
-    populate_db()
+    PARSER = argparse.ArgumentParser(description="Populate the DB with test data.")
+    PARSER.add_argument("--users", type=int, default=1000)
+    PARSER.add_argument("--user-offset", type=int, default=0)
+    PARSER.add_argument("--songs", type=int, default=1000)
+    PARSER.add_argument("--song-offset", type=int, default=0)
+    PARSER.add_argument(
+        "--rows", type=int, default=10000,
+        help="Number of posts, followers, likes & editors to add."
+    )
+    PARSER.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    ARGS = PARSER.parse_args()
+    populate_db(
+        ARGS.users, ARGS.user_offset, ARGS.songs, ARGS.song_offset, ARGS.rows,
+        ARGS.batch_size
+    )